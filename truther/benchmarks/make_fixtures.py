@@ -0,0 +1,177 @@
+'''
+Writes the DocBin fixtures used by truther.benchmark to benchmarks/fixtures.
+
+The parses are annotated by hand so that the fixtures, and so the benchmark results, do not
+change with the spaCy model. Pass --model to parse the same texts with a model instead.
+
+    python benchmarks/make_fixtures.py [--model en_core_web_lg]
+'''
+import argparse
+import os
+from typing import List, Tuple
+
+import spacy
+from spacy.tokens import Doc, DocBin
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# word lemma pos head dep, heads being token indices
+Annotation = List[Tuple[str, str, str, int, str]]
+
+SHORT = [
+    ('the sun is yellow', [
+        ('He', 'he', 'PRON', 1, 'nsubj'),
+        ('lied', 'lie', 'VERB', 1, 'ROOT'),
+        ('that', 'that', 'SCONJ', 5, 'mark'),
+        ('the', 'the', 'DET', 4, 'det'),
+        ('sun', 'sun', 'NOUN', 5, 'nsubj'),
+        ('is', 'be', 'AUX', 1, 'ccomp'),
+        ('yellow', 'yellow', 'ADJ', 5, 'acomp'),
+        ('.', '.', 'PUNCT', 1, 'punct'),
+    ]),
+    ('it is raining', [
+        ('Bill', 'Bill', 'PROPN', 1, 'nsubj'),
+        ('knows', 'know', 'VERB', 1, 'ROOT'),
+        ('that', 'that', 'SCONJ', 5, 'mark'),
+        ('it', 'it', 'PRON', 5, 'nsubj'),
+        ('is', 'be', 'AUX', 5, 'aux'),
+        ('raining', 'rain', 'VERB', 1, 'ccomp'),
+        ('.', '.', 'PUNCT', 1, 'punct'),
+    ]),
+]
+
+MEDIAN = [
+    ('the sun is yellow', [
+        ('He', 'he', 'PRON', 1, 'nsubj'),
+        ('doubted', 'doubt', 'VERB', 1, 'ROOT'),
+        ('Bill', 'Bill', 'PROPN', 4, 'poss'),
+        ("'s", "'s", 'PART', 2, 'case'),
+        ('assessment', 'assessment', 'NOUN', 1, 'dobj'),
+        ('that', 'that', 'SCONJ', 8, 'mark'),
+        ('the', 'the', 'DET', 7, 'det'),
+        ('sun', 'sun', 'NOUN', 8, 'nsubj'),
+        ('is', 'be', 'AUX', 4, 'acl'),
+        ('yellow', 'yellow', 'ADJ', 8, 'acomp'),
+        ('and', 'and', 'CCONJ', 8, 'cc'),
+        ('that', 'that', 'SCONJ', 14, 'mark'),
+        ('it', 'it', 'PRON', 14, 'nsubj'),
+        ('will', 'will', 'AUX', 14, 'aux'),
+        ('rain', 'rain', 'VERB', 8, 'conj'),
+        ('today', 'today', 'NOUN', 14, 'npadvmod'),
+        ('.', '.', 'PUNCT', 1, 'punct'),
+    ]),
+    ('the budget was approved last week', [
+        ('According', 'accord', 'VERB', 6, 'prep'),
+        ('to', 'to', 'ADP', 0, 'prep'),
+        ('the', 'the', 'DET', 3, 'det'),
+        ('report', 'report', 'NOUN', 1, 'pobj'),
+        (',', ',', 'PUNCT', 6, 'punct'),
+        ('Mary', 'Mary', 'PROPN', 6, 'nsubj'),
+        ('believes', 'believe', 'VERB', 6, 'ROOT'),
+        ('that', 'that', 'SCONJ', 10, 'mark'),
+        ('the', 'the', 'DET', 9, 'det'),
+        ('committee', 'committee', 'NOUN', 10, 'nsubj'),
+        ('forgot', 'forget', 'VERB', 6, 'ccomp'),
+        ('that', 'that', 'SCONJ', 15, 'mark'),
+        ('the', 'the', 'DET', 13, 'det'),
+        ('budget', 'budget', 'NOUN', 15, 'nsubjpass'),
+        ('was', 'be', 'AUX', 15, 'auxpass'),
+        ('approved', 'approve', 'VERB', 10, 'ccomp'),
+        ('last', 'last', 'ADJ', 17, 'amod'),
+        ('week', 'week', 'NOUN', 15, 'npadvmod'),
+        ('.', '.', 'PUNCT', 6, 'punct'),
+    ]),
+]
+
+NAMES = ['Mary', 'Bill', 'Sarah', 'John', 'Sam', 'Ann', 'Tom', 'Kim', 'Lee', 'Pat', 'Max', 'Eve']
+# Distinct lemmas, as each lexicon entry labels a single token of a sentence
+VERBS = [('believes', 'believe'), ('doubts', 'doubt'), ('knows', 'know'), ('denies', 'deny'),
+         ('says', 'say'), ('forgot', 'forget'), ('thinks', 'think'), ('realized', 'realize'),
+         ('disputes', 'dispute'), ('admits', 'admit'), ('argues', 'argue'), ('pretends', 'pretend')]
+NOUNS = ['sun', 'sky', 'grass', 'sea', 'road', 'house', 'door', 'car', 'tree', 'wall', 'river', 'moon']
+ADJECTIVES = ['yellow', 'blue', 'green', 'wet', 'long', 'old', 'open', 'red', 'tall', 'white', 'cold', 'bright']
+
+
+def get_coordinated_annotation(clauses: int) -> Tuple[str, Annotation]:
+    # Mary believes that the sun is yellow , Bill doubts that the sky is blue , ... and ...
+    annotation = []
+    root = None
+    for clause_i in range(clauses):
+        if clause_i:
+            if clause_i == clauses - 1:
+                annotation.append(('and', 'and', 'CCONJ', root, 'cc'))
+            else:
+                annotation.append((',', ',', 'PUNCT', root, 'punct'))
+        verb, verb_lemma = VERBS[clause_i % len(VERBS)]
+        noun = NOUNS[clause_i % len(NOUNS)]
+        start = len(annotation)
+        if root is None:
+            root = start + 1
+        annotation.extend([
+            (NAMES[clause_i % len(NAMES)], NAMES[clause_i % len(NAMES)], 'PROPN', start + 1, 'nsubj'),
+            (verb, verb_lemma, 'VERB', root, 'ROOT' if root == start + 1 else 'conj'),
+            ('that', 'that', 'SCONJ', start + 5, 'mark'),
+            ('the', 'the', 'DET', start + 4, 'det'),
+            (noun, noun, 'NOUN', start + 5, 'nsubj'),
+            ('is', 'be', 'AUX', start + 1, 'ccomp'),
+            (ADJECTIVES[clause_i % len(ADJECTIVES)], ADJECTIVES[clause_i % len(ADJECTIVES)], 'ADJ', start + 5, 'acomp'),
+        ])
+    annotation.append(('.', '.', 'PUNCT', root, 'punct'))
+    last = clauses - 1
+    return f'the {NOUNS[last % len(NOUNS)]} is {ADJECTIVES[last % len(ADJECTIVES)]}', annotation
+
+
+def get_nested_annotation(depth: int) -> Tuple[str, Annotation]:
+    # Mary believes that Bill doubts that Sarah knows that ... it will rain today .
+    annotation = []
+    for level in range(depth):
+        verb, verb_lemma = VERBS[level % len(VERBS)]
+        start = len(annotation)
+        annotation.extend([
+            (NAMES[level % len(NAMES)], NAMES[level % len(NAMES)], 'PROPN', start + 1, 'nsubj'),
+            (verb, verb_lemma, 'VERB', start - 2 if level else start + 1, 'ccomp' if level else 'ROOT'),
+            ('that', 'that', 'SCONJ', start + 4 if level < depth - 1 else start + 5, 'mark'),
+        ])
+    start = len(annotation)
+    annotation.extend([
+        ('it', 'it', 'PRON', start + 2, 'nsubj'),
+        ('will', 'will', 'AUX', start + 2, 'aux'),
+        ('rain', 'rain', 'VERB', start - 2, 'ccomp'),
+        ('today', 'today', 'NOUN', start + 2, 'npadvmod'),
+        ('.', '.', 'PUNCT', 1, 'punct'),
+    ])
+    return 'it will rain today', annotation
+
+
+LONG = [get_coordinated_annotation(12), get_nested_annotation(12)]
+
+
+def make_doc(vocab, proposition: str, annotation: Annotation) -> Doc:
+    words, lemmas, pos, heads, deps = zip(*annotation)
+    doc = Doc(vocab, words=list(words), lemmas=list(lemmas), pos=list(pos), heads=list(heads), deps=list(deps))
+    doc.user_data['proposition'] = proposition
+    return doc
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Write the benchmark DocBin fixtures.')
+    parser.add_argument('--model', default=None, help='spaCy model parsing the fixture texts, instead of '
+                                                      'the hand annotated parses')
+    parser.add_argument('--output-dir', default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    nlp = spacy.load(args.model) if args.model else spacy.blank('en')
+    os.makedirs(args.output_dir, exist_ok=True)
+    for name, fixture in [('short', SHORT), ('median', MEDIAN), ('long', LONG)]:
+        docs = []
+        for proposition, annotation in fixture:
+            doc = make_doc(nlp.vocab, proposition, annotation)
+            if args.model:
+                doc = nlp(doc.text)
+                doc.user_data['proposition'] = proposition
+            docs.append(doc)
+        DocBin(docs=docs, store_user_data=True).to_disk(os.path.join(args.output_dir, f'{name}.spacy'))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,30 @@
+import os
+import sys
 
 import setuptools
+from setuptools.command.build_py import build_py
+
 with open('src/truther/version.py') as f:
     for line in f:
         if line.startswith('__version__'):
             _, _, version = line.replace("'", '').split()
             break
 
+
+class BuildPyWithCompiledLexicon(build_py):
+    # Adds the lexicon compiled from the text files to built packages. Editable installs
+    # read the text files, so that edits to them are not hidden by a stale artifact.
+    def run(self):
+        super().run()
+        if getattr(self, 'editable_mode', False):
+            return
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+        from truther.veridicality_elements import compile_lexicon
+        compile_lexicon(os.path.join(self.build_lib, 'truther', 'lexicon.json'))
+
+
 setuptools.setup(
     name='truther',
     version=version,
-)
\ No newline at end of file
+    cmdclass={'build_py': BuildPyWithCompiledLexicon},
+)
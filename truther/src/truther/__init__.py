@@ -1,4 +1,31 @@
-from truther.veridicity import get_proposition_veridicity
+import importlib
 
 from truther.version import __version__
 
+# Public names and the modules defining them, imported on first access so that importing
+# truther (e.g. for its version) does not load numpy, kanren or the lexicon
+_LAZY_ATTRIBUTES = {
+    'VeridicityMemo': 'truther.veridicity',
+    'VeridicityResult': 'truther.veridicity',
+    'explain_proposition_veridicity': 'truther.veridicity',
+    'get_proposition_veridicity': 'truther.veridicity',
+    'get_proposition_veridicity_many': 'truther.veridicity',
+    'get_proposition_veridicity_result': 'truther.veridicity',
+    'get_sentence_veridicity_result': 'truther.veridicity',
+    'get_veridicities': 'truther.veridicity',
+    'warmup': 'truther.veridicity',
+}
+
+__all__ = sorted(_LAZY_ATTRIBUTES) + ['__version__']
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module 'truther' has no attribute {name!r}")
+    value = globals()[name] = getattr(importlib.import_module(module_name), name)
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
@@ -0,0 +1,156 @@
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+from spacy.attrs import LEMMA, LOWER
+from spacy.language import Language
+from spacy.tokens import Doc
+from spacy.vectors import Vectors
+
+from truther.veridicality_elements import VeridicalityElements, get_veridicality_elements
+from truther.veridicity import VeridicityResult, _get_merged_sentence_veridicity, prepare_sentence
+
+Span = Tuple[int, int]
+
+
+def find_proposition_spans(pairs: List[Tuple[Doc, Doc]],
+                           threshold: float = 0.8,
+                           window_slack: int = 1) -> List[Span | None]:
+    '''
+    Returns the (start, end) token span of each sentence which best matches its proposition,
+    or None if no span reaches the threshold.
+
+    A case insensitive exact match is always taken. Otherwise candidate spans are windows
+    within window_slack tokens of the proposition's length, placed where a lowercase token or
+    lemma shingle of the proposition occurs in the sentence. Candidates of the whole batch are
+    scored at once by the cosine similarity of their summed word vectors with the proposition's.
+    '''
+    spans: List[Span | None] = [None] * len(pairs)
+    candidate_pairs, candidate_starts, candidate_ends = [], [], []
+    for pair_i, (sentence, proposition) in enumerate(pairs):
+        if not len(sentence) or not len(proposition):
+            continue
+        sentence_attrs = sentence.to_array([LOWER, LEMMA])
+        proposition_attrs = proposition.to_array([LOWER, LEMMA])
+        start = _find_sequence(sentence_attrs[:, 0], proposition_attrs[:, 0])
+        if start is not None:
+            spans[pair_i] = (start, start + len(proposition))
+            continue
+        starts, ends = _get_candidate_spans(sentence_attrs, proposition_attrs, window_slack)
+        candidate_pairs.append(np.full(len(starts), pair_i))
+        candidate_starts.append(starts)
+        candidate_ends.append(ends)
+    if not candidate_pairs:
+        return spans
+
+    candidate_pairs = np.concatenate(candidate_pairs)
+    candidate_starts = np.concatenate(candidate_starts)
+    candidate_ends = np.concatenate(candidate_ends)
+    if not len(candidate_pairs):
+        return spans
+    vectors = pairs[0][0].vocab.vectors
+
+    # Span vector sums are differences of the prefix sums of all the sentences' token vectors
+    pair_ids = np.unique(candidate_pairs)
+    sentence_lengths = np.array([len(pairs[pair_i][0]) for pair_i in pair_ids])
+    sentence_offsets = np.zeros(len(pair_ids), dtype=np.int64)
+    sentence_offsets[1:] = np.cumsum(sentence_lengths)[:-1]
+    token_sums = np.zeros((sentence_lengths.sum() + 1, vectors.shape[1]), dtype=np.float32)
+    np.cumsum(_get_token_vectors(vectors, [pairs[pair_i][0] for pair_i in pair_ids]), axis=0, out=token_sums[1:])
+    candidate_offsets = sentence_offsets[np.searchsorted(pair_ids, candidate_pairs)]
+    span_vectors = token_sums[candidate_offsets + candidate_ends] - token_sums[candidate_offsets + candidate_starts]
+
+    proposition_lengths = np.array([len(pairs[pair_i][1]) for pair_i in pair_ids])
+    proposition_offsets = np.zeros(len(pair_ids), dtype=np.int64)
+    proposition_offsets[1:] = np.cumsum(proposition_lengths)[:-1]
+    proposition_vectors = np.add.reduceat(
+        _get_token_vectors(vectors, [pairs[pair_i][1] for pair_i in pair_ids]),
+        proposition_offsets,
+        axis=0
+    )[np.searchsorted(pair_ids, candidate_pairs)]
+
+    norms = np.linalg.norm(span_vectors, axis=1) * np.linalg.norm(proposition_vectors, axis=1)
+    similarities = np.divide(np.einsum('ij,ij->i', span_vectors, proposition_vectors), norms,
+                             out=np.zeros(len(norms), dtype=np.float32), where=norms > 0)
+
+    # Best candidate per pair, preferring the earliest span on ties
+    order = np.lexsort((candidate_starts, -similarities, candidate_pairs))
+    best_pairs, best_indexes = np.unique(candidate_pairs[order], return_index=True)
+    for pair_i, candidate_i in zip(best_pairs.tolist(), order[best_indexes].tolist()):
+        if similarities[candidate_i] >= threshold:
+            spans[pair_i] = (int(candidate_starts[candidate_i]), int(candidate_ends[candidate_i]))
+    return spans
+
+
+def get_proposition_veridicity_approximate(
+        pairs: Iterable[Tuple[str | Doc, str | Doc]],
+        nlp: Language | None = None,
+        threshold: float = 0.8,
+        window_slack: int = 1,
+        batch_size: int = 1000,
+        veridicality_elements: VeridicalityElements | None = None,
+        backend: str | None = None,
+        with_reasons: bool = False
+) -> Iterator[str | VeridicityResult]:
+    '''
+    Like get_proposition_veridicity_many, but the span found by find_proposition_spans is
+    merged as the proposition instead of an exact token match. Texts are parsed with nlp,
+    batch_size pairs at a time.
+    '''
+    if veridicality_elements is None:
+        veridicality_elements = get_veridicality_elements()
+    pairs = iter(pairs)
+    chunk = list(islice(pairs, batch_size))
+    while chunk:
+        texts = list(dict.fromkeys(text for pair in chunk for text in pair if isinstance(text, str)))
+        parsed: Dict[str, Doc] = dict(zip(texts, nlp.pipe(texts, batch_size=batch_size))) if texts else {}
+        doc_pairs = [tuple(parsed[text] if isinstance(text, str) else text for text in pair) for pair in chunk]
+        for (sentence, _), span in zip(doc_pairs, find_proposition_spans(doc_pairs, threshold, window_slack)):
+            prepared_sentence = prepare_sentence(sentence, veridicality_elements)
+            merged = prepared_sentence.sentence
+            if span is not None:
+                merged = merged.merge_and_label_node_ids(list(range(*span)), 'proposition')
+            result = _get_merged_sentence_veridicity(
+                prepared_sentence=prepared_sentence,
+                sentence=merged,
+                veridicality_elements=veridicality_elements,
+                backend=backend
+            )
+            yield result if with_reasons else result.veridicity
+        chunk = list(islice(pairs, batch_size))
+
+
+def _find_sequence(tokens: np.ndarray, search: np.ndarray) -> int | None:
+    for start_i in np.flatnonzero(tokens[:len(tokens) - len(search) + 1] == search[0]).tolist():
+        if np.array_equal(tokens[start_i:start_i + len(search)], search):
+            return start_i
+    return None
+
+
+def _get_candidate_spans(sentence_attrs: np.ndarray,
+                         proposition_attrs: np.ndarray,
+                         window_slack: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Returns the starts and ends of the candidate spans. Anchors are the sentence tokens
+    # sharing a shingle (lowercase token or lemma hash) with the proposition; each is paired
+    # with the offsets in the proposition of the shingles it shares, by comparing both columns
+    # of each anchor with both columns of each proposition token (4 comparisons).
+    anchors = np.flatnonzero(np.isin(sentence_attrs, proposition_attrs).any(axis=1))
+    shared = sentence_attrs[anchors, None, :, None] == proposition_attrs[None, :, None, :]
+    anchor_is, offsets = np.nonzero(shared.reshape(len(anchors), len(proposition_attrs), 4).any(axis=2))
+    starts = np.unique((anchors[anchor_is] - offsets)[:, None] + np.arange(-window_slack, window_slack + 1))
+    starts = starts[starts >= 0]
+    proposition_length = len(proposition_attrs)
+    ends = starts[:, None] + np.arange(max(1, proposition_length - window_slack),
+                                       proposition_length + window_slack + 1)
+    valid = ends <= len(sentence_attrs)
+    return starts.repeat(valid.sum(axis=1)), ends[valid]
+
+
+def _get_token_vectors(vectors: Vectors, docs: List[Doc]) -> np.ndarray:
+    # Lowercase token vectors, zero for tokens without one
+    keys = np.concatenate([doc.to_array(LOWER) for doc in docs])
+    token_vectors = np.zeros((len(keys), vectors.shape[1]), dtype=np.float32)
+    if vectors.shape[0]:
+        rows = vectors.find(keys=keys)
+        token_vectors[rows >= 0] = np.asarray(vectors.data)[rows[rows >= 0]]
+    return token_vectors
@@ -0,0 +1,159 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import spacy
+from spacy.tokens import Doc, DocBin
+from spacy.vocab import Vocab
+
+from truther.sentence import make_sentence_from_doc
+from truther.veridicality_elements import VeridicalityElements, get_veridicality_elements
+from truther.veridicality_transformation import KANREN_BACKEND, NATIVE_BACKEND, LogicalSentence
+from truther.veridicity import get_proposition_veridicity
+from truther.version import __version__
+
+BACKENDS = (NATIVE_BACKEND, KANREN_BACKEND)
+
+
+def load_fixtures(directory: str, vocab: Vocab | None = None) -> Dict[str, List[Tuple[Doc, Doc]]]:
+    '''
+    Reads the (sentence, proposition) pairs of each DocBin fixture in directory, keyed by
+    file name without extension. Each doc's proposition text is in its user_data, and is
+    tokenized on whitespace.
+    '''
+    if vocab is None:
+        vocab = spacy.blank('en').vocab
+    fixtures = {}
+    for file_name in sorted(os.listdir(directory)):
+        if file_name.endswith('.spacy'):
+            docs = DocBin().from_disk(os.path.join(directory, file_name)).get_docs(vocab)
+            fixtures[file_name[:-len('.spacy')]] = [
+                (doc, Doc(vocab, words=doc.user_data['proposition'].split())) for doc in docs
+            ]
+    return fixtures
+
+
+def run_benchmarks(fixtures: Dict[str, List[Tuple[Doc, Doc]]],
+                   backends: Iterable[str] = BACKENDS,
+                   repeat: int = 5,
+                   min_seconds: float = 0.2,
+                   veridicality_elements: VeridicalityElements | None = None) -> List[Dict]:
+    '''
+    Times each stage of scoring the pairs of each fixture, returning one row per fixture,
+    stage and backend (None for stages not depending on it). The pairs are run as many
+    times as fit in min_seconds, repeat times; the reported seconds are per pair, of the
+    fastest and the median repeat. End-to-end rows also have the pairs scored per second
+    and the peak memory allocated scoring the pairs once, as traced by tracemalloc.
+    '''
+    if veridicality_elements is None:
+        veridicality_elements = get_veridicality_elements()
+    matcher = veridicality_elements.get_matcher()
+    rows = []
+    for fixture_name, pairs in fixtures.items():
+        if not pairs:
+            continue
+        sentences = [make_sentence_from_doc(sentence) for sentence, _ in pairs]
+        merged_sentences = [
+            sentence.search_and_merge([x.orth_ for x in proposition], label='proposition')
+            for sentence, (_, proposition) in zip(sentences, pairs)
+        ]
+
+        def add_row(stage: str, backend: str | None, function: Callable[[], object], **extra) -> None:
+            timings = _time(function, len(pairs), repeat, min_seconds)
+            rows.append(dict(fixture=fixture_name,
+                             stage=stage,
+                             backend=backend,
+                             pairs=len(pairs),
+                             tokens=sum(len(sentence) for sentence, _ in pairs),
+                             min_seconds=min(timings),
+                             median_seconds=statistics.median(timings),
+                             **extra))
+
+        add_row('make_sentence_from_doc', None,
+                lambda: [make_sentence_from_doc(sentence) for sentence, _ in pairs])
+        add_row('lexicon_merging', None,
+                lambda: [matcher.label_sentence(sentence, matcher.find_patterns(sentence))
+                         for sentence in merged_sentences])
+        for backend in backends:
+            logical_sentences = [LogicalSentence(sentence, veridicality_elements, backend=backend)
+                                 for sentence in merged_sentences]
+            add_row('find_a_veridicality_transform', backend,
+                    lambda: [logical_sentence.find_a_veridicality_transform()
+                             for logical_sentence in logical_sentences])
+            transforms = [(logical_sentence, logical_sentence.find_a_veridicality_transform())
+                          for logical_sentence in logical_sentences]
+            transforms = [(logical_sentence, transform) for logical_sentence, transform in transforms
+                          if transform is not None]
+            if transforms:
+                add_row('merge_in_transform', backend,
+                        lambda: [logical_sentence.merge_in_transform(transform)
+                                 for logical_sentence, transform in transforms])
+
+            def score() -> List[str]:
+                return [get_proposition_veridicity(sentence, proposition, veridicality_elements, backend)
+                        for sentence, proposition in pairs]
+
+            tracemalloc.start()
+            score()
+            peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            add_row('end_to_end', backend, score, peak_memory_bytes=peak_memory_bytes)
+            rows[-1]['pairs_per_second'] = 1. / rows[-1]['min_seconds']
+    return rows
+
+
+def get_environment() -> Dict[str, str]:
+    return {'truther': __version__,
+            'spacy': spacy.__version__,
+            'python': platform.python_version(),
+            'platform': platform.platform()}
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description='Benchmark each stage of scoring the DocBin fixtures in a directory, as JSON.'
+    )
+    parser.add_argument('fixtures_dir', help='Directory of .spacy fixtures, see benchmarks/make_fixtures.py')
+    parser.add_argument('-o', '--output', default=None, help='JSON output path (default: stdout)')
+    parser.add_argument('--backend', action='append', choices=BACKENDS, default=None,
+                        help='Rule backend to benchmark, may be repeated (default: all)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-seconds', type=float, default=0.2,
+                        help='Minimum duration of each repeat')
+    args = parser.parse_args(argv)
+
+    results = {'environment': get_environment(),
+               'results': run_benchmarks(load_fixtures(args.fixtures_dir),
+                                         backends=args.backend or BACKENDS,
+                                         repeat=args.repeat,
+                                         min_seconds=args.min_seconds)}
+    if args.output is None:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+
+
+def _time(function: Callable[[], object], pairs: int, repeat: int, min_seconds: float) -> List[float]:
+    # Seconds per pair of each repeat, calling function enough times to last min_seconds
+    start = time.perf_counter()
+    function()
+    number = max(1, int(min_seconds / max(time.perf_counter() - start, 1e-9)))
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - start) / number / pairs)
+    return timings
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,320 @@
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import sqlite3
+import sys
+import uuid
+from collections import OrderedDict
+from itertools import islice
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Tuple
+
+from truther.memo import normalize_text
+from truther.sentence import Sentence
+from truther.veridicality_elements import VeridicalityElements, get_veridicality_elements
+from truther.veridicality_transformation import get_rule_set_version
+from truther.veridicity import PreparedSentence, get_proposition_veridicity_many, prepare_sentence
+
+# spaCy is only imported by ParseCache, so that ResultCache hits do not pay for importing it
+if TYPE_CHECKING:
+    from spacy.language import Language
+    from spacy.tokens import Doc
+
+# Keeps IN (...) lookups under SQLite's bound parameter limit
+_LOOKUP_SIZE = 500
+
+
+class ParseCache(object):
+    '''
+    On-disk cache of spaCy parses and of the prepared sentences made from them.
+
+    Parses are stored as DocBin shards under a directory named after the spaCy model and its
+    version, and indexed by text hash in an SQLite database next to them. Prepared sentences
+    (see truther.veridicity.prepare_sentence), the converted Sentence and the ids of the
+    lexicon patterns found in it, are stored in the same database, additionally keyed by the
+    lexicon hash. Entries for other lexicons are dropped when the cache is opened, so changing
+    the model or the lexicon invalidates the cache, while changing the veridicality rules
+    reuses it.
+
+    Lexicon labelled sentences are not stored: the proposition has to be merged before the
+    lexicon elements, so the labels are applied again for each pair, from the stored pattern
+    ids, without searching the lexicon.
+
+    Parses are written in shards of shard_size docs; call close (or use the cache as a
+    context manager) to write the last one.
+    '''
+
+    def __init__(self,
+                 directory: str,
+                 nlp: 'Language',
+                 veridicality_elements: VeridicalityElements | None = None,
+                 shard_size: int = 1000,
+                 loaded_shards: int = 4):
+        self.nlp = nlp
+        self.veridicality_elements = (get_veridicality_elements() if veridicality_elements is None
+                                      else veridicality_elements)
+        self.shard_size = shard_size
+        self.directory = os.path.join(directory, get_model_key(nlp))
+        os.makedirs(self.directory, exist_ok=True)
+        self._connection = sqlite3.connect(os.path.join(self.directory, 'index.sqlite'), timeout=60)
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS parses '
+                '(text_hash TEXT PRIMARY KEY, shard TEXT NOT NULL, position INTEGER NOT NULL)'
+            )
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS sentences '
+                '(text_hash TEXT NOT NULL, lexicon_hash TEXT NOT NULL, '
+                'sentence BLOB NOT NULL, lexicon_matches BLOB NOT NULL, '
+                'PRIMARY KEY (text_hash, lexicon_hash))'
+            )
+            self._connection.execute('DELETE FROM sentences WHERE lexicon_hash != ?', (self.lexicon_hash,))
+        # text hash -> parsed doc not yet written to a shard
+        self._pending_docs: Dict[str, 'Doc'] = {}
+        self._loaded_shards: OrderedDict[str, List['Doc']] = OrderedDict()
+        self._max_loaded_shards = loaded_shards
+
+    def __enter__(self) -> 'ParseCache':
+        return self
+
+    @property
+    def lexicon_hash(self) -> str:
+        # Read on each use, since the lexicon can change at runtime
+        return self.veridicality_elements.get_hash()
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def get_docs(self, texts: List[str], batch_size: int = 1000, n_process: int = 1) -> List['Doc']:
+        text_hashes = [get_text_hash(text) for text in texts]
+        docs = self._lookup_docs(set(text_hashes))
+        to_parse = {}
+        for text, text_hash in zip(texts, text_hashes):
+            if text_hash not in docs:
+                to_parse[text_hash] = text
+        if to_parse:
+            parsed = self.nlp.pipe(to_parse.values(), batch_size=batch_size, n_process=n_process)
+            for text_hash, doc in zip(to_parse, parsed):
+                docs[text_hash] = self._pending_docs[text_hash] = doc
+            if len(self._pending_docs) >= self.shard_size:
+                self.flush()
+        return [docs[text_hash] for text_hash in text_hashes]
+
+    def get_sentences(self,
+                      texts: List[str],
+                      batch_size: int = 1000,
+                      n_process: int = 1) -> List[PreparedSentence]:
+        import srsly
+        text_hashes = [get_text_hash(text) for text in texts]
+        lexicon_hash = self.lexicon_hash
+        prepared = {}
+        for text_hash, sentence, lexicon_matches in _select(
+                self._connection,
+                'SELECT text_hash, sentence, lexicon_matches FROM sentences '
+                'WHERE lexicon_hash = ? AND text_hash IN ({})',
+                (lexicon_hash,),
+                set(text_hashes)):
+            tok_matches, lemma_matches = srsly.msgpack_loads(lexicon_matches)
+            prepared[text_hash] = PreparedSentence(Sentence.from_bytes(sentence),
+                                                   (set(tok_matches), set(lemma_matches)))
+        to_prepare = {}
+        for text, text_hash in zip(texts, text_hashes):
+            if text_hash not in prepared:
+                to_prepare[text_hash] = text
+        if to_prepare:
+            rows = []
+            docs = self.get_docs(list(to_prepare.values()), batch_size=batch_size, n_process=n_process)
+            for text_hash, doc in zip(to_prepare, docs):
+                prepared_sentence = prepared[text_hash] = prepare_sentence(doc, self.veridicality_elements)
+                tok_matches, lemma_matches = prepared_sentence.lexicon_matches
+                rows.append((text_hash,
+                             lexicon_hash,
+                             prepared_sentence.sentence.to_bytes(),
+                             srsly.msgpack_dumps([sorted(tok_matches), sorted(lemma_matches)])))
+            with self._connection:
+                self._connection.executemany('INSERT OR IGNORE INTO sentences VALUES (?, ?, ?, ?)', rows)
+        return [prepared[text_hash] for text_hash in text_hashes]
+
+    def flush(self) -> None:
+        if not self._pending_docs:
+            return
+        from spacy.tokens import DocBin
+        shard = f'shard-{uuid.uuid4().hex}.spacy'
+        DocBin(docs=self._pending_docs.values()).to_disk(os.path.join(self.directory, shard))
+        with self._connection:
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO parses VALUES (?, ?, ?)',
+                [(text_hash, shard, position) for position, text_hash in enumerate(self._pending_docs)]
+            )
+        self._pending_docs = {}
+
+    def close(self) -> None:
+        self.flush()
+        self._connection.close()
+
+    def _lookup_docs(self, text_hashes: set) -> Dict[str, 'Doc']:
+        docs = {text_hash: self._pending_docs[text_hash]
+                for text_hash in text_hashes if text_hash in self._pending_docs}
+        for text_hash, shard, position in _select(
+                self._connection,
+                'SELECT text_hash, shard, position FROM parses WHERE text_hash IN ({})',
+                (),
+                text_hashes - docs.keys()):
+            docs[text_hash] = self._load_shard(shard)[position]
+        return docs
+
+    def _load_shard(self, shard: str) -> List['Doc']:
+        if shard in self._loaded_shards:
+            self._loaded_shards.move_to_end(shard)
+        else:
+            from spacy.tokens import DocBin
+            doc_bin = DocBin().from_disk(os.path.join(self.directory, shard))
+            self._loaded_shards[shard] = list(doc_bin.get_docs(self.nlp.vocab))
+            if len(self._loaded_shards) > self._max_loaded_shards:
+                self._loaded_shards.popitem(last=False)
+        return self._loaded_shards[shard]
+
+
+class ResultCache(object):
+    '''
+    SQLite store of veridicities, keyed by whitespace normalized sentence and proposition
+    texts, the lexicon hash, the rule set version of the backend (see
+    truther.veridicality_transformation.get_rule_set_version) and the spaCy model.
+    The model is given by name or path so that it need not be loaded to look results up.
+    '''
+
+    def __init__(self,
+                 path: str,
+                 model: str,
+                 veridicality_elements: VeridicalityElements | None = None,
+                 backend: str | None = None):
+        self.veridicality_elements = (get_veridicality_elements() if veridicality_elements is None
+                                      else veridicality_elements)
+        self.backend = backend
+        self._model_key = get_model_name_key(model)
+        self._connection = sqlite3.connect(path, timeout=60)
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS results '
+                '(sentence TEXT NOT NULL, proposition TEXT NOT NULL, lexicon_hash TEXT NOT NULL, '
+                'rule_set_version TEXT NOT NULL, model TEXT NOT NULL, veridicity TEXT NOT NULL, '
+                'PRIMARY KEY (sentence, proposition, lexicon_hash, rule_set_version, model))'
+            )
+
+    def __enter__(self) -> 'ResultCache':
+        return self
+
+    @property
+    def _key(self) -> Tuple[str, str, str]:
+        # The lexicon and registered native rules can change at runtime
+        return self.veridicality_elements.get_hash(), get_rule_set_version(self.backend), self._model_key
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def get_many(self, pairs: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], str]:
+        pairs = set(pairs)
+        found = {}
+        for sentence, proposition, veridicity in _select(
+                self._connection,
+                'SELECT sentence, proposition, veridicity FROM results '
+                'WHERE lexicon_hash = ? AND rule_set_version = ? AND model = ? AND sentence IN ({})',
+                self._key,
+                {sentence for sentence, _ in pairs}):
+            if (sentence, proposition) in pairs:
+                found[sentence, proposition] = veridicity
+        return found
+
+    def put_many(self, results: Dict[Tuple[str, str], str]) -> None:
+        key = self._key
+        with self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)',
+                [(sentence, proposition) + key + (veridicity,)
+                 for (sentence, proposition), veridicity in results.items()]
+            )
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+def get_proposition_veridicity_cached(
+        pairs: Iterable[Tuple[str, str]],
+        result_cache: ResultCache,
+        nlp: 'Language | Callable[[], Language]',
+        batch_size: int = 1000,
+        **kwargs
+) -> Iterator[str]:
+    '''
+    Lazily yields the veridicity of each (sentence text, proposition text) pair, in input
+    order, looking pairs up in result_cache batch_size at a time. Only the pairs missing
+    from it are scored, with get_proposition_veridicity_many and the remaining keyword
+    arguments, and stored. nlp may be a function loading the model, which is then only
+    called once a pair is missing.
+    '''
+    loaded_nlp = nlp if _is_language(nlp) else None
+    pairs = iter(pairs)
+    chunk = [(normalize_text(sentence), normalize_text(proposition))
+             for sentence, proposition in islice(pairs, batch_size)]
+    while chunk:
+        veridicities = result_cache.get_many(chunk)
+        missing = [pair for pair in dict.fromkeys(chunk) if pair not in veridicities]
+        if missing:
+            if loaded_nlp is None:
+                loaded_nlp = nlp()
+            scored = dict(zip(missing, get_proposition_veridicity_many(
+                missing,
+                loaded_nlp,
+                batch_size=batch_size,
+                veridicality_elements=result_cache.veridicality_elements,
+                backend=result_cache.backend,
+                **kwargs
+            )))
+            result_cache.put_many(scored)
+            veridicities.update(scored)
+        for pair in chunk:
+            yield veridicities[pair]
+        chunk = [(normalize_text(sentence), normalize_text(proposition))
+                 for sentence, proposition in islice(pairs, batch_size)]
+
+
+def get_text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode('utf8')).hexdigest()
+
+
+def get_model_key(nlp: 'Language') -> str:
+    return _get_meta_key(nlp.meta)
+
+
+def get_model_name_key(model: str) -> str:
+    # Same key as get_model_key, read from the model's meta.json instead of loading it (or spaCy)
+    spec = importlib.util.find_spec(model) if model.isidentifier() else None
+    if spec is not None and spec.submodule_search_locations:
+        meta_path = os.path.join(list(spec.submodule_search_locations)[0], 'meta.json')
+    else:
+        meta_path = os.path.join(model, 'meta.json')
+    if not os.path.exists(meta_path):
+        return re.sub(r'[^\w.-]', '_', model)
+    with open(meta_path, encoding='utf8') as meta_file:
+        return _get_meta_key(json.load(meta_file))
+
+
+def _is_language(nlp) -> bool:
+    # nlp can only be a Language once spaCy has been imported
+    language = sys.modules.get('spacy.language')
+    return language is not None and isinstance(nlp, language.Language)
+
+
+def _get_meta_key(meta: Dict) -> str:
+    return re.sub(r'[^\w.-]', '_', f"{meta['lang']}_{meta['name']}-{meta['version']}")
+
+
+def _select(connection: sqlite3.Connection,
+            query: str,
+            params: Tuple,
+            values: Iterable[str]) -> Iterator[Tuple]:
+    values = list(values)
+    for start in range(0, len(values), _LOOKUP_SIZE):
+        lookup = values[start:start + _LOOKUP_SIZE]
+        yield from connection.execute(query.format(', '.join('?' * len(lookup))), params + tuple(lookup))
@@ -0,0 +1,170 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+# Set in each worker process by _init_worker
+_worker_nlp = None
+_worker_options = {}
+_worker_parse_cache = None
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog='truther',
+        description='Score the veridicity of (sentence, proposition) pairs read from JSONL or CSV, '
+                    'writing one JSON object per input record, in input order.'
+    )
+    parser.add_argument('inputs', nargs='*', default=['-'],
+                        help='JSONL or CSV files to read. Defaults to standard input ("-").')
+    parser.add_argument('-o', '--output', default='-',
+                        help='JSONL file to write results to. Defaults to standard output.')
+    parser.add_argument('--format', choices=('jsonl', 'csv'), default=None,
+                        help='Input format. Inferred from the file extension when omitted, '
+                             'and jsonl for standard input.')
+    parser.add_argument('--sentence-field', default='sentence')
+    parser.add_argument('--proposition-field', default='proposition')
+    parser.add_argument('--result-field', default='veridicity')
+    parser.add_argument('--model', default='en_core_web_lg', help='spaCy model to load in each worker.')
+    parser.add_argument('--workers', type=int, default=1, help='Number of worker processes.')
+    parser.add_argument('--threads', type=int, default=1,
+                        help='Number of threads scoring pairs within a worker while it parses.')
+    parser.add_argument('--chunk-size', type=int, default=1000,
+                        help='Number of pairs sent to a worker at a time.')
+    parser.add_argument('--batch-size', type=int, default=256, help='nlp.pipe batch size within a worker.')
+    parser.add_argument('--backend', choices=('kanren', 'native'), default=None,
+                        help='Rule backend, see truther.veridicality_transformation.')
+    parser.add_argument('--cache-dir', default=None,
+                        help='Directory of a truther.cache.ParseCache reused across runs.')
+    parser.add_argument('--report-every', type=float, default=10.,
+                        help='Seconds between throughput reports on standard error; 0 disables them.')
+    args = parser.parse_args(argv)
+
+    records = _read_records(args.inputs, args.format)
+    options = {'batch_size': args.batch_size, 'backend': args.backend, 'n_threads': args.threads}
+    out = sys.stdout if args.output == '-' else open(args.output, 'w')
+    reporter = _ThroughputReporter(args.report_every)
+    try:
+        for chunk, veridicities in _score_chunks(_chunk_records(records, args.chunk_size),
+                                                 args.sentence_field,
+                                                 args.proposition_field,
+                                                 args.model,
+                                                 args.workers,
+                                                 options,
+                                                 args.cache_dir):
+            for record, veridicity in zip(chunk, veridicities):
+                record[args.result_field] = veridicity
+                out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            reporter.add(len(chunk))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        reporter.report(final=True)
+
+
+def _read_records(inputs: List[str], input_format: str | None) -> Iterator[Dict]:
+    for input_path in inputs:
+        path_format = input_format
+        if path_format is None:
+            path_format = 'csv' if os.path.splitext(input_path)[1].lower() == '.csv' else 'jsonl'
+        input_file = sys.stdin if input_path == '-' else open(input_path, newline='')
+        try:
+            if path_format == 'csv':
+                yield from csv.DictReader(input_file)
+            else:
+                for line in input_file:
+                    if line.strip():
+                        yield json.loads(line)
+        finally:
+            if input_file is not sys.stdin:
+                input_file.close()
+
+
+def _chunk_records(records: Iterable[Dict], chunk_size: int) -> Iterator[List[Dict]]:
+    records = iter(records)
+    chunk = list(islice(records, chunk_size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(records, chunk_size))
+
+
+def _score_chunks(chunks: Iterable[List[Dict]],
+                  sentence_field: str,
+                  proposition_field: str,
+                  model: str,
+                  workers: int,
+                  options: Dict,
+                  cache_dir: str | None = None) -> Iterator[Tuple[List[Dict], List[str]]]:
+    def pairs(chunk):
+        return [(record[sentence_field], record[proposition_field]) for record in chunk]
+
+    if workers <= 1:
+        _init_worker(model, options, cache_dir)
+        for chunk in chunks:
+            yield chunk, _score_pairs(pairs(chunk))
+        return
+
+    # Bound the chunks in flight so memory does not grow with the input size
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(model, options, cache_dir)) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append((chunk, pool.apply_async(_score_pairs, (pairs(chunk),))))
+            if len(pending) >= 2 * workers:
+                chunk, result = pending.popleft()
+                yield chunk, result.get()
+        while pending:
+            chunk, result = pending.popleft()
+            yield chunk, result.get()
+
+
+def _init_worker(model: str, options: Dict, cache_dir: str | None = None) -> None:
+    global _worker_nlp, _worker_options, _worker_parse_cache
+    import spacy
+    from truther.veridicity import warmup
+    _worker_nlp = spacy.load(model)
+    _worker_options = options
+    warmup(_worker_nlp, backends=[options.get('backend')], freeze=False)
+    if cache_dir is not None:
+        from truther.cache import ParseCache
+        # Shards are written after each chunk instead, since pool workers are not closed cleanly
+        _worker_parse_cache = ParseCache(cache_dir, _worker_nlp, shard_size=sys.maxsize)
+
+
+def _score_pairs(pairs: List[Tuple[str, str]]) -> List[str]:
+    from truther.veridicity import get_proposition_veridicity_many
+    veridicities = list(get_proposition_veridicity_many(pairs, _worker_nlp, parse_cache=_worker_parse_cache,
+                                                        **_worker_options))
+    if _worker_parse_cache is not None:
+        _worker_parse_cache.flush()
+    return veridicities
+
+
+class _ThroughputReporter(object):
+    def __init__(self, report_every: float):
+        self.report_every = report_every
+        self.start = self.last_report = time.perf_counter()
+        self.count = 0
+
+    def add(self, count: int) -> None:
+        self.count += count
+        if self.report_every and time.perf_counter() - self.last_report >= self.report_every:
+            self.report()
+
+    def report(self, final: bool = False) -> None:
+        if not self.report_every:
+            return
+        now = time.perf_counter()
+        self.last_report = now
+        elapsed = now - self.start
+        print(f"{'done: ' if final else ''}{self.count} pairs in {elapsed:.1f}s "
+              f"({self.count / elapsed if elapsed else 0.:.1f} pairs/s)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
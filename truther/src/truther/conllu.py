@@ -0,0 +1,51 @@
+from typing import Iterable, Iterator, List
+
+from truther.sentence import Sentence, make_sentence
+
+UNDERSCORE = '_'
+
+
+def read_conllu(lines: Iterable[str]) -> Iterator[Sentence]:
+    '''
+    Lazily yields a Sentence (see truther.sentence.make_sentence) for each sentence of a
+    CoNLL-U file, given as an iterable of lines such as an open file. Comments, multiword
+    token ranges and empty nodes are skipped. A missing lemma is replaced by the word form,
+    and a missing universal POS tag by the language specific one.
+
+    Dependency labels are used as they are, so they should follow spaCy's English scheme
+    for the rules to apply; Universal Dependencies labels only partly coincide with it.
+    '''
+    rows = []
+    line_number = 0
+    for line_number, line in enumerate(lines, start=1):
+        line = line.rstrip('\r\n')
+        if not line.strip():
+            if rows:
+                yield _make_conllu_sentence(rows, line_number)
+                rows = []
+            continue
+        if line.startswith('#'):
+            continue
+        fields = line.split('\t')
+        if len(fields) != 10:
+            raise ValueError(f"Line {line_number}: expected 10 tab separated CoNLL-U fields, got {len(fields)}")
+        if not fields[0].isdigit():
+            continue
+        rows.append(fields)
+    if rows:
+        yield _make_conllu_sentence(rows, line_number)
+
+
+def _make_conllu_sentence(rows: List[List[str]], line_number: int) -> Sentence:
+    # CoNLL-U ids and heads count from 1, with 0 for the root
+    for token_i, row in enumerate(rows):
+        if int(row[0]) != token_i + 1:
+            raise ValueError(f"Sentence ending at line {line_number}: expected token id {token_i + 1}, "
+                             f"got {row[0]}")
+    return make_sentence(
+        words=[row[1] for row in rows],
+        lemmas=[row[1] if row[2] == UNDERSCORE else row[2] for row in rows],
+        pos=[row[4] if row[3] == UNDERSCORE else row[3] for row in rows],
+        heads=[int(row[6]) - 1 for row in rows],
+        deps=[row[7] for row in rows]
+    )
@@ -0,0 +1,138 @@
+import sqlite3
+from itertools import islice
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Tuple
+
+from truther.sentence import Sentence, make_sentence_from_doc
+from truther.veridicality_elements import VeridicalityElements, get_veridicality_elements
+from truther.veridicity import NOT_FOUND, PreparedSentence, _get_prepared_sentence_veridicity
+
+if TYPE_CHECKING:
+    from spacy.language import Language
+    from spacy.tokens import Doc
+
+# Prefix of token gram postings
+TOKEN_GRAM = 't'
+
+
+class PropositionIndex(object):
+    '''
+    Persistent SQLite index of a parsed corpus, for finding the sentences which contain a
+    proposition and scoring only those.
+
+    Each sentence is stored as a serialized Sentence, with postings for its lowercase token
+    unigrams and bigrams. A proposition's candidate sentences are those having
+    all of its bigrams (or its single unigram), and are confirmed by merging the proposition
+    into the stored Sentence, so queries need neither spaCy nor a pass over the corpus.
+    '''
+
+    def __init__(self, path: str):
+        self._connection = sqlite3.connect(path, timeout=60)
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS sentences '
+                '(sentence_id INTEGER PRIMARY KEY, text TEXT NOT NULL, sentence BLOB NOT NULL)'
+            )
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS postings '
+                '(gram TEXT NOT NULL, sentence_id INTEGER NOT NULL, PRIMARY KEY (gram, sentence_id)) '
+                'WITHOUT ROWID'
+            )
+
+    def __enter__(self) -> 'PropositionIndex':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._connection.execute('SELECT COUNT(*) FROM sentences').fetchone()[0]
+
+    def add(self,
+            sentences: Iterable['str | Doc'],
+            nlp: 'Language | None' = None,
+            batch_size: int = 1000,
+            n_process: int = 1) -> List[int]:
+        '''
+        Parses (if needed) and indexes sentences, committing every batch_size sentences.
+        Returns the ids of the added sentences, in order.
+        '''
+        sentence_ids = []
+        sentences = iter(sentences)
+        chunk = list(islice(sentences, batch_size))
+        while chunk:
+            texts = [sentence for sentence in chunk if isinstance(sentence, str)]
+            parsed = iter(nlp.pipe(texts, batch_size=batch_size, n_process=n_process) if texts else ())
+            sentence_ids.extend(self._add_docs([next(parsed) if isinstance(sentence, str) else sentence
+                                                for sentence in chunk]))
+            chunk = list(islice(sentences, batch_size))
+        return sentence_ids
+
+    def find_sentence_ids(self, proposition_tokens: List[str]) -> List[int]:
+        grams = list(dict.fromkeys(_get_grams(proposition_tokens, unigrams=len(proposition_tokens) == 1)))
+        if not grams:
+            return []
+        query = ' INTERSECT '.join(['SELECT sentence_id FROM postings WHERE gram = ?'] * len(grams))
+        return [sentence_id for sentence_id, in self._connection.execute(query + ' ORDER BY sentence_id',
+                                                                         grams)]
+
+    def get_sentence(self, sentence_id: int) -> Tuple[str, Sentence]:
+        text, sentence = self._connection.execute(
+            'SELECT text, sentence FROM sentences WHERE sentence_id = ?', (sentence_id,)
+        ).fetchone()
+        return text, Sentence.from_bytes(sentence)
+
+    def get_proposition_veridicities(
+            self,
+            proposition: 'str | Doc',
+            nlp: 'Language | None' = None,
+            veridicality_elements: VeridicalityElements | None = None,
+            backend: str | None = None
+    ) -> Iterator[Tuple[int, str, str]]:
+        '''
+        Yields (sentence id, sentence text, veridicity) for each indexed sentence containing
+        the proposition. A proposition text is tokenized with nlp.make_doc.
+        '''
+        if veridicality_elements is None:
+            veridicality_elements = get_veridicality_elements()
+        if isinstance(proposition, str):
+            proposition = nlp.make_doc(proposition)
+        proposition_tokens = [x.orth_ for x in proposition]
+        matcher = veridicality_elements.get_matcher()
+        for sentence_id in self.find_sentence_ids(proposition_tokens):
+            text, sentence = self.get_sentence(sentence_id)
+            # Candidates have every bigram of the proposition, but not necessarily in sequence
+            result = _get_prepared_sentence_veridicity(
+                prepared_sentence=PreparedSentence(sentence, matcher.find_patterns(sentence)),
+                proposition_tokens=proposition_tokens,
+                veridicality_elements=veridicality_elements,
+                backend=backend
+            )
+            if result.reason != NOT_FOUND:
+                yield sentence_id, text, result.veridicity
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def _add_docs(self, docs: List['Doc']) -> List[int]:
+        sentence_ids = []
+        with self._connection:
+            for doc in docs:
+                sentence = make_sentence_from_doc(doc)
+                sentence_id = self._connection.execute(
+                    'INSERT INTO sentences (text, sentence) VALUES (?, ?)',
+                    (doc.text, sentence.to_bytes())
+                ).lastrowid
+                grams = set(_get_grams([tok for _, tok in sentence.toks]))
+                self._connection.executemany('INSERT OR IGNORE INTO postings VALUES (?, ?)',
+                                             [(gram, sentence_id) for gram in grams])
+                sentence_ids.append(sentence_id)
+        return sentence_ids
+
+
+def _get_grams(tokens: List[str], unigrams: bool = True) -> Iterator[str]:
+    if unigrams:
+        for token in tokens:
+            yield f'{TOKEN_GRAM} {token}'
+    for first, second in zip(tokens, tokens[1:]):
+        yield f'{TOKEN_GRAM} {first} {second}'
+
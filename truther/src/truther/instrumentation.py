@@ -0,0 +1,132 @@
+import threading
+import time
+from functools import wraps
+from typing import Callable, Dict, List, Tuple
+
+# Stages reported to hooks
+MAKE_SENTENCE_STAGE = 'make_sentence_from_doc'
+LEXICON_STAGE = 'lexicon_matching'
+RULE_QUERY_STAGE = 'rule_query'
+RULE_HIT_STAGE = 'rule_hit'
+# Rules not queried, as the sentence lacks labels or relations they need
+RULE_SKIP_STAGE = 'rule_skip'
+MERGE_STAGE = 'merge_and_label_node_ids'
+LOOP_ITERATION_STAGE = 'transform_loop_iteration'
+
+# Called with (stage, rule name or None, seconds)
+InstrumentationHook = Callable[[str, str | None, float], None]
+
+_hooks: List[InstrumentationHook] = []
+
+
+def register_hook(hook: InstrumentationHook) -> InstrumentationHook:
+    '''
+    Adds a hook called after each instrumented stage. While no hook is registered, stages are
+    not timed. Can be used as a decorator.
+    '''
+    _hooks.append(hook)
+    return hook
+
+
+def unregister_hook(hook: InstrumentationHook) -> None:
+    _hooks.remove(hook)
+
+
+def is_enabled() -> bool:
+    return bool(_hooks)
+
+
+def start_timer() -> float | None:
+    return time.perf_counter() if _hooks else None
+
+
+def stop_timer(start: float | None, stage: str, name: str | None = None) -> None:
+    if start is not None:
+        emit(stage, name, time.perf_counter() - start)
+
+
+def emit(stage: str, name: str | None = None, seconds: float = 0.) -> None:
+    for hook in _hooks:
+        hook(stage, name, seconds)
+
+
+def instrumented(stage: str) -> Callable:
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _hooks:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                emit(stage, None, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+class Metrics(object):
+    '''
+    Hook aggregating call counts and seconds per stage and per rule, and rule hits and skips, in process.
+
+        metrics = register_hook(Metrics())
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (stage, rule name or None) -> [count, seconds]
+        self._totals: Dict[Tuple[str, str | None], List[float]] = {}
+
+    def __call__(self, stage: str, name: str | None, seconds: float) -> None:
+        with self._lock:
+            totals = self._totals.get((stage, name))
+            if totals is None:
+                totals = self._totals[stage, name] = [0, 0.]
+            totals[0] += 1
+            totals[1] += seconds
+
+    def reset(self) -> None:
+        with self._lock:
+            self._totals = {}
+
+    def to_dict(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        stages = {}
+        rules = {}
+        with self._lock:
+            totals = sorted(self._totals.items(), key=lambda item: (item[0][0], item[0][1] or ''))
+        for (stage, name), (count, seconds) in totals:
+            if stage == RULE_HIT_STAGE:
+                rules.setdefault(name, {'count': 0, 'seconds': 0., 'hits': 0, 'skips': 0})['hits'] = count
+            elif stage == RULE_SKIP_STAGE:
+                rules.setdefault(name, {'count': 0, 'seconds': 0., 'hits': 0, 'skips': 0})['skips'] = count
+            elif stage == RULE_QUERY_STAGE:
+                rule = rules.setdefault(name, {'count': 0, 'seconds': 0., 'hits': 0, 'skips': 0})
+                rule['count'] = count
+                rule['seconds'] = seconds
+            else:
+                stage_totals = stages.setdefault(stage, {'count': 0, 'seconds': 0.})
+                stage_totals['count'] += count
+                stage_totals['seconds'] += seconds
+        return {'stages': stages, 'rules': rules}
+
+    def to_prometheus(self, prefix: str = 'truther') -> str:
+        metrics = self.to_dict()
+        lines = []
+        for metric, kind, label, values, field in [
+            ('stage_calls_total', 'counter', 'stage', metrics['stages'], 'count'),
+            ('stage_seconds_total', 'counter', 'stage', metrics['stages'], 'seconds'),
+            ('rule_calls_total', 'counter', 'rule', metrics['rules'], 'count'),
+            ('rule_seconds_total', 'counter', 'rule', metrics['rules'], 'seconds'),
+            ('rule_hits_total', 'counter', 'rule', metrics['rules'], 'hits'),
+            ('rule_skips_total', 'counter', 'rule', metrics['rules'], 'skips'),
+        ]:
+            lines.append(f'# TYPE {prefix}_{metric} {kind}')
+            for name, totals in values.items():
+                lines.append(f'{prefix}_{metric}{{{label}="{name}"}} {totals[field]}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str, prefix: str = 'truther') -> None:
+        with open(path, 'w') as prometheus_file:
+            prometheus_file.write(self.to_prometheus(prefix))
@@ -0,0 +1,166 @@
+from typing import TYPE_CHECKING, Dict, FrozenSet, Iterable, List, NamedTuple, Set, Tuple
+
+LexiconMatches = Tuple[Set[int], Set[int]]
+# (tokens, veridicality element class)
+Pattern = Tuple[Tuple[str, ...], str]
+
+if TYPE_CHECKING:
+    from truther.sentence import Sentence
+
+_PATTERN_END = object()
+
+
+class _MatcherState(NamedTuple):
+    # Never changed once made: add_pattern and remove_pattern make a new state, sharing the
+    # unchanged trie nodes, and swap it in with one assignment, so that threads matching
+    # meanwhile see either all of a change or none of it
+    # pattern id -> pattern, or None once removed
+    patterns: Tuple[Pattern | None, ...]
+    trie: Dict
+    # Ids are in lexicon order until a pattern is added
+    ids_in_order: bool
+
+
+class LexiconMatcher(object):
+    '''
+    Token trie compiled from the veridicality element patterns.
+
+    A single left-to-right walk over a sentence's tokens and lemmas finds every pattern
+    which occurs in it. Only those patterns are then merged, in lexicon (longest first)
+    order, so the labels are the same as trying every pattern in turn.
+
+    Patterns are identified by their index in the patterns given, and patterns added later
+    by add_pattern get the following ids. Removed patterns leave their id unused, so that
+    matches found before a change still refer to the same patterns. Changes may be made
+    while other threads match, but not concurrently with each other.
+    '''
+
+    def __init__(self, patterns: Iterable[Pattern]):
+        patterns = tuple(patterns)
+        trie = {}
+        for pattern_i, (tokens, _) in enumerate(patterns):
+            node = trie
+            for token in tokens:
+                node = node.setdefault(token, {})
+            node[_PATTERN_END] = node.get(_PATTERN_END, ()) + (pattern_i,)
+        self._state = _MatcherState(patterns, trie, True)
+        # Only used by add_pattern and remove_pattern
+        self._pattern_ids: Dict[Pattern, List[int]] = {}
+        for pattern_i, pattern in enumerate(patterns):
+            self._pattern_ids.setdefault(pattern, []).append(pattern_i)
+        # (state, hashes of its patterns' first tokens), built on first use, so that spaCy is
+        # only imported when matching Docs
+        self._first_token_hashes: Tuple[_MatcherState, FrozenSet[int]] | None = None
+
+    def add_pattern(self, pattern: Pattern) -> int:
+        tokens, _ = pattern
+        state = self._state
+        pattern_i = len(state.patterns)
+        trie = node = dict(state.trie)
+        for token in tokens:
+            child = dict(node.get(token, {}))
+            node[token] = child
+            node = child
+        node[_PATTERN_END] = node.get(_PATTERN_END, ()) + (pattern_i,)
+        self._pattern_ids.setdefault(pattern, []).append(pattern_i)
+        self._state = _MatcherState(state.patterns + (pattern,), trie, False)
+        return pattern_i
+
+    def remove_pattern(self, pattern: Pattern) -> None:
+        tokens, _ = pattern
+        pattern_ids = self._pattern_ids.pop(pattern, ())
+        if not pattern_ids:
+            return
+        state = self._state
+        patterns = list(state.patterns)
+        for pattern_i in pattern_ids:
+            patterns[pattern_i] = None
+        path = [dict(state.trie)]
+        for token in tokens:
+            child = dict(path[-1][token])
+            path[-1][token] = child
+            path.append(child)
+        pattern_ends = tuple(pattern_i for pattern_i in path[-1][_PATTERN_END] if pattern_i not in pattern_ids)
+        if pattern_ends:
+            path[-1][_PATTERN_END] = pattern_ends
+        else:
+            del path[-1][_PATTERN_END]
+        # Prune the nodes left without patterns
+        for token, node, parent in zip(reversed(tokens), reversed(path), reversed(path[:-1])):
+            if node:
+                break
+            del parent[token]
+        self._state = _MatcherState(tuple(patterns), path[0], state.ids_in_order)
+
+    def get_patterns(self) -> Tuple[Pattern, ...]:
+        # Patterns not removed, in lexicon order
+        return tuple(sorted((pattern for pattern in self._state.patterns if pattern is not None),
+                            key=_get_pattern_order))
+
+    def get_indexed_patterns(self) -> Tuple[Pattern | None, ...]:
+        return self._state.patterns
+
+    def may_match(self, token_hashes: Iterable[int]) -> bool:
+        # False when no pattern can start at any of the hashed tokens or lemmas
+        state = self._state
+        first_token_hashes = self._first_token_hashes
+        if first_token_hashes is None or first_token_hashes[0] is not state:
+            from spacy.strings import hash_string
+
+            first_token_hashes = self._first_token_hashes = (state, frozenset(
+                hash_string(pattern[0][0]) for pattern in state.patterns if pattern is not None and pattern[0]
+            ))
+        return not first_token_hashes[1].isdisjoint(token_hashes)
+
+    def find_patterns(self, sentence: 'Sentence') -> LexiconMatches:
+        trie = self._state.trie
+        return (_find_patterns(trie, sentence._index_tok),
+                _find_patterns(trie, sentence._index_lemma))
+
+    def label_sentence(self,
+                       sentence: 'Sentence',
+                       lexicon_matches: LexiconMatches | None = None) -> 'Sentence':
+        # Merging never creates a match (merged text contains spaces), so patterns
+        # absent from the unmerged sentence can be skipped, and matches found on a
+        # sentence can be reused for any sentence derived from it by merges.
+        if lexicon_matches is None:
+            lexicon_matches = self.find_patterns(sentence)
+        tok_matches, lemma_matches = lexicon_matches
+        state = self._state
+        patterns = state.patterns
+        matches = tok_matches | lemma_matches
+        if state.ids_in_order:
+            matches = sorted(matches)
+        else:
+            matches = sorted((pattern_i for pattern_i in matches if patterns[pattern_i] is not None),
+                             key=lambda pattern_i: _get_pattern_order(patterns[pattern_i]))
+        for pattern_i in matches:
+            if patterns[pattern_i] is None:
+                # removed since the matches were found
+                continue
+            pattern, label = patterns[pattern_i]
+            if pattern_i in tok_matches:
+                sentence = sentence.search_and_merge(pattern, label)
+            if pattern_i in lemma_matches:
+                sentence = sentence.search_and_merge_lemmas(pattern, label)
+        return sentence
+
+
+def _find_patterns(trie: Dict, index_text: Dict[int, str]) -> Set[int]:
+    found = set()
+    for start_i in index_text:
+        node = trie
+        tok_i = start_i
+        while tok_i in index_text:
+            node = node.get(index_text[tok_i])
+            if node is None:
+                break
+            found.update(node.get(_PATTERN_END, ()))
+            tok_i += 1
+    return found
+
+
+def _get_pattern_order(pattern: Pattern) -> Tuple:
+    # Longest patterns first, as sorted by VeridicalityElements
+    tokens, label = pattern
+    return -len(tokens), tokens, label
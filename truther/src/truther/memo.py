@@ -0,0 +1,67 @@
+from collections import OrderedDict
+from typing import Any, Hashable, NamedTuple
+
+LRU_EVICTION = 'lru'
+FIFO_EVICTION = 'fifo'
+
+
+class MemoStats(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int | None
+    currsize: int
+
+
+class MemoCache(object):
+    '''
+    Bounded mapping which counts hits and misses. When full, it evicts the least recently
+    used entry ('lru') or the oldest inserted entry ('fifo'). A maxsize of None never
+    evicts, and a maxsize of 0 stores nothing.
+    '''
+
+    def __init__(self, maxsize: int | None = 10000, eviction: str = LRU_EVICTION):
+        if eviction not in (LRU_EVICTION, FIFO_EVICTION):
+            raise ValueError(f'Unknown eviction policy {eviction!r}, expected '
+                             f'{LRU_EVICTION!r} or {FIFO_EVICTION!r}')
+        self.maxsize = maxsize
+        self.eviction = eviction
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.hits += 1
+        if self.eviction == LRU_EVICTION:
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize == 0:
+            return
+        self._entries[key] = value
+        if self.eviction == LRU_EVICTION:
+            self._entries.move_to_end(key)
+        if self.maxsize is not None and len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = self.misses = 0
+
+    def get_stats(self) -> MemoStats:
+        return MemoStats(self.hits, self.misses, self.maxsize, len(self._entries))
+
+
+def normalize_text(text: str) -> str:
+    return ' '.join(text.split())
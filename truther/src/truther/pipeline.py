@@ -0,0 +1,129 @@
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from spacy.language import Language
+from spacy.tokens import Doc, Span
+from spacy.util import minibatch
+
+from truther.sentence import Sentence
+from truther.veridicality_elements import VeridicalityElements, get_veridicality_elements
+from truther.veridicity import PreparedSentence, VeridicityResult, _get_merged_sentence_veridicity, prepare_sentence
+
+FACTORY_NAME = 'truther'
+
+# One dict per proposition scored, with its text, (start, end) token span in the doc (None
+# when it was not found), veridicity, reason and chain. They only hold plain values, so that
+# they are kept in DocBin user data (DocBin(store_user_data=True)) and by nlp.pipe's worker
+# processes.
+DOC_EXTENSION = 'veridicities'
+# The veridicity of a span scored as a proposition, None for other spans
+SPAN_EXTENSION = 'veridicity'
+
+
+class VeridicityComponent(object):
+    '''
+    spaCy pipeline component writing the veridicity of propositions in each doc to
+    Doc._.veridicities and Span._.veridicity. The propositions are the texts given, searched
+    for in each doc as get_veridicities does, and the non-empty spans of doc.spans[spans_key]
+    if given. Each doc is converted and scanned for lexicon elements once, with a lexicon
+    shared by all docs.
+
+        nlp.add_pipe('truther', config={'propositions': ['the sun is yellow']})
+    '''
+
+    def __init__(self,
+                 nlp: Language,
+                 name: str = FACTORY_NAME,
+                 propositions: Iterable[str] = (),
+                 spans_key: str | None = None,
+                 backend: str | None = None,
+                 lexicon_dir: str | None = None):
+        self.name = name
+        self.propositions = [(text, [tok.orth_ for tok in nlp.make_doc(text)]) for text in propositions]
+        self.spans_key = spans_key
+        self.backend = backend
+        self.lexicon_dir = lexicon_dir
+        self.veridicality_elements = _get_component_veridicality_elements(lexicon_dir)
+
+    def __call__(self, doc: Doc) -> Doc:
+        spans = list(doc.spans.get(self.spans_key, ())) if self.spans_key is not None else []
+        if not self.propositions and not spans:
+            doc._.set(DOC_EXTENSION, [])
+            return doc
+        prepared_sentence = prepare_sentence(doc, self.veridicality_elements)
+        veridicities = []
+        for text, proposition_tokens in self.propositions:
+            merged = prepared_sentence.sentence.search_and_merge(proposition_tokens, label='proposition')
+            start = next((tok_i for tok_i, label in merged.label_facts if label == 'proposition'), None)
+            veridicities.append(self._score(prepared_sentence, merged, text,
+                                            None if start is None else (start, start + len(proposition_tokens))))
+        for span in spans:
+            if not len(span):
+                # an empty span has no proposition to merge
+                continue
+            merged = prepared_sentence.sentence.merge_and_label_node_ids(list(range(span.start, span.end)),
+                                                                         'proposition')
+            veridicities.append(self._score(prepared_sentence, merged, span.text, (span.start, span.end)))
+        doc._.set(DOC_EXTENSION, veridicities)
+        return doc
+
+    def pipe(self, stream: Iterable[Doc], batch_size: int = 128) -> Iterator[Doc]:
+        for docs in minibatch(stream, size=batch_size):
+            yield from (self(doc) for doc in docs)
+
+    def __getstate__(self) -> Dict:
+        # The lexicon is loaded again in processes the component is sent to (e.g. by nlp.pipe
+        # with n_process under the spawn start method), rather than pickling its matcher and lock
+        state = self.__dict__.copy()
+        del state['veridicality_elements']
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+        self.veridicality_elements = _get_component_veridicality_elements(self.lexicon_dir)
+
+    def _score(self,
+               prepared_sentence: PreparedSentence,
+               merged: Sentence,
+               text: str,
+               span: Tuple[int, int] | None) -> Dict:
+        # merged is prepared_sentence's sentence with the proposition at span merged in
+        result: VeridicityResult = _get_merged_sentence_veridicity(
+            prepared_sentence=prepared_sentence,
+            sentence=merged,
+            veridicality_elements=self.veridicality_elements,
+            backend=self.backend
+        )
+        return {'proposition': text,
+                'start': None if span is None else span[0],
+                'end': None if span is None else span[1],
+                'veridicity': result.veridicity,
+                'reason': result.reason,
+                'chain': list(result.chain)}
+
+
+@Language.factory(FACTORY_NAME,
+                  default_config={'propositions': [], 'spans_key': None, 'backend': None, 'lexicon_dir': None})
+def make_veridicity_component(nlp: Language,
+                              name: str,
+                              propositions: List[str],
+                              spans_key: str | None,
+                              backend: str | None,
+                              lexicon_dir: str | None) -> VeridicityComponent:
+    return VeridicityComponent(nlp, name, propositions, spans_key, backend, lexicon_dir)
+
+
+def _get_component_veridicality_elements(lexicon_dir: str | None) -> VeridicalityElements:
+    return get_veridicality_elements() if lexicon_dir is None else VeridicalityElements(lexicon_dir=lexicon_dir)
+
+
+def _get_span_veridicity(span: Span) -> str | None:
+    for veridicity in span.doc._.get(DOC_EXTENSION) or ():
+        if veridicity['start'] == span.start and veridicity['end'] == span.end:
+            return veridicity['veridicity']
+    return None
+
+
+if not Doc.has_extension(DOC_EXTENSION):
+    Doc.set_extension(DOC_EXTENSION, default=None)
+if not Span.has_extension(SPAN_EXTENSION):
+    Span.set_extension(SPAN_EXTENSION, getter=_get_span_veridicity)
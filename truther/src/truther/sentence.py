@@ -1,51 +1,313 @@
 from collections import defaultdict
-from typing import List, Tuple, Dict, Set
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Tuple, Dict, Sequence, Set, Mapping
 
-from spacy.tokens.doc import Doc
+import numpy as np
+
+from truther.instrumentation import MAKE_SENTENCE_STAGE, MERGE_STAGE, instrumented
+
+if TYPE_CHECKING:
+    from spacy.tokens.doc import Doc
+
+# Columns of Sentence.attrs
+LOWER_COLUMN, LEMMA_COLUMN, POS_COLUMN, DEP_COLUMN = range(4)
+
+# Views which depend on label_facts; the others are shared by sentences differing only in labels
+_LABEL_INDEXES = ('_labels', '_label_index')
+
+LabelFact = Tuple[int, str]
+
+
+class LabelFacts(object):
+    '''
+    Immutable sequence of (node id, label) facts, in the order they were added. add returns
+    a new sequence which shares this one's facts rather than copying them, so that sentences
+    derived by merges share the facts of the sentences they were derived from.
+    '''
+    __slots__ = ('_fact', '_previous', '_length', '_tuple')
+
+    def __init__(self, facts: Iterable[LabelFact] = ()):
+        # Either all the facts are in _tuple, or the last one is in _fact and the others in
+        # _previous, until the sequence is first iterated
+        self._fact: LabelFact | None = None
+        self._previous: LabelFacts | None = None
+        self._tuple: Tuple[LabelFact, ...] | None = tuple(tuple(fact) for fact in facts)
+        self._length = len(self._tuple)
+
+    def add(self, fact: LabelFact) -> 'LabelFacts':
+        label_facts = LabelFacts()
+        label_facts._fact, label_facts._previous, label_facts._length, label_facts._tuple = (
+            tuple(fact), self, self._length + 1, None
+        )
+        return label_facts
+
+    def __iter__(self) -> Iterator[LabelFact]:
+        if self._tuple is None:
+            added = []
+            label_facts = self
+            while label_facts._tuple is None:
+                added.append(label_facts._fact)
+                label_facts = label_facts._previous
+            added.reverse()
+            self._tuple = label_facts._tuple + tuple(added)
+        return iter(self._tuple)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __contains__(self, fact: LabelFact) -> bool:
+        label_facts = self
+        while label_facts._tuple is None:
+            if label_facts._fact == fact:
+                return True
+            label_facts = label_facts._previous
+        return fact in label_facts._tuple
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, (LabelFacts, list, tuple)):
+            return NotImplemented
+        return len(self) == len(other) and tuple(self) == tuple(other)
+
+    def __hash__(self) -> int:
+        return hash(tuple(self))
+
+    def __repr__(self) -> str:
+        return f'LabelFacts({list(self)!r})'
+
+
+class _cached_view(object):
+    # Like functools.cached_property, without the per-instance lock taken on first access.
+    def __init__(self, function):
+        self.function = function
+        self.name = function.__name__
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        value = instance.__dict__[self.name] = self.function(instance)
+        return value
 
 
 class Sentence(object):
+    '''
+    Dependency parsed sentence whose nodes can be merged.
+
+    Token attributes are columns of interned string ids (as returned by Doc.to_array), shared by
+    every sentence derived from this one. Merges are tracked with a union-find style parent array
+    mapping each token to the id of the node containing it, so a merge only touches the merged
+    span. The toks, lemmas, tok_pos, follows_facts and headof_facts lists, and the indexes built
+    from them, are views created on first use.
+
+    Sentences built without spaCy (see make_sentence) have no Doc, string store or attrs, only
+    the decoded columns.
+
+    Sentences are immutable: merges return new sentences sharing this one's arrays, columns and
+    label facts, so that a sentence can be shared, e.g. between threads, and merged from any
+    number of times.
+    '''
+
     def __init__(self,
-                 doc: Doc,
-                 toks: List[Tuple[int, str]],
-                 lemmas: List[Tuple[int, str]],
-                 tok_pos: List[Tuple[int, str]],
-                 follows_facts: List[Tuple[int, int | None]],
-                 headof_facts: List[Tuple[int, Tuple[int, str]]],
-                 label_facts: List[Tuple[int, str]]):
+                 doc: 'Doc | None',
+                 strings: Mapping[int, str] | None,
+                 attrs: np.ndarray | None,
+                 head_indices: np.ndarray,
+                 label_facts: Iterable[LabelFact] | None = None,
+                 parent: np.ndarray | None = None,
+                 members: Dict[int, Tuple[int, ...]] | None = None,
+                 texts: Dict[int, Tuple[str, str]] | None = None,
+                 columns: List[List[str]] | None = None):
         self.doc = doc
-        self.toks = toks
-        self.lemmas = lemmas
-        self.tok_pos = tok_pos
-        self.follows_facts = follows_facts
-        self.headof_facts = headof_facts
-        self.label_facts = label_facts
-        self._setup()
-
-    def _setup(self):
-        self._tok_index = {}
+        self.strings = strings
+        self.attrs = attrs
+        self.head_indices = head_indices
+        self.label_facts = label_facts if isinstance(label_facts, LabelFacts) else LabelFacts(label_facts or ())
+        # token index -> id of the node containing it
+        self._parent = np.arange(len(head_indices)) if parent is None else parent
+        for array in (attrs, head_indices, self._parent):
+            if array is not None:
+                array.flags.writeable = False
+        # node id -> token indices, and node id -> (text, lemma), for merged nodes only
+        self._members = {} if members is None else members
+        self._texts = {} if texts is None else texts
+        # decoded attribute columns
+        self._columns = [[strings[string_id] for string_id in column]
+                         for column in attrs.T.tolist()] if columns is None else columns
+
+    def _derive(self,
+                parent: np.ndarray,
+                members: Dict[int, Tuple[int, ...]],
+                texts: Dict[int, Tuple[str, str]],
+                label_facts: LabelFacts) -> 'Sentence':
+        return Sentence(doc=self.doc,
+                        strings=self.strings,
+                        attrs=self.attrs,
+                        head_indices=self.head_indices,
+                        label_facts=label_facts,
+                        parent=parent,
+                        members=members,
+                        texts=texts,
+                        columns=self._columns)
+
+    def _relabel(self, label_facts: LabelFacts) -> 'Sentence':
+        # The same nodes with other labels, sharing the views which do not depend on labels
+        sentence = Sentence.__new__(Sentence)
+        sentence.__dict__.update(self.__dict__)
+        for index_name in _LABEL_INDEXES:
+            sentence.__dict__.pop(index_name, None)
+        sentence.label_facts = label_facts
+        return sentence
+
+    def copy(self) -> 'Sentence':
+        # Sentences are immutable, so there is nothing to copy
+        return self
+
+    def to_bytes(self) -> bytes:
+        # The Doc and string store are not serialized; decoded columns are kept instead.
+        import srsly
+
+        return srsly.msgpack_dumps({
+            'attrs': None if self.attrs is None else self.attrs.tolist(),
+            'head_indices': self.head_indices.tolist(),
+            'label_facts': list(self.label_facts),
+            'parent': self._parent.tolist(),
+            'members': list(self._members.items()),
+            'texts': list(self._texts.items()),
+            'columns': self._columns
+        })
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Sentence':
+        import srsly
+
+        msg = srsly.msgpack_loads(data)
+        return cls(doc=None,
+                   strings=None,
+                   attrs=(None if msg['attrs'] is None
+                          else np.array(msg['attrs'], dtype=np.uint64).reshape(-1, len(msg['columns']))),
+                   head_indices=np.array(msg['head_indices'], dtype=np.int64),
+                   label_facts=LabelFacts(msg['label_facts']),
+                   parent=np.array(msg['parent'], dtype=np.int64),
+                   members={i: tuple(node_members) for i, node_members in msg['members']},
+                   texts={i: tuple(text) for i, text in msg['texts']},
+                   columns=msg['columns'])
+
+    def _node_members(self, node_i: int) -> Tuple[int, ...]:
+        return self._members.get(node_i, (node_i,))
+
+    def _node_text(self, node_i: int) -> str:
+        merged = self._texts.get(node_i)
+        return self._columns[LOWER_COLUMN][node_i] if merged is None else merged[0]
+
+    def _node_lemma(self, node_i: int) -> str:
+        merged = self._texts.get(node_i)
+        return self._columns[LEMMA_COLUMN][node_i] if merged is None else merged[1]
+
+    @_cached_view
+    def _node_ids(self) -> List[int]:
+        return np.flatnonzero(self._parent == np.arange(len(self._parent))).tolist()
+
+    @_cached_view
+    def toks(self) -> List[Tuple[int, str]]:
+        return [(i, self._node_text(i)) for i in self._node_ids]
+
+    @_cached_view
+    def lemmas(self) -> List[Tuple[int, str]]:
+        return [(i, self._node_lemma(i)) for i in self._node_ids]
+
+    @_cached_view
+    def tok_pos(self) -> List[Tuple[int, str]]:
+        poses = self._columns[POS_COLUMN]
+        return [(i, poses[tok_i]) for i in self._node_ids for tok_i in self._node_members(i)]
+
+    @_cached_view
+    def follows_facts(self) -> List[Tuple[int, int | None]]:
+        node_ids = self._node_ids
+        follows_facts = list(zip(node_ids, node_ids[1:]))
+        if not self._members and node_ids:
+            follows_facts.append((node_ids[-1], None))
+        return follows_facts
+
+    @_cached_view
+    def headof_facts(self) -> List[Tuple[int, Tuple[int, str]]]:
+        head_indices = self.head_indices
+        head_nodes = np.where(head_indices >= 0, self._parent[np.maximum(head_indices, 0)], -1).tolist()
+        deps = self._columns[DEP_COLUMN]
+        return [(i, (head_nodes[tok_i], deps[tok_i]))
+                for i in self._node_ids
+                for tok_i in self._node_members(i)
+                if head_nodes[tok_i] != i]
+
+    @_cached_view
+    def _tok_index(self) -> Dict[str, List[int]]:
+        tok_index = {}
         for i, tok in self.toks:
-            self._tok_index.setdefault(tok, []).append(i)
+            tok_index.setdefault(tok, []).append(i)
+        return tok_index
 
-        self._lemma_index = {}
+    @_cached_view
+    def _lemma_index(self) -> Dict[str, List[int]]:
+        lemma_index = {}
         for i, lemma in self.lemmas:
-            self._lemma_index.setdefault(lemma, []).append(i)
+            lemma_index.setdefault(lemma, []).append(i)
+        return lemma_index
+
+    @_cached_view
+    def _index_tok(self) -> Dict[int, str]:
+        return dict(self.toks)
+
+    @_cached_view
+    def _index_lemma(self) -> Dict[int, str]:
+        return dict(self.lemmas)
+
+    @_cached_view
+    def _dep_index(self) -> Dict[str, Set[Tuple[int, int]]]:
+        return self._headof_indexes[0]
+
+    @_cached_view
+    def _dauts(self) -> Dict[int, Set[Tuple[int, str]]]:
+        return self._headof_indexes[1]
 
-        self._index_tok = {i: tok for i, tok in self.toks}
-        self._index_lemma = {i: lemma for i, lemma in self.lemmas}
-        self._dep_index = defaultdict(set)
-        self._dauts: Dict[int, Set[Tuple[int, str]]] = defaultdict(set)
-        self._heads: Dict[int, Set[Tuple[int, str]]] = defaultdict(set)
+    @_cached_view
+    def _heads(self) -> Dict[int, Set[Tuple[int, str]]]:
+        return self._headof_indexes[2]
+
+    @_cached_view
+    def _headof_indexes(self):
+        dep_index = defaultdict(set)
+        dauts: Dict[int, Set[Tuple[int, str]]] = defaultdict(set)
+        heads: Dict[int, Set[Tuple[int, str]]] = defaultdict(set)
         for daut, (head, dep) in self.headof_facts:
-            self._dep_index[dep].add((daut, head))
-            self._dauts[head].add((daut, dep))
-            self._heads[daut].add((head, dep))
-        self._labels = defaultdict(set)
-        self._label_index = defaultdict(set)
+            dep_index[dep].add((daut, head))
+            dauts[head].add((daut, dep))
+            heads[daut].add((head, dep))
+        return dep_index, dauts, heads
+
+    @_cached_view
+    def _poses(self) -> Dict[int, Set[str]]:
+        poses = defaultdict(set)
+        for tok_i, pos in self.tok_pos:
+            poses[tok_i].add(pos)
+        return poses
+
+    @_cached_view
+    def _labels(self) -> Dict[int, Set[str]]:
+        labels = defaultdict(set)
         for tok_i, label in self.label_facts:
-            self._label_index[label].add(tok_i)
-            self._labels[tok_i].add(label)
-        return self
+            labels[tok_i].add(label)
+        return labels
+
+    @_cached_view
+    def _label_index(self) -> Dict[str, Set[int]]:
+        label_index = defaultdict(set)
+        for tok_i, label in self.label_facts:
+            label_index[label].add(tok_i)
+        return label_index
+
+    def _has_label(self, node_i: int, label: str) -> bool:
+        # Through the label index if it was built, else through the facts, which is cheaper than building it
+        labels = self.__dict__.get('_labels')
+        if labels is not None:
+            return label in labels.get(node_i, ())
+        return (node_i, label) in self.label_facts
 
     def get_heads(self) -> Dict[int, Set[Tuple[int, str]]]:
         return self._heads
@@ -58,14 +320,15 @@ class Sentence(object):
     def search_and_merge(self, search: List[str], label: str) -> 'Sentence':
         try:
             start_indices = self._tok_index[search[0]]
-        except KeyError:
+        except (KeyError, IndexError):
+            # the first token is missing, or there are no tokens
             return self
         for start_idx in start_indices:
-            if start_idx + len(search) > len(self.toks):
+            if start_idx + len(search) > len(self._node_ids):
                 return self
             elements_to_merge = list(range(start_idx, start_idx + len(search)))
             # ensure that all search tokens, and not just first, match
-            if all(self._index_tok[tok_i] == search[search_i]
+            if all(self._index_tok.get(tok_i) == search[search_i]
                    for search_i, tok_i in enumerate(elements_to_merge)):
                 return self.merge_and_label_node_ids(elements_to_merge, label)
         return self
@@ -73,88 +336,85 @@ class Sentence(object):
     def search_and_merge_lemmas(self, search: List[str], label: str) -> 'Sentence':
         try:
             start_indices = self._lemma_index[search[0]]
-        except KeyError:
+        except (KeyError, IndexError):
+            # the first token is missing, or there are no tokens
             return self
         for start_idx in start_indices:
-            if start_idx + len(search) > len(self.lemmas):
+            if start_idx + len(search) > len(self._node_ids):
                 return self
             elements_to_merge = list(range(start_idx, start_idx + len(search)))
-            if all(self._index_lemma[tok_i] == search[search_i]
+            if all(self._index_lemma.get(tok_i) == search[search_i]
                    for search_i, tok_i in enumerate(elements_to_merge)):
                 return self.merge_and_label_node_ids(elements_to_merge, label)
         return self
 
+    @instrumented(MERGE_STAGE)
     def merge_and_label_node_ids(self, node_ids: List[int] | tuple, label: str) -> 'Sentence':
-        if (node_ids[0], label) not in self.label_facts:
-            self.label_facts.append((node_ids[0], label))
+        label_facts = self.label_facts
+        if not self._has_label(node_ids[0], label):
+            label_facts = label_facts.add((node_ids[0], label))
 
         if len(node_ids) == 1:
-            return self._setup()
-
-        new_toks = []
-        new_lemmas = []
-        new_tok_pos = []
-        new_follows_facts = []
-        new_headof_facts = []
-        last_tok = None
-        headof_dict = {}
-        for tok_i, head_i in self.headof_facts:
-            headof_dict.setdefault(tok_i, []).append(head_i)
-        for tok_i, tok in self.toks:
-            cur_tok = None
-            if tok_i not in node_ids:
-                cur_tok = (tok_i, tok)
-                new_toks.append(cur_tok)
-                for lemma_id, lemma in self.lemmas:
-                    if lemma_id == tok_i:
-                        new_lemmas.append((tok_i, lemma))
-                for pos_id, pos in self.tok_pos:
-                    if pos_id == tok_i:
-                        new_tok_pos.append((tok_i, pos))
-                for head_i, rel in headof_dict[tok_i]:
-                    if head_i in node_ids:
-                        new_headof_facts.append((tok_i, (node_ids[0], rel)))
-                    else:
-                        new_headof_facts.append((tok_i, (head_i, rel)))
-            elif tok_i == node_ids[0]:
-                new_string = ' '.join([tok for i, tok in self.toks
-                                       if i in node_ids])
-                new_i = node_ids[0]
-                cur_tok = (new_i, new_string)
-                new_toks.append(cur_tok)
-                new_lemmas.append((new_i, ' '.join([lemma for i, lemma in self.lemmas
-                                                    if i in node_ids])))
-
-                for el_to_merge_i in node_ids:
-                    new_tok_pos.append((tok_i, self.tok_pos[el_to_merge_i][1]))
-
-                    for head_i, rel in headof_dict[el_to_merge_i]:
-                        if head_i not in node_ids:
-                            new_headof_facts.append((new_i, (head_i, rel)))
-            if cur_tok is not None and last_tok is not None:
-                new_follows_facts.append((last_tok[0], cur_tok[0]))
-            if cur_tok is not None:
-                last_tok = cur_tok
-        return Sentence(doc=self.doc,
-                        toks=new_toks,
-                        lemmas=new_lemmas,
-                        tok_pos=new_tok_pos,
-                        follows_facts=new_follows_facts,
-                        headof_facts=new_headof_facts,
-                        label_facts=self.label_facts)
-
-
-def make_sentence_from_doc(doc: Doc) -> Sentence:
-    toks = [(tok.i, tok.lower_) for tok in doc]
-    lemmas = [(tok.i, tok.lemma_) for tok in doc]
-    tok_pos = [(tok.i, tok.pos_) for tok in doc]
-    tokidx = [i for i, tok in toks]
-    follows_facts = list(zip(tokidx, (tokidx[1:] + [None])))
-    headof_facts = [(tok.i, (-1 if tok.head == tok else tok.head.i, tok.dep_)) for tok in doc]
+            return self if label_facts is self.label_facts else self._relabel(label_facts)
+
+        new_i = node_ids[0]
+        node_ids = [i for i in node_ids if self._parent[i] == i]
+        new_members = []
+        for node_i in node_ids:
+            new_members.extend(self._node_members(node_i))
+        ordered_node_ids = sorted(node_ids)
+        merged_ids = set(node_ids)
+        members = {i: node_members for i, node_members in self._members.items() if i not in merged_ids}
+        members[new_i] = tuple(new_members)
+        texts = {i: text for i, text in self._texts.items() if i not in merged_ids}
+        texts[new_i] = (' '.join(self._node_text(i) for i in ordered_node_ids),
+                        ' '.join(self._node_lemma(i) for i in ordered_node_ids))
+        parent = self._parent.copy()
+        parent[new_members] = new_i
+        return self._derive(parent, members, texts, label_facts)
+
+
+@instrumented(MAKE_SENTENCE_STAGE)
+def make_sentence_from_doc(doc: 'Doc') -> Sentence:
+    from spacy.attrs import DEP, HEAD, LEMMA, LOWER, POS
+
+    attrs = doc.to_array([LOWER, LEMMA, POS, DEP, HEAD])
+    token_indices = np.arange(len(doc))
+    head_indices = token_indices + attrs[:, 4].astype(np.int64)
+    head_indices[head_indices == token_indices] = -1
     return Sentence(doc=doc,
-                    toks=toks,
-                    lemmas=lemmas,
-                    tok_pos=tok_pos,
-                    follows_facts=follows_facts,
-                    headof_facts=headof_facts,
-                    label_facts=[])
+                    strings=doc.vocab.strings,
+                    attrs=attrs[:, :4],
+                    head_indices=head_indices)
+
+
+@instrumented(MAKE_SENTENCE_STAGE)
+def make_sentence(words: Sequence[str],
+                  lemmas: Sequence[str],
+                  pos: Sequence[str],
+                  heads: Sequence[int],
+                  deps: Sequence[str]) -> Sentence:
+    '''
+    Builds a Sentence from an existing dependency parse, without spaCy. Each argument has one
+    entry per token:
+
+    - words: token texts, matched against propositions and the lexicon lowercased
+    - lemmas: token lemmas
+    - pos: universal part of speech tags (NOUN, VERB, ADJ, ...)
+    - heads: index (from 0) of each token's head, or -1 (or the token's own index) for a root
+    - deps: dependency labels, in spaCy's English (ClearNLP) scheme (nsubj, dobj, ccomp, ...),
+      which the veridicality rules are written against
+    '''
+    if not len(words) == len(lemmas) == len(pos) == len(heads) == len(deps):
+        raise ValueError(f"Expected one lemma, POS tag, head and dependency label per word, got "
+                         f"{len(words)} words, {len(lemmas)} lemmas, {len(pos)} POS tags, "
+                         f"{len(heads)} heads and {len(deps)} dependency labels")
+    head_indices = np.array(heads, dtype=np.int64).reshape(-1)
+    if ((head_indices < -1) | (head_indices >= len(head_indices))).any():
+        raise ValueError(f"Head indices must be between -1 and {len(head_indices) - 1}")
+    head_indices[head_indices == np.arange(len(head_indices))] = -1
+    return Sentence(doc=None,
+                    strings=None,
+                    attrs=None,
+                    head_indices=head_indices,
+                    columns=[[word.lower() for word in words], list(lemmas), list(pos), list(deps)])
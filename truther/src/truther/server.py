@@ -0,0 +1,411 @@
+import argparse
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+from truther.veridicality_elements import VeridicalityElements
+from truther.veridicity import VeridicityMemo, VeridicityResult, get_proposition_veridicity_many
+
+if TYPE_CHECKING:
+    from spacy.language import Language
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+LATENCY_PERCENTILES = (50, 90, 99)
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+class MicroBatcher(object):
+    '''
+    Scores (sentence, proposition) text pairs submitted concurrently from an event loop in
+    micro-batches. A batch is closed once it has max_batch_size pairs, or max_wait seconds
+    after its first pair arrived, then parsed with nlp.pipe and scored in an executor, so
+    that the event loop is never blocked. Batches are scored one at a time, while the next
+    one fills up. Without an executor, a single thread is used, as nlp is not thread safe.
+
+        async with MicroBatcher(nlp) as batcher:
+            result = await batcher.score('He lied that the sun is yellow.', 'the sun is yellow')
+    '''
+
+    def __init__(self,
+                 nlp: 'Language',
+                 max_batch_size: int = 64,
+                 max_wait: float = 0.005,
+                 backend: str | None = None,
+                 veridicality_elements: VeridicalityElements | None = None,
+                 memo: VeridicityMemo | None = None,
+                 executor: Executor | None = None,
+                 latency_window: int = 10000):
+        self.nlp = nlp
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.backend = backend
+        self.veridicality_elements = veridicality_elements
+        self.memo = memo
+        self._executor = executor
+        self._owns_executor = executor is None
+        # Made by start, in the running event loop
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        # Seconds from submission to result of the latest requests
+        self._latencies = deque(maxlen=latency_window)
+        self._requests = 0
+        self._batches = 0
+        self._batched_pairs = 0
+        self._in_flight = 0
+
+    async def __aenter__(self) -> 'MicroBatcher':
+        return await self.start()
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    async def start(self) -> 'MicroBatcher':
+        if self._owns_executor:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='truther-batcher')
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    async def stop(self) -> None:
+        # Requests still queued or being scored fail with CancelledError
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        while not self._queue.empty():
+            self._queue.get_nowait()[2].cancel()
+        self._task = None
+        if self._owns_executor:
+            self._executor.shutdown(wait=False)
+
+    async def score(self, sentence: str, proposition: str) -> VeridicityResult:
+        if self._task is None:
+            raise RuntimeError('The MicroBatcher is not started')
+        future = asyncio.get_running_loop().create_future()
+        start = time.perf_counter()
+        self._requests += 1
+        self._queue.put_nowait((sentence, proposition, future))
+        result = await future
+        self._latencies.append(time.perf_counter() - start)
+        return result
+
+    def get_stats(self) -> Dict:
+        '''
+        Returns the number of pairs waiting for a batch (queue_depth) and being scored
+        (in_flight), request and batch counts, and percentiles of the latencies of the latest
+        requests, in seconds.
+        '''
+        latencies = sorted(self._latencies)
+        latency_seconds = {f'p{percentile}': _get_percentile(latencies, percentile)
+                           for percentile in LATENCY_PERCENTILES}
+        latency_seconds['max'] = latencies[-1] if latencies else None
+        return {'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+                'in_flight': self._in_flight,
+                'requests': self._requests,
+                'batches': self._batches,
+                'mean_batch_size': self._batched_pairs / self._batches if self._batches else 0.,
+                'latency_seconds': latency_seconds}
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Requests whose callers have gone away are not scored
+            batch = [item for item in batch if not item[2].done()]
+            if not batch:
+                continue
+            self._in_flight = len(batch)
+            try:
+                results = await loop.run_in_executor(self._executor, self._score_batch,
+                                                     [(sentence, proposition) for sentence, proposition, _ in batch])
+            except asyncio.CancelledError:
+                for _, _, future in batch:
+                    future.cancel()
+                raise
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for (_, _, future), result in zip(batch, results):
+                    if future.done():
+                        continue
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+            finally:
+                self._in_flight = 0
+                self._batches += 1
+                self._batched_pairs += len(batch)
+
+    def _score_batch(self, pairs: List[Tuple[str, str]]) -> List[VeridicityResult | Exception]:
+        try:
+            return self._score_pairs(pairs)
+        except Exception:
+            if len(pairs) == 1:
+                raise
+        # A pair failed the whole batch; score the pairs one at a time, so that only its own
+        # request fails
+        results = []
+        for pair in pairs:
+            try:
+                results.extend(self._score_pairs([pair]))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def _score_pairs(self, pairs: List[Tuple[str, str]]) -> List[VeridicityResult]:
+        return list(get_proposition_veridicity_many(pairs,
+                                                    self.nlp,
+                                                    batch_size=self.max_batch_size,
+                                                    veridicality_elements=self.veridicality_elements,
+                                                    backend=self.backend,
+                                                    memo=self.memo,
+                                                    with_reasons=True))
+
+
+class VeridicityServer(object):
+    '''
+    HTTP/1.1 server, over TCP or a Unix socket, scoring the pairs it is sent with a
+    MicroBatcher. It only uses the standard library:
+
+        POST /veridicity  {"sentence": ..., "proposition": ...}
+                          -> {"veridicity": ..., "reason": ..., "chain": [...]}
+        POST /veridicity  {"pairs": [[sentence, proposition], ...]} -> {"results": [...]}
+        GET /stats        MicroBatcher.get_stats()
+    '''
+
+    def __init__(self,
+                 batcher: MicroBatcher,
+                 host: str = DEFAULT_HOST,
+                 port: int = DEFAULT_PORT,
+                 unix_socket: str | None = None):
+        self.batcher = batcher
+        self.host = host
+        self.port = port
+        self.unix_socket = unix_socket
+        self._server: asyncio.AbstractServer | None = None
+
+    async def __aenter__(self) -> 'VeridicityServer':
+        return await self.start()
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    async def start(self) -> 'VeridicityServer':
+        # Port 0 binds a free port, which is then stored in port
+        if self.unix_socket is not None:
+            self._server = await asyncio.start_unix_server(self._handle, path=self.unix_socket)
+        else:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+            self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self) -> None:
+        await self._server.serve_forever()
+
+    async def stop(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await _read_message(reader, is_request=True)
+                except ValueError as e:
+                    writer.write(_format_message(400, {'error': str(e)}, keep_alive=False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                (method, path), headers, body = request
+                status, payload = await self._dispatch(method, path, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(_format_message(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, Dict]:
+        if path == '/stats':
+            if method != 'GET':
+                return 405, {'error': 'Expected GET'}
+            return 200, self.batcher.get_stats()
+        if path != '/veridicity':
+            return 404, {'error': f'Unknown path {path}'}
+        if method != 'POST':
+            return 405, {'error': 'Expected POST'}
+        try:
+            data = json.loads(body)
+            if 'pairs' in data:
+                pairs = [(sentence, proposition) for sentence, proposition in data['pairs']]
+            else:
+                pairs = [(data['sentence'], data['proposition'])]
+            if not all(isinstance(text, str) for pair in pairs for text in pair):
+                raise TypeError('Sentences and propositions must be strings')
+            if not all(proposition.strip() for _, proposition in pairs):
+                raise ValueError('Propositions must not be empty')
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {'error': f'Expected {{"sentence": ..., "proposition": ...}} or {{"pairs": [...]}}: {e}'}
+        try:
+            results = await asyncio.gather(*(self.batcher.score(sentence, proposition)
+                                             for sentence, proposition in pairs))
+        except Exception as e:
+            return 500, {'error': repr(e)}
+        if 'pairs' in data:
+            return 200, {'results': [_result_to_dict(result) for result in results]}
+        return 200, _result_to_dict(results[0])
+
+
+async def get_proposition_veridicity_async(sentence: str,
+                                           proposition: str,
+                                           host: str = DEFAULT_HOST,
+                                           port: int = DEFAULT_PORT,
+                                           unix_socket: str | None = None) -> VeridicityResult:
+    '''
+    Scores a (sentence, proposition) text pair with a VeridicityServer, without blocking
+    the event loop.
+    '''
+    data = await _request('POST', '/veridicity', {'sentence': sentence, 'proposition': proposition},
+                          host, port, unix_socket)
+    return VeridicityResult(data['veridicity'], data['reason'], tuple(data['chain']))
+
+
+async def get_server_stats_async(host: str = DEFAULT_HOST,
+                                 port: int = DEFAULT_PORT,
+                                 unix_socket: str | None = None) -> Dict:
+    return await _request('GET', '/stats', None, host, port, unix_socket)
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog='truther-server',
+        description='Serve veridicity scores over HTTP, scoring concurrent requests in micro-batches.'
+    )
+    parser.add_argument('--model', default='en_core_web_lg', help='spaCy model to parse sentences with.')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--unix-socket', default=None, help='Unix socket path to listen on instead of TCP.')
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=5.,
+                        help='Milliseconds a batch waits for more pairs after its first one.')
+    parser.add_argument('--backend', choices=('kanren', 'native'), default=None,
+                        help='Rule backend, see truther.veridicality_transformation.')
+    args = parser.parse_args(argv)
+
+    import spacy
+    from truther.veridicity import warmup
+    nlp = spacy.load(args.model)
+    # The server does not fork, so nothing is gained by freezing the warmup objects
+    warmup(nlp, backends=[args.backend], freeze=False)
+    batcher = MicroBatcher(nlp, max_batch_size=args.max_batch_size, max_wait=args.max_wait_ms / 1000.,
+                           backend=args.backend)
+    asyncio.run(_serve(VeridicityServer(batcher, args.host, args.port, args.unix_socket)))
+
+
+async def _serve(server: VeridicityServer) -> None:
+    async with server.batcher, server:
+        await server.serve_forever()
+
+
+async def _request(method: str,
+                   path: str,
+                   payload: Dict | None,
+                   host: str,
+                   port: int,
+                   unix_socket: str | None) -> Dict:
+    if unix_socket is not None:
+        reader, writer = await asyncio.open_unix_connection(unix_socket)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    try:
+        body = b'' if payload is None else json.dumps(payload).encode('utf8')
+        writer.write(f'{method} {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n'
+                     f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n'.encode('latin1') + body)
+        await writer.drain()
+        response = await _read_message(reader, is_request=False)
+    finally:
+        writer.close()
+    if response is None:
+        raise ConnectionError('The truther server closed the connection without responding')
+    (status, _), _, body = response
+    data = json.loads(body)
+    if status != '200':
+        raise RuntimeError(f"The truther server responded with status {status}: {data.get('error')}")
+    return data
+
+
+async def _read_message(reader: asyncio.StreamReader,
+                        is_request: bool) -> Tuple[Tuple[str, str], Dict[str, str], bytes] | None:
+    # ((method, path) of a request or (status, reason) of a response, lowercased headers, body),
+    # or None if the connection was closed first
+    start_line = await reader.readline()
+    if not start_line.strip():
+        return None
+    parts = start_line.decode('latin1').split(None, 2)
+    if len(parts) < 2:
+        raise ValueError(f'Malformed start line {start_line!r}')
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    try:
+        content_length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise ValueError(f"Malformed Content-Length {headers['content-length']!r}")
+    body = await reader.readexactly(content_length)
+    if is_request:
+        return (parts[0], parts[1]), headers, body
+    return (parts[1], parts[2].strip() if len(parts) > 2 else ''), headers, body
+
+
+def _format_message(status: int, payload: Dict, keep_alive: bool) -> bytes:
+    body = json.dumps(payload).encode('utf8')
+    return (f'HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\nConnection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'
+            .encode('latin1') + body)
+
+
+def _result_to_dict(result: VeridicityResult) -> Dict:
+    return {'veridicity': result.veridicity, 'reason': result.reason, 'chain': list(result.chain)}
+
+
+def _get_percentile(sorted_values: List[float], percentile: float) -> float | None:
+    # Nearest rank
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(len(sorted_values) * percentile / 100) - 1)]
+
+
+if __name__ == '__main__':
+    main()
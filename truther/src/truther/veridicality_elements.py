@@ -1,19 +1,246 @@
+import hashlib
+import json
 import os
+import threading
+import warnings
 from glob import glob
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+
+from truther.lexicon_matcher import LexiconMatcher
+
+VeridicalityPattern = Tuple[Tuple[str, ...], str]
+
+LEXICON_DIR = os.path.join(os.path.dirname(__file__), 'lexicon')
+# Written by the build (see setup.py), so only present in built packages
+COMPILED_LEXICON_PATH = os.path.join(os.path.dirname(__file__), 'lexicon.json')
+COMPILED_LEXICON_FORMAT_VERSION = 1
 
 
 class VeridicalityElements(object):
-    def __init__(self):
-        unsorted_patterns = []
-        for file_name in self._list_veridicality_element_files():
-            for line in open(file_name).readlines():
-                ve_class_name = os.path.basename(file_name)
+    '''
+    The veridicality element patterns, longest first, and the matcher compiled from them.
+
+    The text files of a lexicon directory (one file per class, one pattern per line) are the
+    source of the lexicon. By default the package's lexicon is read from the artifact written
+    by compile_lexicon at build time, in a single read, and from its text files when there is
+    no artifact (e.g. in a source checkout). A lexicon directory or compiled artifact path can
+    be given instead.
+
+    Patterns can be added and removed in memory on top of the files with add_patterns and
+    remove_patterns, and the files re-read with reload (see LexiconWatcher). The matcher is
+    updated in place, only for the patterns which changed, and the hash changes with it.
+    '''
+
+    def __init__(self, lexicon_dir: str | None = None, compiled_lexicon_path: str | None = None):
+        compiled = None
+        if lexicon_dir is None:
+            if compiled_lexicon_path is not None:
+                compiled = _load_compiled_lexicon(compiled_lexicon_path)
+                if compiled is None:
+                    raise ValueError(f"{compiled_lexicon_path} is not a compiled lexicon of format version "
+                                     f"{COMPILED_LEXICON_FORMAT_VERSION}")
+            elif os.path.exists(COMPILED_LEXICON_PATH):
+                compiled = _load_compiled_lexicon(COMPILED_LEXICON_PATH)
+        # Directory re-read by reload, None for a lexicon given as a compiled artifact only
+        self.lexicon_dir = LEXICON_DIR if lexicon_dir is None and compiled_lexicon_path is None else lexicon_dir
+        if compiled is None:
+            self._patterns = read_lexicon(self.lexicon_dir)
+            self._hash = get_patterns_hash(self._patterns)
+        else:
+            self._patterns, self._hash = compiled
+        self._file_patterns = self._patterns
+        # veridicality element class -> tokens of the patterns added or removed in memory
+        self._added: Dict[str, Set[Tuple[str, ...]]] = {}
+        self._removed: Dict[str, Set[Tuple[str, ...]]] = {}
+        self._lock = threading.Lock()
+        self._matcher = LexiconMatcher(self._patterns)
+
+    def get_patterns(self) -> Tuple[VeridicalityPattern, ...]:
+        return self._patterns
+
+    def get_matcher(self) -> LexiconMatcher:
+        return self._matcher
+
+    def get_hash(self) -> str:
+        return self._hash
+
+    def add_patterns(self, ve_class: str, patterns: Iterable[str]) -> None:
+        '''
+        Adds patterns (texts, tokenized on whitespace) to a veridicality element class, whether
+        or not the lexicon files have them, until they are removed again.
+        '''
+        with self._lock:
+            for tokens in _tokenize_patterns(patterns):
+                self._removed.get(ve_class, set()).discard(tokens)
+                self._added.setdefault(ve_class, set()).add(tokens)
+            self._update()
+
+    def remove_patterns(self, ve_class: str, patterns: Iterable[str]) -> None:
+        '''
+        Removes patterns from a veridicality element class, whether they come from the lexicon
+        files or add_patterns, until they are added again.
+        '''
+        with self._lock:
+            for tokens in _tokenize_patterns(patterns):
+                self._added.get(ve_class, set()).discard(tokens)
+                self._removed.setdefault(ve_class, set()).add(tokens)
+            self._update()
+
+    def clear_overlay(self) -> None:
+        with self._lock:
+            self._added = {}
+            self._removed = {}
+            self._update()
+
+    def reload(self) -> bool:
+        '''
+        Re-reads the lexicon files, keeping the patterns added and removed in memory. Returns
+        whether they changed.
+        '''
+        if self.lexicon_dir is None:
+            raise ValueError("A lexicon loaded from a compiled artifact only has no files to reload")
+        file_patterns = read_lexicon(self.lexicon_dir)
+        with self._lock:
+            if file_patterns == self._file_patterns:
+                return False
+            self._file_patterns = file_patterns
+            self._update()
+        return True
+
+    def _update(self) -> None:
+        patterns = set(self._file_patterns)
+        patterns.difference_update((tokens, ve_class)
+                                   for ve_class, removed in self._removed.items() for tokens in removed)
+        patterns.update((tokens, ve_class) for ve_class, added in self._added.items() for tokens in added)
+        matched_patterns = {pattern for pattern in self._matcher.get_indexed_patterns() if pattern is not None}
+        for pattern in matched_patterns - patterns:
+            self._matcher.remove_pattern(pattern)
+        for pattern in sorted(patterns - matched_patterns):
+            self._matcher.add_pattern(pattern)
+        self._patterns = self._matcher.get_patterns()
+        # Hashing the patterns by id keeps matches cached under a hash valid for its matcher
+        self._hash = get_patterns_hash(self._matcher.get_indexed_patterns())
+
+
+class LexiconWatcher(object):
+    '''
+    Daemon thread calling reload on a VeridicalityElements when the files of its lexicon
+    directory change, as seen by their modification times and sizes every interval seconds.
+    A reload which fails (e.g. on a file being written) is retried at the next check.
+
+        watcher = LexiconWatcher(get_veridicality_elements()).start()
+    '''
+
+    def __init__(self, veridicality_elements: VeridicalityElements, interval: float = 1.):
+        if veridicality_elements.lexicon_dir is None:
+            raise ValueError("A lexicon loaded from a compiled artifact only has no files to watch")
+        self.veridicality_elements = veridicality_elements
+        self.interval = interval
+        self._file_stamps = self._get_file_stamps()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='truther-lexicon-watcher', daemon=True)
+
+    def __enter__(self) -> 'LexiconWatcher':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def start(self) -> 'LexiconWatcher':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def check(self) -> bool:
+        # Reloads if the files changed since the last successful check, returning whether the lexicon changed
+        file_stamps = self._get_file_stamps()
+        if file_stamps == self._file_stamps:
+            return False
+        changed = self.veridicality_elements.reload()
+        self._file_stamps = file_stamps
+        return changed
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                self.check()
+            except (OSError, UnicodeDecodeError) as e:
+                warnings.warn(f"Could not reload the lexicon in {self.veridicality_elements.lexicon_dir}: {e}")
+
+    def _get_file_stamps(self) -> Dict[str, Tuple[int, int]]:
+        file_stamps = {}
+        for file_name in _list_veridicality_element_files(self.veridicality_elements.lexicon_dir):
+            stat = os.stat(file_name)
+            file_stamps[file_name] = (stat.st_mtime_ns, stat.st_size)
+        return file_stamps
+
+
+def read_lexicon(lexicon_dir: str = LEXICON_DIR) -> Tuple[VeridicalityPattern, ...]:
+    unsorted_patterns = []
+    for file_name in _list_veridicality_element_files(lexicon_dir):
+        ve_class_name = os.path.basename(file_name)
+        with open(file_name) as lexicon_file:
+            for line in lexicon_file:
                 ve_tokens = line.strip().lower().split()
                 unsorted_patterns.append([-len(ve_tokens), ve_tokens, ve_class_name])
-        self._patterns = [(tokens, ve_class)
-                          for _, tokens, ve_class
-                          in sorted(unsorted_patterns)]
-    def _list_veridicality_element_files(self):
-        return glob(os.path.join(os.path.dirname(__file__), 'lexicon', '*'))
-    def get_patterns(self):
-        return self._patterns
+    return tuple(
+        (tuple(tokens), ve_class)
+        for _, tokens, ve_class
+        in sorted(unsorted_patterns)
+    )
+
+
+def get_patterns_hash(patterns: Tuple[VeridicalityPattern, ...]) -> str:
+    return hashlib.sha1(json.dumps(patterns).encode('utf8')).hexdigest()
+
+
+def compile_lexicon(path: str, lexicon_dir: str = LEXICON_DIR) -> None:
+    '''
+    Writes the sorted patterns of the lexicon in lexicon_dir, and their hash, to a single
+    JSON file loadable by VeridicalityElements.
+    '''
+    patterns = read_lexicon(lexicon_dir)
+    with open(path, 'w') as compiled_file:
+        json.dump({'format_version': COMPILED_LEXICON_FORMAT_VERSION,
+                   'hash': get_patterns_hash(patterns),
+                   'patterns': patterns},
+                  compiled_file,
+                  separators=(',', ':'))
+
+
+def _load_compiled_lexicon(path: str) -> Tuple[Tuple[VeridicalityPattern, ...], str] | None:
+    # None for an artifact of another format version
+    with open(path) as compiled_file:
+        compiled = json.load(compiled_file)
+    if compiled.get('format_version') != COMPILED_LEXICON_FORMAT_VERSION:
+        return None
+    return tuple((tuple(tokens), ve_class) for tokens, ve_class in compiled['patterns']), compiled['hash']
+
+
+def _tokenize_patterns(patterns: Iterable[str]) -> Iterator[Tuple[str, ...]]:
+    # As read_lexicon tokenizes the lines of the lexicon files
+    for pattern in patterns:
+        tokens = tuple(pattern.strip().lower().split())
+        if tokens:
+            yield tokens
+
+
+def _list_veridicality_element_files(lexicon_dir: str):
+    return sorted(glob(os.path.join(lexicon_dir, '*')))
+
+
+_veridicality_elements: Optional[VeridicalityElements] = None
+_veridicality_elements_lock = threading.Lock()
+
+
+def get_veridicality_elements() -> VeridicalityElements:
+    # The lexicon is read once per process and shared; patterns are immutable tuples.
+    global _veridicality_elements
+    if _veridicality_elements is None:
+        with _veridicality_elements_lock:
+            if _veridicality_elements is None:
+                _veridicality_elements = VeridicalityElements()
+    return _veridicality_elements
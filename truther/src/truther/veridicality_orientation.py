@@ -1,3 +1,7 @@
+from typing import Dict, Sequence
+
+import numpy as np
+
 ORIENTATION_TO_ORIENTATION_CLASS = {'causals': 'neutral',
                                     'conditionals': 'neutral',
                                     'counter_factive_verbs': 'counterfactive',
@@ -51,3 +55,61 @@ def update_proposition_orientation(
 
     if element_class == 'positive':
         return start_class, factive_freeze
+
+
+ORIENTATION_CLASSES = ('positive', 'negative', 'neutral', 'factive', 'counterfactive')
+
+
+class OrientationAutomaton(object):
+    '''
+    update_proposition_orientation compiled to an integer transition table, for folding many
+    transformation chains (sequences of veridicality element names) at once.
+
+    A state is 2 * (index of the orientation class) + factive_freeze. Elements are encoded as
+    the index of their orientation class in orientation_to_orientation_class, so re-scoring
+    with a changed class assignment only needs a new automaton, not new chains.
+    '''
+
+    def __init__(self, orientation_to_orientation_class: Dict[str, str] | None = None):
+        if orientation_to_orientation_class is None:
+            orientation_to_orientation_class = ORIENTATION_TO_ORIENTATION_CLASS
+        self.element_ids = {element_name: ORIENTATION_CLASSES.index(orientation_class)
+                            for element_name, orientation_class in orientation_to_orientation_class.items()}
+        # Padding of shorter chains leaves the state unchanged
+        self.padding_id = len(ORIENTATION_CLASSES)
+        self.start_state = self.get_state('positive', False)
+        self.transitions = np.empty((2 * len(ORIENTATION_CLASSES), len(ORIENTATION_CLASSES) + 1), dtype=np.int8)
+        for orientation in ORIENTATION_CLASSES:
+            for factive_freeze in (False, True):
+                state = self.get_state(orientation, factive_freeze)
+                for element_id, element_class in enumerate(ORIENTATION_CLASSES):
+                    self.transitions[state, element_id] = self.get_state(
+                        *update_proposition_orientation(orientation, element_class, factive_freeze)
+                    )
+                self.transitions[state, self.padding_id] = state
+
+    def get_state(self, orientation: str, factive_freeze: bool) -> int:
+        return 2 * ORIENTATION_CLASSES.index(orientation) + int(factive_freeze)
+
+    def encode_chains(self, chains: Sequence[Sequence[str]]) -> np.ndarray:
+        lengths = np.fromiter((len(chain) for chain in chains), dtype=np.int64, count=len(chains))
+        encoded = np.full((len(chains), lengths.max(initial=0)), self.padding_id, dtype=np.int8)
+        element_ids = self.element_ids
+        flat_ids = np.fromiter((element_ids[element_name] for chain in chains for element_name in chain),
+                               dtype=np.int8, count=int(lengths.sum()))
+        rows = np.repeat(np.arange(len(chains)), lengths)
+        columns = np.arange(len(rows)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        encoded[rows, columns] = flat_ids
+        return encoded
+
+    def fold(self, encoded_chains: np.ndarray) -> np.ndarray:
+        states = np.full(len(encoded_chains), self.start_state, dtype=np.int8)
+        for column in encoded_chains.T:
+            states = self.transitions[states, column]
+        return states
+
+    def decode(self, states: np.ndarray) -> np.ndarray:
+        return np.array(ORIENTATION_CLASSES)[states // 2]
+
+    def rescore(self, chains: Sequence[Sequence[str]]) -> np.ndarray:
+        return self.decode(self.fold(self.encode_chains(chains)))
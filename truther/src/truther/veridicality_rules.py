@@ -0,0 +1,334 @@
+from functools import partial
+from typing import Callable, Collection, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from truther.sentence import Sentence
+
+
+class FoundVeridicalityTransformation:
+    def __init__(self, name: str, veridicality_element: str, node_ids: tuple):
+        self.name = name
+        self.veridicality_element = veridicality_element
+        self.node_ids = node_ids
+
+
+VeridicalityRule = Callable[[Sentence], Optional[FoundVeridicalityTransformation]]
+
+# Bump when a change to the rules here, the kanren rules in LogicalSentence, or the orientation
+# table changes results, so that stored results are recomputed
+RULE_SET_VERSION = 1
+
+# Rules are tried in list order; the first one to match is applied.
+_VERIDICALITY_RULES: List[VeridicalityRule] = []
+# rule name -> requirements declared when registering it. The kanren rules share the names,
+# and so the requirements, of the native rules here.
+_RULE_REQUIREMENTS: Dict[str, 'RuleRequirements'] = {}
+
+VERB_ELEMENTS = ('positive_verbs', 'negative_verbs', 'factive_verbs', 'counter_factive_verbs')
+NOUN_ELEMENTS = ('positive_nouns', 'negative_nouns', 'factive_nouns')
+ADJECTIVE_ELEMENTS = ('negative_adjectives', 'positive_adjectives')
+
+
+class RuleRequirements(object):
+    '''
+    Labels and dependency relations a rule needs in a sentence to possibly fire. Each
+    requirement is a label (relation), or a tuple of alternative labels (relations) any of
+    which is enough.
+    '''
+
+    def __init__(self,
+                 labels: Iterable[str | Tuple[str, ...]] = (),
+                 deps: Iterable[str | Tuple[str, ...]] = ()):
+        self.labels = tuple((label,) if isinstance(label, str) else tuple(label) for label in labels)
+        self.deps = tuple((dep,) if isinstance(dep, str) else tuple(dep) for dep in deps)
+
+    def are_met(self, sentence: Sentence) -> bool:
+        label_index = sentence._label_index
+        dep_index = sentence._dep_index
+        return (all(any(label in label_index for label in labels) for labels in self.labels)
+                and all(any(dep in dep_index for dep in deps) for deps in self.deps))
+
+
+def register_veridicality_rule(rule: VeridicalityRule | None = None,
+                               index: int | None = None,
+                               labels: Iterable[str | Tuple[str, ...]] = (),
+                               deps: Iterable[str | Tuple[str, ...]] = ()) -> Callable:
+    '''
+    Adds a rule to the native rule engine. Without an index the rule has the lowest priority.
+    The labels and dependency relations the rule needs (see RuleRequirements) can be declared,
+    so that it is skipped on sentences without them. Can be used as a decorator, with or
+    without arguments.
+    '''
+    if rule is None:
+        return partial(register_veridicality_rule, index=index, labels=labels, deps=deps)
+    if index is None:
+        _VERIDICALITY_RULES.append(rule)
+    else:
+        _VERIDICALITY_RULES.insert(index, rule)
+    if labels or deps:
+        _RULE_REQUIREMENTS[rule.__name__] = RuleRequirements(labels, deps)
+    return rule
+
+
+def unregister_veridicality_rule(rule: VeridicalityRule) -> None:
+    _VERIDICALITY_RULES.remove(rule)
+    _RULE_REQUIREMENTS.pop(rule.__name__, None)
+
+
+def get_veridicality_rules() -> Tuple[VeridicalityRule, ...]:
+    return tuple(_VERIDICALITY_RULES)
+
+
+def get_rule_requirements(rule_name: str) -> RuleRequirements | None:
+    return _RULE_REQUIREMENTS.get(rule_name)
+
+
+def may_fire(rule_name: str, sentence: Sentence) -> bool:
+    requirements = _RULE_REQUIREMENTS.get(rule_name)
+    return requirements is None or requirements.are_met(sentence)
+
+
+def iter_rule_attempts(
+        sentence: Sentence,
+        rule_queries: Iterable[Tuple[str, Callable[[], Optional[FoundVeridicalityTransformation]]]] | None = None,
+        on_skip: Callable[[str], None] | None = None
+) -> Iterator[Tuple[str, Optional[FoundVeridicalityTransformation]]]:
+    '''
+    Queries rules on sentence in order, yielding (rule name, result) after each query. Rules
+    which cannot fire on sentence are not queried, and their names are passed to on_skip.
+    rule_queries are (rule name, query) pairs, such as LogicalSentence.get_rule_queries
+    returns, and default to the registered rules. Callers stop at the first result which is
+    not None, which is the rule to apply.
+    '''
+    if rule_queries is None:
+        rule_queries = ((rule.__name__, partial(rule, sentence)) for rule in _VERIDICALITY_RULES)
+    for rule_name, rule_query in rule_queries:
+        if not may_fire(rule_name, sentence):
+            if on_skip is not None:
+                on_skip(rule_name)
+            continue
+        yield rule_name, rule_query()
+
+
+def find_a_veridicality_transform(
+        sentence: Sentence,
+        rule_queries: Iterable[Tuple[str, Callable[[], Optional[FoundVeridicalityTransformation]]]] | None = None
+) -> Optional[FoundVeridicalityTransformation]:
+    for _, out in iter_rule_attempts(sentence, rule_queries):
+        if out is not None:
+            return out
+
+
+# Index helpers. Ids are visited in sorted order so that results are deterministic.
+# Labels are only visible on nodes which have not been merged away.
+
+def _labelled(sentence: Sentence, label: str) -> Iterator[int]:
+    for tok_i in sorted(sentence._label_index.get(label, ())):
+        if tok_i in sentence._index_tok:
+            yield tok_i
+
+
+def _labels(sentence: Sentence, tok_i: int, allowed: Collection[str] | None = None) -> List[str]:
+    if tok_i not in sentence._index_tok:
+        return []
+    return sorted(label for label in sentence._labels.get(tok_i, ())
+                  if allowed is None or label in allowed)
+
+
+def _heads(sentence: Sentence, tok_i: int, rels: Collection[str]) -> List[int]:
+    return sorted(head_i for head_i, rel in sentence._heads.get(tok_i, ()) if rel in rels)
+
+
+def _dauts(sentence: Sentence, tok_i: int, rels: Collection[str]) -> List[int]:
+    return sorted(daut_i for daut_i, rel in sentence._dauts.get(tok_i, ()) if rel in rels)
+
+
+def _has_pos(sentence: Sentence, tok_i: int, poses: Collection[str] | None = None) -> bool:
+    tok_poses = sentence._poses.get(tok_i, ())
+    if poses is None:
+        return len(tok_poses) > 0
+    return any(pos in poses for pos in tok_poses)
+
+
+@register_veridicality_rule(labels=['negative_sources', 'proposition'], deps=['acl', 'poss'])
+def double_pp_source(sentence: Sentence) -> Optional[FoundVeridicalityTransformation]:
+    # Sam agrees with the assertion of the idiot that it is raining
+    # VE2 <-poss- VE1 <-acl- P # links 2 to P
+    sources = set(_labelled(sentence, 'negative_sources'))
+    for prop_id in _labelled(sentence, 'proposition'):
+        for ve_id_intermediate in _heads(sentence, prop_id, ('acl',)):
+            for ve_id in _dauts(sentence, ve_id_intermediate, ('poss',)):
+                if ve_id in sources and ve_id != prop_id:
+                    return FoundVeridicalityTransformation('Double PP Source', 'negative_sources',
+                                                           (prop_id, ve_id))
+
+
+@register_veridicality_rule(labels=['negative_sources', 'proposition'], deps=['relcl', 'pobj', 'prep'])
+def non_possessive_pp_source(sentence: Sentence) -> Optional[FoundVeridicalityTransformation]:
+    # ve_id_intermediate <-prep- prep_id <-pobj- src_ve_id <-relcl- P
+    return _pp_source(sentence, 'prep', 'Non-Possessive PP Source')
+
+
+@register_veridicality_rule(labels=['proposition', NOUN_ELEMENTS + ('negative_sources',)], deps=['ccomp', 'nsubj'])
+def subject_source(sentence: Sentence) -> Optional[FoundVeridicalityTransformation]:
+    # The idiot said that the sun is yellow.
+    # ve <-nsujb- ve_2 <-ccomp- P
+    for prop_id in _labelled(sentence, 'proposition'):
+        for ve2_id in _heads(sentence, prop_id, ('ccomp',)):
+            for src_ve_id in _dauts(sentence, ve2_id, ('nsubj',)):
+                if src_ve_id in (prop_id, ve2_id) or not _has_pos(sentence, src_ve_id, ('NOUN', 'PROPN')):
+                    continue
+                for ve in _labels(sentence, src_ve_id, NOUN_ELEMENTS + ('negative_sources',)):
+                    return FoundVeridicalityTransformation('Subject Source', ve, (prop_id, src_ve_id))
+
+
+@register_veridicality_rule(labels=['proposition'], deps=[('ccomp', 'xcomp'), 'prep', 'pobj'])
+def double_pp(sentence: Sentence) -> Optional[FoundVeridicalityTransformation]:
+    # assessment (VE) -> winning (P): P <-ccomp|xcomp- v0 -prep-> prep -pobj-> VE
+    for prop_id in _labelled(sentence, 'proposition'):
+        for v0 in _heads(sentence, prop_id, ('ccomp', 'xcomp')):
+            for prep in _dauts(sentence, v0, ('prep',)):
+                for ve_id in _dauts(sentence, prep, ('pobj',)):
+                    if ve_id == prop_id:
+                        continue
+                    for ve in _labels(sentence, ve_id):
+                        return FoundVeridicalityTransformation('Double PP', ve, (ve_id, prop_id))
+
+
+@register_veridicality_rule(labels=['negative_sources', 'proposition'], deps=['relcl', 'pobj', 'agent'])
+def single_passive_source_pp(sentence: Sentence) -> Optional[FoundVeridicalityTransformation]:
+    # It was argued by the idiot that it was raining
+    # ve_id_intermediate <-agent- prep_id <-pobj- src_ve_id <-relcl- P
+    return _pp_source(sentence, 'agent', 'Single Passive Source PP')
+
+
+def _pp_source(sentence: Sentence, prep_rel: str, name: str) -> Optional[FoundVeridicalityTransformation]:
+    sources = set(_labelled(sentence, 'negative_sources'))
+    for prop_id in _labelled(sentence, 'proposition'):
+        for src_ve_id in _heads(sentence, prop_id, ('relcl',)):
+            if src_ve_id not in sources:
+                continue
+            for prep_id in _heads(sentence, src_ve_id, ('pobj',)):
+                excluded = (prop_id, src_ve_id) if prep_rel == 'prep' else (prop_id, src_ve_id, prep_id)
+                if any(ve_id_intermediate not in excluded
+                       for ve_id_intermediate in _heads(sentence, prep_id, (prep_rel,))):
+                    return FoundVeridicalityTransformation(name, 'negative_sources',
+                                                           (prop_id, src_ve_id, prep_id))
+
+
+@register_veridicality_rule(labels=['proposition'], deps=['acl', 'pobj'])
+def single_pp(sentence: Sentence) -> Optional[FoundVeridicalityTransformation]:
+    # She agreed with the assertion that the sun is yellow
+    # prep_id <-pobj- src_ve_id <-acl- P
+    for prop_id in _labelled(sentence, 'proposition'):
+        for src_ve_id in _heads(sentence, prop_id, ('acl',)):
+            labels = _labels(sentence, src_ve_id)
+            if src_ve_id == prop_id or not labels:
+                continue
+            for prep_id in _heads(sentence, src_ve_id, ('pobj',)):
+                if prep_id not in (prop_id, src_ve_id):
+                    return FoundVeridicalityTransformation('Single PP', labels[0],
+                                                           (prop_id, src_ve_id, prep_id))
+
+
+@register_veridicality_rule(labels=['proposition', ADJECTIVE_ELEMENTS], deps=['ccomp', 'acomp'])
+def adjective_modification(sentence: Sentence) -> Optional[FoundVeridicalityTransformation]:
+    # It is true that the sun is yellow
+    # ve_adj -acomp-> be <-ccomp- P
+    for prop_id in _labelled(sentence, 'proposition'):
+        for be_id in _heads(sentence, prop_id, ('ccomp',)):
+            if be_id == prop_id or sentence._index_lemma.get(be_id) not in ('remain', 'be'):
+                continue
+            for src_ve_id in _dauts(sentence, be_id, ('acomp',)):
+                if src_ve_id in (prop_id, be_id):
+                    continue
+                for ve in _labels(sentence, src_ve_id, ADJECTIVE_ELEMENTS):
+                    return FoundVeridicalityTransformation('Adjective Modification', ve,
+                                                           (prop_id, be_id, src_ve_id))
+
+
+@register_veridicality_rule(labels=['proposition', NOUN_ELEMENTS], deps=[('ccomp', 'relcl', 'acl', 'nsubj', 'mark')])
+def do_characterization(sentence: Sentence) -> Optional[FoundVeridicalityTransformation]:
+    # She uttered the falsehood *(that) the sun is yellow
+    # src_ve_id <-ccomp|relcl|acl- P
+    for prop_id in _labelled(sentence, 'proposition'):
+        for src_ve_id in _heads(sentence, prop_id, ('ccomp', 'relcl', 'acl', 'nsubj', 'mark')):
+            if src_ve_id == prop_id or not _has_pos(sentence, src_ve_id, ('NOUN',)):
+                continue
+            for ve in _labels(sentence, src_ve_id, NOUN_ELEMENTS):
+                return FoundVeridicalityTransformation('DO Characterization', ve, (prop_id, src_ve_id))
+
+
+@register_veridicality_rule(labels=['proposition'], deps=['ccomp', ('auxpass', 'nsubjpass')])
+def passive(sentence: Sentence) -> Optional[FoundVeridicalityTransformation]:
+    # It was argued by the idiot that it was raining
+    # pass_id <-*pass- src_ve_id <-ccomp- P
+    for prop_id in _labelled(sentence, 'proposition'):
+        for src_ve_id in _heads(sentence, prop_id, ('ccomp',)):
+            labels = _labels(sentence, src_ve_id)
+            if src_ve_id == prop_id or not labels or not _has_pos(sentence, src_ve_id):
+                continue
+            if any(pass_id not in (prop_id, src_ve_id)
+                   for pass_id in _dauts(sentence, src_ve_id, ('auxpass', 'nsubjpass'))):
+                return FoundVeridicalityTransformation('Passive', labels[0], (prop_id, src_ve_id))
+
+
+@register_veridicality_rule(labels=['proposition', VERB_ELEMENTS], deps=['ccomp'])
+def verb_complement(sentence: Sentence) -> Optional[FoundVeridicalityTransformation]:
+    # He lied that the sun is yellow.
+    # ve <-ccomp- P
+    return _verb_head(sentence, 'ccomp', 'Verb Complement')
+
+
+@register_veridicality_rule(labels=['proposition', 'conditionals'], deps=['advcl', ('mark', 'acomp')])
+def conditional_consequent_1(sentence: Sentence) -> Optional[FoundVeridicalityTransformation]:
+    # If he comes on time then the sun is yellow.
+    # ve_adj <-acomp- head <-advcl- P
+    conditionals = set(_labelled(sentence, 'conditionals'))
+    for prop_id in _labelled(sentence, 'proposition'):
+        for head_id in _dauts(sentence, prop_id, ('advcl',)):
+            if head_id == prop_id:
+                continue
+            for src_ve_id in _dauts(sentence, head_id, ('mark', 'acomp')):
+                if src_ve_id in conditionals and src_ve_id not in (prop_id, head_id):
+                    return FoundVeridicalityTransformation('Conditional Consequent', 'conditionals',
+                                                           (prop_id, src_ve_id))
+
+
+@register_veridicality_rule(labels=['proposition', 'conditionals'], deps=['advmod'])
+def conditional_consequent_2(sentence: Sentence) -> Optional[FoundVeridicalityTransformation]:
+    # The sun is yellow as soon as next week.
+    # P -advmod-> conditional_ve
+    conditionals = set(_labelled(sentence, 'conditionals'))
+    for prop_id in _labelled(sentence, 'proposition'):
+        for conditional_ve_id in _dauts(sentence, prop_id, ('advmod',)):
+            if conditional_ve_id in conditionals and conditional_ve_id != prop_id:
+                return FoundVeridicalityTransformation('Conditional Consequent', 'conditionals',
+                                                       (prop_id, conditional_ve_id))
+
+
+@register_veridicality_rule(labels=['proposition', ('conditionals', 'causals')], deps=['mark'])
+def conditional_antecedent(sentence: Sentence) -> Optional[FoundVeridicalityTransformation]:
+    # If the sun is yellow it will rain.
+    # prop -mark-> conditional_ve
+    for prop_id in _labelled(sentence, 'proposition'):
+        for conditional_ve_id in _dauts(sentence, prop_id, ('mark',)):
+            if conditional_ve_id != prop_id and _labels(sentence, conditional_ve_id,
+                                                        ('conditionals', 'causals')):
+                return FoundVeridicalityTransformation('Conditional Antecedent or Causal', 'conditionals',
+                                                       (prop_id, conditional_ve_id))
+
+
+@register_veridicality_rule(labels=['proposition', VERB_ELEMENTS], deps=['prep'])
+def broken_pobj(sentence: Sentence) -> Optional[FoundVeridicalityTransformation]:
+    # He disagreed with Bill's assessment that the sun is yellow., after first VT
+    # VE -prep-> prop
+    return _verb_head(sentence, 'prep', 'Broken Pobj')
+
+
+def _verb_head(sentence: Sentence, rel: str, name: str) -> Optional[FoundVeridicalityTransformation]:
+    for prop_id in _labelled(sentence, 'proposition'):
+        for ve_id in _heads(sentence, prop_id, (rel,)):
+            if ve_id == prop_id or not _has_pos(sentence, ve_id, ('VERB',)):
+                continue
+            for ve in _labels(sentence, ve_id, VERB_ELEMENTS):
+                return FoundVeridicalityTransformation(name, ve, (prop_id, ve_id))
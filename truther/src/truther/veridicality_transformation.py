@@ -1,35 +1,76 @@
-from typing import Optional
+import hashlib
+from functools import partial
+from typing import Callable, List, Optional, Tuple
+
+from truther import instrumentation, veridicality_rules
+from truther.lexicon_matcher import LexiconMatches
+from truther.veridicality_elements import VeridicalityElements, get_veridicality_elements
+from truther.veridicality_rules import FoundVeridicalityTransformation
+from truther.sentence import Sentence
 
-from kanren import Relation, membero, var, run
-from kanren.constraints import neq
+KANREN_BACKEND = 'kanren'
+NATIVE_BACKEND = 'native'
+
+# kanren is imported by import_kanren, once a kanren backed LogicalSentence is made
+Relation = membero = var = run = neq = None
 
-from truther.veridicality_elements import VeridicalityElements
-from truther.sentence import Sentence
 
+def get_rule_set_version(backend: str | None = None) -> str:
+    if backend is None:
+        backend = KANREN_BACKEND
+    if backend == NATIVE_BACKEND:
+        # Rules registered at runtime change the native rule set
+        rule_names = ','.join(f'{rule.__module__}.{rule.__qualname__}'
+                              for rule in veridicality_rules.get_veridicality_rules())
+        return (f'{backend}-{veridicality_rules.RULE_SET_VERSION}-'
+                f'{hashlib.sha1(rule_names.encode("utf8")).hexdigest()[:12]}')
+    return f'{backend}-{veridicality_rules.RULE_SET_VERSION}'
 
-class FoundVeridicalityTransformation:
-    def __init__(self, name: str, veridicality_element: str, node_ids: tuple):
-        self.name = name
-        self.veridicality_element = veridicality_element
-        self.node_ids = node_ids
+
+def import_kanren() -> None:
+    global Relation, membero, var, run, neq
+    if Relation is None:
+        from kanren import Relation, membero, var, run
+        from kanren.constraints import neq
 
 
 class LogicalSentence:
+    '''
+    A labelled sentence and the facts the rule backend queries. It is not changed once made:
+    merge_in_transform returns a new LogicalSentence, sharing the lexicon matches and, through
+    Sentence, the parse of this one.
+    '''
     def __init__(self,
                  sentence: Sentence,
-                 veridicality_elements: VeridicalityElements | None = None):
+                 veridicality_elements: VeridicalityElements | None = None,
+                 lexicon_matches: LexiconMatches | None = None,
+                 backend: str | None = None):
         if veridicality_elements is None:
-            veridicality_elements = VeridicalityElements()
-        for pattern, label in veridicality_elements.get_patterns():
-            sentence = sentence.search_and_merge(pattern, label)
-            sentence = sentence.search_and_merge_lemmas(pattern, label)
-
+            veridicality_elements = get_veridicality_elements()
+        if backend is None:
+            backend = KANREN_BACKEND
+        if backend not in (KANREN_BACKEND, NATIVE_BACKEND):
+            raise ValueError(f"Unknown rule backend {backend!r}, expected "
+                             f"{KANREN_BACKEND!r} or {NATIVE_BACKEND!r}")
+        timer = instrumentation.start_timer()
+        matcher = veridicality_elements.get_matcher()
+        if lexicon_matches is None:
+            lexicon_matches = matcher.find_patterns(sentence)
+        self.veridicality_elements = veridicality_elements
+        self.lexicon_matches = lexicon_matches
+        self.backend = backend
+        self.sent = matcher.label_sentence(sentence, lexicon_matches)
+        instrumentation.stop_timer(timer, instrumentation.LEXICON_STAGE)
+        if backend == KANREN_BACKEND:
+            import_kanren()
+            self._add_facts(self.sent)
+
+    def _add_facts(self, sentence: Sentence) -> None:
         self.id_text = Relation()
         self.id_lemma = Relation()
         self.id_ve = Relation()
         self.id_pos = Relation()
         self.headdaut_gramrel = Relation()
-        self.sent = sentence
 
         for i, pos in sentence.tok_pos:
             self.id_pos.add_fact(i, pos)
@@ -48,31 +89,54 @@ class LogicalSentence:
                 self.headdaut_gramrel.add_fact((head, daut), gramrel)
 
     def find_a_veridicality_transform(self) -> Optional[FoundVeridicalityTransformation]:
-        for ve in [
-            self.__double_pp_source,
-            self.__non_possessive_pp_source,
-            self.__subject_source,
-            self.__double_pp,
-            self.__single_passive_source_pp,
-            self.__single_pp,
-            self.__adjective_modification,
-            self.__do_characterization,
-            self.__passive,
-            self.__verb_complement,
-            self.__conditional_consequent_1,
-            self.__conditional_consequent_2,
-            self.__conditional_antecedent,
-            self.__broken_pobj
-        ]:
-            out = ve()
+        if instrumentation.is_enabled():
+            return self._find_an_instrumented_veridicality_transform()
+        if self.backend == NATIVE_BACKEND:
+            return veridicality_rules.find_a_veridicality_transform(self.sent)
+        return veridicality_rules.find_a_veridicality_transform(self.sent, self.get_rule_queries())
+
+    def _find_an_instrumented_veridicality_transform(self) -> Optional[FoundVeridicalityTransformation]:
+        timer = instrumentation.start_timer()
+        for rule_name, out in veridicality_rules.iter_rule_attempts(
+                self.sent, self.get_rule_queries(), partial(instrumentation.emit, instrumentation.RULE_SKIP_STAGE)
+        ):
+            instrumentation.stop_timer(timer, instrumentation.RULE_QUERY_STAGE, rule_name)
             if out is not None:
+                instrumentation.emit(instrumentation.RULE_HIT_STAGE, rule_name)
                 return out
+            timer = instrumentation.start_timer()
+
+    def get_rule_queries(self) -> List[Tuple[str, Callable[[], Optional[FoundVeridicalityTransformation]]]]:
+        # (rule name, query) in the order find_a_veridicality_transform tries them, including those it skips
+        if self.backend == NATIVE_BACKEND:
+            return [(rule.__name__, partial(rule, self.sent)) for rule in veridicality_rules.get_veridicality_rules()]
+        return [
+            ('double_pp_source', self.__double_pp_source),
+            ('non_possessive_pp_source', self.__non_possessive_pp_source),
+            ('subject_source', self.__subject_source),
+            ('double_pp', self.__double_pp),
+            ('single_passive_source_pp', self.__single_passive_source_pp),
+            ('single_pp', self.__single_pp),
+            ('adjective_modification', self.__adjective_modification),
+            ('do_characterization', self.__do_characterization),
+            ('passive', self.__passive),
+            ('verb_complement', self.__verb_complement),
+            ('conditional_consequent_1', self.__conditional_consequent_1),
+            ('conditional_consequent_2', self.__conditional_consequent_2),
+            ('conditional_antecedent', self.__conditional_antecedent),
+            ('broken_pobj', self.__broken_pobj)
+        ]
 
     def merge_in_transform(self, veridicality_transformation: FoundVeridicalityTransformation) -> 'LogicalSentence':
-        return LogicalSentence(sentence=self.sent.merge_and_label_node_ids(
-            node_ids=veridicality_transformation.node_ids,
-            label='proposition'
-        ))
+        return LogicalSentence(
+            sentence=self.sent.merge_and_label_node_ids(
+                node_ids=veridicality_transformation.node_ids,
+                label='proposition'
+            ),
+            veridicality_elements=self.veridicality_elements,
+            lexicon_matches=self.lexicon_matches,
+            backend=self.backend
+        )
 
     def __double_pp_source(self) -> Optional[FoundVeridicalityTransformation]:
         # Double (and single) PP source
@@ -1,32 +1,588 @@
-from pprint import pprint
+import gc
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice, tee
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, NamedTuple, Tuple
 
-from spacy.tokens.doc import Doc
+import numpy as np
 
-from truther.sentence import make_sentence_from_doc
+from truther import instrumentation, veridicality_rules
+from truther.lexicon_matcher import LexiconMatches
+from truther.memo import LRU_EVICTION, MemoCache, MemoStats, normalize_text
+from truther.sentence import Sentence, make_sentence, make_sentence_from_doc
+from truther.veridicality_elements import VeridicalityElements, get_veridicality_elements
 from truther.veridicality_orientation import update_proposition_orientation
-from truther.veridicality_transformation import LogicalSentence
+from truther.veridicality_transformation import KANREN_BACKEND, NATIVE_BACKEND, LogicalSentence
+
+if TYPE_CHECKING:
+    from spacy.language import Language
+    from spacy.tokens.doc import Doc
+
+    from truther.cache import ParseCache
+
+# Reasons given for a veridicity. The prefilter reasons mean the rules were skipped since
+# they could not change the default orientation.
+NOT_FOUND = 'not_found'
+NO_ELEMENTS = 'no_elements'
+RULES = 'rules'
+
+DEFAULT_VERIDICITY = 'positive'
+
+# Evaluated by warmup, parsed by hand when no nlp is given
+_WARMUP_SENTENCE = 'He denied that it will rain today.'
+_WARMUP_PROPOSITION = 'it will rain today'
+_WARMUP_PARSE = dict(words=['He', 'denied', 'that', 'it', 'will', 'rain', 'today', '.'],
+                     lemmas=['he', 'deny', 'that', 'it', 'will', 'rain', 'today', '.'],
+                     pos=['PRON', 'VERB', 'SCONJ', 'PRON', 'AUX', 'VERB', 'NOUN', 'PUNCT'],
+                     heads=[1, -1, 5, 5, 5, 1, 5, 1],
+                     deps=['nsubj', 'ROOT', 'mark', 'nsubj', 'aux', 'ccomp', 'npadvmod', 'punct'])
+
+
+class VeridicityResult(NamedTuple):
+    veridicity: str
+    reason: str
+    # veridicality elements of the transformations applied, in order, which can be
+    # re-scored with truther.veridicality_orientation.OrientationAutomaton
+    chain: Tuple[str, ...] = ()
+
+
+class VeridicityStep(NamedTuple):
+    # One applied transformation, with the orientation after it
+    rule: str
+    veridicality_element: str
+    node_ids: tuple
+    orientation: str
+    factive_freeze: bool
+    # seconds spent in each rule query tried, up to and including the one which fired. Rules skipped
+    # as the sentence lacks labels or relations they need are left out.
+    rule_seconds: Dict[str, float]
+    merge_seconds: float
+
+
+class VeridicityExplanation(NamedTuple):
+    veridicity: str
+    reason: str
+    steps: List[VeridicityStep]
+    # make_sentence_from_doc and the proposition merge, then the lexicon merge of LogicalSentence
+    sentence_seconds: float
+    lexicon_seconds: float
+    # seconds spent in each rule query of the last search, which found no transformation
+    final_rule_seconds: Dict[str, float]
+
+
+class PreparedSentence(NamedTuple):
+    # A converted sentence and its lexicon matches, which do not depend on the proposition
+    sentence: Sentence
+    lexicon_matches: LexiconMatches
+
+
+class VeridicityMemo(object):
+    '''
+    In-memory memoization for get_proposition_veridicity_many, shared across calls.
+    Sentences are keyed by their whitespace normalized text, and a sentence text is
+    parsed in its normalized form. The sentences cache holds PreparedSentences, the
+    propositions cache proposition token tuples keyed by proposition text, and the
+    results cache veridicities keyed by sentence and proposition tokens.
+    '''
+
+    def __init__(self,
+                 sentence_cache_size: int | None = 10000,
+                 proposition_cache_size: int | None = 10000,
+                 result_cache_size: int | None = 100000,
+                 eviction: str = LRU_EVICTION):
+        self.sentences = MemoCache(sentence_cache_size, eviction)
+        self.propositions = MemoCache(proposition_cache_size, eviction)
+        self.results = MemoCache(result_cache_size, eviction)
+
+    def get_stats(self) -> Dict[str, MemoStats]:
+        return {'sentences': self.sentences.get_stats(),
+                'propositions': self.propositions.get_stats(),
+                'results': self.results.get_stats()}
+
+    def clear(self) -> None:
+        self.sentences.clear()
+        self.propositions.clear()
+        self.results.clear()
+
+
+def prepare_sentence(
+        sentence: 'Doc',
+        veridicality_elements: VeridicalityElements | None = None
+) -> PreparedSentence:
+    if veridicality_elements is None:
+        veridicality_elements = get_veridicality_elements()
+    base_sentence = make_sentence_from_doc(sentence)
+    return PreparedSentence(base_sentence, veridicality_elements.get_matcher().find_patterns(base_sentence))
 
 
 def get_proposition_veridicity(
-        sentence: Doc,
-        proposition: Doc,
+        sentence: 'Doc',
+        proposition: 'Doc',
+        veridicality_elements: VeridicalityElements | None = None,
+        backend: str | None = None
 ) -> str:
+    return get_proposition_veridicity_result(
+        sentence=sentence,
+        proposition=proposition,
+        veridicality_elements=veridicality_elements,
+        backend=backend
+    ).veridicity
+
+
+def get_proposition_veridicity_result(
+        sentence: 'Doc',
+        proposition: 'Doc',
+        veridicality_elements: VeridicalityElements | None = None,
+        backend: str | None = None
+) -> VeridicityResult:
+    return _get_proposition_tokens_veridicity(
+        sentence=sentence,
+        proposition_tokens=[x.orth_ for x in proposition],
+        veridicality_elements=veridicality_elements,
+        backend=backend
+    )
+
+
+def get_sentence_veridicity_result(
+        sentence: Sentence,
+        proposition_tokens: List[str],
+        veridicality_elements: VeridicalityElements | None = None,
+        backend: str | None = None
+) -> VeridicityResult:
+    '''
+    Like get_proposition_veridicity_result, for a Sentence built from an existing parse
+    (see truther.sentence.make_sentence and truther.conllu.read_conllu) and the proposition's
+    tokens, so that spaCy is not needed.
+    '''
+    if veridicality_elements is None:
+        veridicality_elements = get_veridicality_elements()
+    return _get_prepared_sentence_veridicity(
+        prepared_sentence=PreparedSentence(sentence, veridicality_elements.get_matcher().find_patterns(sentence)),
+        proposition_tokens=proposition_tokens,
+        veridicality_elements=veridicality_elements,
+        backend=backend
+    )
+
+
+def explain_proposition_veridicity(
+        sentence: 'Doc',
+        proposition: 'Doc',
+        veridicality_elements: VeridicalityElements | None = None,
+        backend: str | None = None
+) -> VeridicityExplanation:
+    '''
+    Computes the same veridicity as get_proposition_veridicity, recording each transformation
+    applied and the time spent in each stage, rule query and merge.
+    '''
+    if veridicality_elements is None:
+        veridicality_elements = get_veridicality_elements()
+    proposition_tokens = [x.orth_ for x in proposition]
+    reason = prefilter_proposition(sentence, proposition_tokens, veridicality_elements)
+    if reason is not None:
+        return VeridicityExplanation(DEFAULT_VERIDICITY, reason, [], 0., 0., {})
+
+    start = time.perf_counter()
+    merged_sentence = make_sentence_from_doc(sentence).search_and_merge(proposition_tokens, label='proposition')
+    sentence_seconds = time.perf_counter() - start
+    start = time.perf_counter()
     logical_sentence = LogicalSentence(
-        sentence=make_sentence_from_doc(sentence).search_and_merge(
-            [x.orth_ for x in proposition],
-            label='proposition'
-        )
+        sentence=merged_sentence,
+        veridicality_elements=veridicality_elements,
+        backend=backend
     )
+    lexicon_seconds = time.perf_counter() - start
 
-    veridicality_orientation = 'positive'
+    veridicality_orientation = DEFAULT_VERIDICITY
     factive_freeze = False
-    veridicality_transform = logical_sentence.find_a_veridicality_transform()
-    while veridicality_transform is not None:
+    steps = []
+    while True:
+        rule_seconds = {}
+        veridicality_transform = None
+        start = time.perf_counter()
+        for rule_name, veridicality_transform in veridicality_rules.iter_rule_attempts(
+                logical_sentence.sent, logical_sentence.get_rule_queries()
+        ):
+            rule_seconds[rule_name] = time.perf_counter() - start
+            if veridicality_transform is not None:
+                break
+            start = time.perf_counter()
+        if veridicality_transform is None:
+            break
         veridicality_orientation, factive_freeze = update_proposition_orientation(
             start_orientation=veridicality_orientation,
             element_name=veridicality_transform.veridicality_element,
             factive_freeze=factive_freeze
         )
+        start = time.perf_counter()
+        logical_sentence = logical_sentence.merge_in_transform(veridicality_transform)
+        steps.append(VeridicityStep(
+            rule=veridicality_transform.name,
+            veridicality_element=veridicality_transform.veridicality_element,
+            node_ids=veridicality_transform.node_ids,
+            orientation=veridicality_orientation,
+            factive_freeze=factive_freeze,
+            rule_seconds=rule_seconds,
+            merge_seconds=time.perf_counter() - start
+        ))
+    return VeridicityExplanation(
+        veridicity=veridicality_orientation,
+        reason=RULES,
+        steps=steps,
+        sentence_seconds=sentence_seconds,
+        lexicon_seconds=lexicon_seconds,
+        final_rule_seconds=rule_seconds
+    )
+
+
+def prefilter_proposition(
+        sentence: 'Doc',
+        proposition_tokens: List[str],
+        veridicality_elements: VeridicalityElements | None = None
+) -> str | None:
+    '''
+    Returns NOT_FOUND if the proposition has no tokens or they do not occur in sequence in
+    the sentence, NO_ELEMENTS if no lexicon element can start at any of its tokens or lemmas,
+    and None if the rules have to be run. Only the Doc's token and lemma hashes are read.
+    '''
+    from spacy.attrs import LEMMA, LOWER
+    from spacy.strings import hash_string
+
+    if veridicality_elements is None:
+        veridicality_elements = get_veridicality_elements()
+    hashes = sentence.to_array([LOWER, LEMMA])
+    if not _contains_sequence(hashes[:, 0], [hash_string(token) for token in proposition_tokens]):
+        return NOT_FOUND
+    if not veridicality_elements.get_matcher().may_match(hashes.ravel().tolist()):
+        return NO_ELEMENTS
+    return None
+
+
+def get_proposition_veridicity_many(
+        pairs: Iterable[Tuple['str | Doc', 'str | Doc']],
+        nlp: 'Language',
+        batch_size: int = 1000,
+        n_process: int = 1,
+        veridicality_elements: VeridicalityElements | None = None,
+        proposition_cache_size: int = 10000,
+        backend: str | None = None,
+        parse_cache: 'ParseCache | None' = None,
+        memo: 'VeridicityMemo | None' = None,
+        with_reasons: bool = False,
+        n_threads: int = 1
+) -> Iterator[str | VeridicityResult]:
+    '''
+    Lazily yields the veridicity of each (sentence, proposition) pair, in input order.
+    Sentences and propositions may be texts or Docs. Sentence texts are parsed with
+    nlp.pipe, while proposition texts are only tokenized, each distinct one once, as only
+    their tokens are used.
+    With a parse_cache (see truther.cache.ParseCache), sentence texts are looked up in
+    it, batch_size pairs at a time, and only those missing from it are parsed.
+    With a memo (see VeridicityMemo), repeated sentences, propositions and pairs are
+    looked up in it before being parsed or scored.
+    With with_reasons, VeridicityResults are yielded instead, so that callers can count
+    how often the prefilter skipped the rules.
+    With n_threads > 1, pairs are scored by a pool of n_threads threads while the following
+    sentences are parsed, which spaCy does mostly without holding the GIL. Sentences are
+    immutable, so that the threads share parses and memoized sentences without copying them.
+    '''
+
+    @lru_cache(maxsize=proposition_cache_size)
+    def tokenize_proposition(text: str) -> Tuple[str, ...]:
+        return tuple(x.orth_ for x in nlp.make_doc(text))
+
+    def get_proposition_tokens(proposition: 'str | Doc') -> List[str]:
+        if not isinstance(proposition, str):
+            return [x.orth_ for x in proposition]
+        if memo is None:
+            return list(tokenize_proposition(proposition))
+        proposition_tokens = memo.propositions.get(proposition)
+        if proposition_tokens is None:
+            proposition_tokens = tuple(x.orth_ for x in nlp.make_doc(proposition))
+            memo.propositions.put(proposition, proposition_tokens)
+        return list(proposition_tokens)
+
+    if parse_cache is not None or memo is not None:
+        if parse_cache is not None:
+            if veridicality_elements is None:
+                veridicality_elements = parse_cache.veridicality_elements
+            elif veridicality_elements.get_hash() != parse_cache.lexicon_hash:
+                raise ValueError('veridicality_elements do not match the lexicon of parse_cache')
+        elif veridicality_elements is None:
+            veridicality_elements = get_veridicality_elements()
+        pairs = iter(pairs)
+        executor = None if n_threads == 1 else ThreadPoolExecutor(n_threads)
+        try:
+            chunk = list(islice(pairs, batch_size))
+            while chunk:
+                results = _get_chunk_veridicities(
+                    chunk=[(sentence, get_proposition_tokens(proposition)) for sentence, proposition in chunk],
+                    nlp=nlp,
+                    batch_size=batch_size,
+                    n_process=n_process,
+                    veridicality_elements=veridicality_elements,
+                    backend=backend,
+                    parse_cache=parse_cache,
+                    memo=memo,
+                    executor=executor
+                )
+                yield from results if with_reasons else (result.veridicity for result in results)
+                chunk = list(islice(pairs, batch_size))
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return
+
+    # nlp.pipe only reads ahead by about a batch, which bounds what tee buffers
+    pairs_to_parse, pairs = tee(pairs)
+    parsed_sentences = nlp.pipe(
+        (sentence for sentence, _ in pairs_to_parse if isinstance(sentence, str)),
+        batch_size=batch_size,
+        n_process=n_process
+    )
+    executor = None if n_threads == 1 else ThreadPoolExecutor(n_threads)
+    # Pairs being scored by the executor, in input order, at most batch_size of them
+    futures: deque[Future] = deque()
+    try:
+        for sentence, proposition in pairs:
+            if isinstance(sentence, str):
+                sentence = next(parsed_sentences)
+            if isinstance(proposition, str):
+                proposition_tokens = list(tokenize_proposition(proposition))
+            else:
+                proposition_tokens = [x.orth_ for x in proposition]
+            if executor is None:
+                result = _get_proposition_tokens_veridicity(
+                    sentence=sentence,
+                    proposition_tokens=proposition_tokens,
+                    veridicality_elements=veridicality_elements,
+                    backend=backend
+                )
+                yield result if with_reasons else result.veridicity
+                continue
+            futures.append(executor.submit(_get_proposition_tokens_veridicity, sentence, proposition_tokens,
+                                           veridicality_elements, backend))
+            if len(futures) >= batch_size:
+                result = futures.popleft().result()
+                yield result if with_reasons else result.veridicity
+        while futures:
+            result = futures.popleft().result()
+            yield result if with_reasons else result.veridicity
+    finally:
+        if executor is not None:
+            for future in futures:
+                future.cancel()
+            executor.shutdown()
+
+
+def get_veridicities(
+        sentence: 'Doc',
+        propositions: Iterable['Doc'],
+        veridicality_elements: VeridicalityElements | None = None,
+        backend: str | None = None
+) -> Dict[str, str]:
+    '''
+    Returns the veridicity of each proposition in one sentence, keyed by proposition text.
+    The sentence is converted and scanned for lexicon elements once, and only the
+    proposition merge and transformation loop are repeated per proposition.
+    '''
+    if veridicality_elements is None:
+        veridicality_elements = get_veridicality_elements()
+    prepared_sentence = prepare_sentence(sentence, veridicality_elements)
+    return {
+        proposition.text: _get_prepared_sentence_veridicity(
+            prepared_sentence=prepared_sentence,
+            proposition_tokens=[x.orth_ for x in proposition],
+            veridicality_elements=veridicality_elements,
+            backend=backend
+        ).veridicity
+        for proposition in propositions
+    }
+
+
+def warmup(
+        nlp: 'Language | None' = None,
+        veridicality_elements: VeridicalityElements | None = None,
+        backends: Iterable[str | None] = (NATIVE_BACKEND, KANREN_BACKEND),
+        freeze: bool = False
+) -> None:
+    '''
+    Loads the lexicon and compiles its matcher, imports the rule backends, and scores a
+    dummy pair with each backend (parsed with nlp if given), so that the first real call
+    does none of this work.
+
+    Call it before forking workers so that they share this state copy-on-write. The lexicon
+    lock is then never taken again, and with freeze the objects created so far are moved
+    out of the garbage collector's reach (gc.freeze), so that collections in the workers do
+    not write to (and so copy) their pages. Only freeze in a process which forks workers:
+    frozen objects, including the garbage made by warming up, are never collected.
+    '''
+    if veridicality_elements is None:
+        veridicality_elements = get_veridicality_elements()
+    for backend in backends:
+        if nlp is None:
+            get_sentence_veridicity_result(make_sentence(**_WARMUP_PARSE), _WARMUP_PROPOSITION.split(),
+                                           veridicality_elements, backend)
+        else:
+            get_proposition_veridicity_result(nlp(_WARMUP_SENTENCE), nlp(_WARMUP_PROPOSITION),
+                                              veridicality_elements, backend)
+    if freeze:
+        gc.collect()
+        gc.freeze()
+
+
+def _get_proposition_tokens_veridicity(
+        sentence: 'Doc',
+        proposition_tokens: List[str],
+        veridicality_elements: VeridicalityElements | None = None,
+        backend: str | None = None
+) -> VeridicityResult:
+    reason = prefilter_proposition(sentence, proposition_tokens, veridicality_elements)
+    if reason is not None:
+        return VeridicityResult(DEFAULT_VERIDICITY, reason)
+    chain = _get_logical_sentence_chain(LogicalSentence(
+        sentence=make_sentence_from_doc(sentence).search_and_merge(
+            proposition_tokens,
+            label='proposition'
+        ),
+        veridicality_elements=veridicality_elements,
+        backend=backend
+    ))
+    return VeridicityResult(_get_chain_veridicity(chain), RULES, chain)
+
+
+def _contains_sequence(tokens: np.ndarray, search: List[int]) -> bool:
+    # An empty proposition is never found, as it could not be merged
+    if not search:
+        return False
+    search = np.array(search, dtype=tokens.dtype)
+    for start_i in np.flatnonzero(tokens[:len(tokens) - len(search) + 1] == search[0]).tolist():
+        if np.array_equal(tokens[start_i:start_i + len(search)], search):
+            return True
+    return False
+
+
+def _get_chunk_veridicities(
+        chunk: List[Tuple['str | Doc', List[str]]],
+        nlp: 'Language',
+        batch_size: int,
+        n_process: int,
+        veridicality_elements: VeridicalityElements,
+        backend: str | None,
+        parse_cache: 'ParseCache | None',
+        memo: VeridicityMemo | None,
+        executor: Executor | None = None
+) -> List[VeridicityResult]:
+    lexicon_hash = veridicality_elements.get_hash()
+    sentence_keys = []
+    results = []
+    for sentence, proposition_tokens in chunk:
+        sentence_text = sentence if isinstance(sentence, str) else sentence.text
+        sentence_key = sentence_text if memo is None else normalize_text(sentence_text)
+        sentence_keys.append(sentence_key)
+        results.append(None if memo is None else memo.results.get(
+            (lexicon_hash, backend, sentence_key, tuple(proposition_tokens))
+        ))
+
+    # Prepare the sentences of pairs which were not memoized, parsing each distinct text once
+    prepared_sentences = {}
+    to_parse = {}
+    for (sentence, _), sentence_key, result in zip(chunk, sentence_keys, results):
+        if result is not None or sentence_key in prepared_sentences or sentence_key in to_parse:
+            continue
+        prepared_sentence = None if memo is None else memo.sentences.get((lexicon_hash, sentence_key))
+        if prepared_sentence is None and not isinstance(sentence, str):
+            prepared_sentence = prepare_sentence(sentence, veridicality_elements)
+            if memo is not None:
+                memo.sentences.put((lexicon_hash, sentence_key), prepared_sentence)
+        if prepared_sentence is None:
+            to_parse[sentence_key] = None
+        else:
+            prepared_sentences[sentence_key] = prepared_sentence
+    if to_parse:
+        if parse_cache is not None:
+            parsed = parse_cache.get_sentences(list(to_parse), batch_size=batch_size, n_process=n_process)
+        else:
+            parsed = [prepare_sentence(doc, veridicality_elements)
+                      for doc in nlp.pipe(to_parse, batch_size=batch_size, n_process=n_process)]
+        for sentence_key, prepared_sentence in zip(to_parse, parsed):
+            prepared_sentences[sentence_key] = prepared_sentence
+            if memo is not None:
+                memo.sentences.put((lexicon_hash, sentence_key), prepared_sentence)
+
+    to_score = [i for i, result in enumerate(results) if result is None]
+    score_args = ([prepared_sentences[sentence_keys[i]] for i in to_score],
+                  [chunk[i][1] for i in to_score],
+                  [veridicality_elements] * len(to_score),
+                  [backend] * len(to_score))
+    scored = map(_get_prepared_sentence_veridicity, *score_args) if executor is None else \
+        executor.map(_get_prepared_sentence_veridicity, *score_args)
+    # The memo is only written from this thread
+    for i, result in zip(to_score, scored):
+        results[i] = result
+        if memo is not None:
+            memo.results.put((lexicon_hash, backend, sentence_keys[i], tuple(chunk[i][1])), result)
+    return results
+
+
+def _get_prepared_sentence_veridicity(
+        prepared_sentence: PreparedSentence,
+        proposition_tokens: List[str],
+        veridicality_elements: VeridicalityElements,
+        backend: str | None = None
+) -> VeridicityResult:
+    return _get_merged_sentence_veridicity(
+        prepared_sentence=prepared_sentence,
+        sentence=prepared_sentence.sentence.search_and_merge(
+            proposition_tokens,
+            label='proposition'
+        ),
+        veridicality_elements=veridicality_elements,
+        backend=backend
+    )
+
+
+def _get_merged_sentence_veridicity(
+        prepared_sentence: PreparedSentence,
+        sentence: Sentence,
+        veridicality_elements: VeridicalityElements,
+        backend: str | None = None
+) -> VeridicityResult:
+    # sentence is prepared_sentence's sentence with the proposition merged in, if it was found
+    if not any(label == 'proposition' for _, label in sentence.label_facts):
+        return VeridicityResult(DEFAULT_VERIDICITY, NOT_FOUND)
+    if not any(prepared_sentence.lexicon_matches):
+        return VeridicityResult(DEFAULT_VERIDICITY, NO_ELEMENTS)
+    chain = _get_logical_sentence_chain(LogicalSentence(
+        sentence=sentence,
+        veridicality_elements=veridicality_elements,
+        lexicon_matches=prepared_sentence.lexicon_matches,
+        backend=backend
+    ))
+    return VeridicityResult(_get_chain_veridicity(chain), RULES, chain)
+
+
+def _get_logical_sentence_chain(logical_sentence: LogicalSentence) -> Tuple[str, ...]:
+    chain = []
+    timer = instrumentation.start_timer()
+    veridicality_transform = logical_sentence.find_a_veridicality_transform()
+    while veridicality_transform is not None:
+        chain.append(veridicality_transform.veridicality_element)
         logical_sentence = logical_sentence.merge_in_transform(veridicality_transform)
+        instrumentation.stop_timer(timer, instrumentation.LOOP_ITERATION_STAGE)
+        timer = instrumentation.start_timer()
         veridicality_transform = logical_sentence.find_a_veridicality_transform()
+    return tuple(chain)
+
+
+def _get_chain_veridicity(chain: Iterable[str]) -> str:
+    veridicality_orientation = DEFAULT_VERIDICITY
+    factive_freeze = False
+    for veridicality_element in chain:
+        veridicality_orientation, factive_freeze = update_proposition_orientation(
+            start_orientation=veridicality_orientation,
+            element_name=veridicality_element,
+            factive_freeze=factive_freeze
+        )
     return veridicality_orientation
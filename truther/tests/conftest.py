@@ -0,0 +1,28 @@
+import pytest
+import spacy
+from spacy.tokens import Doc
+
+
+@pytest.fixture
+def lied_parse():
+    # He lied that the sun is yellow .
+    return dict(words='He lied that the sun is yellow .'.split(),
+                lemmas='he lie that the sun be yellow .'.split(),
+                pos='PRON VERB SCONJ DET NOUN AUX ADJ PUNCT'.split(),
+                heads=[1, 1, 5, 4, 5, 1, 5, 1],
+                deps='nsubj ROOT mark det nsubj ccomp acomp punct'.split())
+
+
+@pytest.fixture
+def make_lied_doc(lied_parse):
+    # Makes a Doc parsed as lied_parse, optionally with another subject or verb,
+    # e.g. make_lied_doc(vocab, 'She', 'said', 'say')
+    def make_doc(vocab=None, subject='He', verb='lied', verb_lemma='lie'):
+        return Doc(spacy.blank('en').vocab if vocab is None else vocab,
+                   words=[subject, verb] + lied_parse['words'][2:],
+                   lemmas=[subject.lower(), verb_lemma] + lied_parse['lemmas'][2:],
+                   pos=lied_parse['pos'],
+                   heads=lied_parse['heads'],
+                   deps=lied_parse['deps'])
+
+    return make_doc
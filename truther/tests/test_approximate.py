@@ -0,0 +1,32 @@
+import numpy as np
+import spacy
+
+from truther.approximate import find_proposition_spans, get_proposition_veridicity_approximate
+
+
+def _make_nlp():
+    nlp = spacy.blank('en')
+    rng = np.random.default_rng(0)
+    for word in ['he', 'lied', 'that', 'the', 'sun', 'is', 'yellow', 'moon', 'green', '.']:
+        nlp.vocab.set_vector(word, rng.normal(size=16).astype(np.float32))
+    nlp.vocab.set_vector('was', nlp.vocab.get_vector('is') + 0.1)
+    return nlp
+
+
+def test_find_proposition_spans(make_lied_doc):
+    nlp = _make_nlp()
+    sentence = make_lied_doc(nlp.vocab)
+    propositions = ['The Sun is yellow', 'the sun was yellow', 'sun was yellow', 'the moon is green', 'pigs fly']
+    assert find_proposition_spans([(sentence, nlp(text)) for text in propositions]) == [
+        (3, 7), (3, 7), (4, 7), None, None
+    ]
+    assert find_proposition_spans([(sentence, nlp('the moon is green'))], threshold=-1.) == [(3, 7)]
+
+
+def test_get_proposition_veridicity_approximate(make_lied_doc):
+    nlp = _make_nlp()
+    sentence = make_lied_doc(nlp.vocab)
+    pairs = [(sentence, 'the sun was yellow'), (sentence, 'the moon is green')]
+    assert [(result.veridicity, result.reason) for result in get_proposition_veridicity_approximate(
+        pairs, nlp, backend='native', with_reasons=True
+    )] == [('negative', 'rules'), ('positive', 'not_found')]
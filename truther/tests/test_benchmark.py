@@ -0,0 +1,40 @@
+import json
+import os
+
+from truther.benchmark import load_fixtures, main, run_benchmarks
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks', 'fixtures')
+
+
+def test_load_fixtures():
+    fixtures = load_fixtures(FIXTURES_DIR)
+    assert list(fixtures) == ['long', 'median', 'short']
+    sentence, proposition = fixtures['short'][0]
+    assert sentence.text == 'He lied that the sun is yellow . '
+    assert proposition.text == 'the sun is yellow '
+    assert max(len(sentence) for sentence, _ in fixtures['long']) > 80
+
+
+def test_run_benchmarks():
+    fixtures = load_fixtures(FIXTURES_DIR)
+    rows = run_benchmarks({'short': fixtures['short']}, backends=['native'], repeat=2, min_seconds=0.)
+    assert [(row['stage'], row['backend']) for row in rows] == [
+        ('make_sentence_from_doc', None),
+        ('lexicon_merging', None),
+        ('find_a_veridicality_transform', 'native'),
+        ('merge_in_transform', 'native'),
+        ('end_to_end', 'native'),
+    ]
+    assert all(row['fixture'] == 'short' and row['pairs'] == 2 and row['min_seconds'] > 0 for row in rows)
+    assert rows[-1]['peak_memory_bytes'] > 0
+    assert rows[-1]['pairs_per_second'] == 1. / rows[-1]['min_seconds']
+
+
+def test_main(tmp_path):
+    output = str(tmp_path / 'results.json')
+    main([FIXTURES_DIR, '-o', output, '--backend', 'native', '--repeat', '1', '--min-seconds', '0'])
+    with open(output) as results_file:
+        results = json.load(results_file)
+    assert set(results['environment']) == {'truther', 'spacy', 'python', 'platform'}
+    assert {row['fixture'] for row in results['results']} == {'short', 'median', 'long'}
+    assert {row['backend'] for row in results['results']} == {None, 'native'}
@@ -0,0 +1,100 @@
+import subprocess
+import sys
+
+import spacy
+
+from truther.cache import (ParseCache, ResultCache, get_model_key, get_model_name_key,
+                           get_proposition_veridicity_cached)
+from truther.veridicality_elements import VeridicalityElements
+from truther.veridicity import VeridicityMemo, get_proposition_veridicity_many
+
+
+_calls = []
+
+
+@spacy.Language.component('truther_test_count_calls')
+def _count_calls(doc):
+    _calls.append(doc.text)
+    return doc
+
+
+def _counting_nlp():
+    nlp = spacy.blank('en')
+    nlp.add_pipe('truther_test_count_calls')
+    _calls.clear()
+    return nlp, _calls
+
+
+def test_parse_cache_reuses_parses_and_sentences(tmp_path):
+    nlp, calls = _counting_nlp()
+    texts = ['I doubt it rains', 'It rains', 'I doubt it rains']
+    with ParseCache(str(tmp_path), nlp, shard_size=1) as cache:
+        first = cache.get_sentences(texts)
+    assert calls == ['I doubt it rains', 'It rains']
+    assert first[0].sentence.toks == [(0, 'i'), (1, 'doubt'), (2, 'it'), (3, 'rains')]
+
+    with ParseCache(str(tmp_path), nlp) as cache:
+        second = cache.get_sentences(texts)
+        assert [doc.text for doc in cache.get_docs(texts[:2])] == texts[:2]
+    assert len(calls) == 2
+    assert [prepared.sentence.toks for prepared in second] == [prepared.sentence.toks for prepared in first]
+    assert [prepared.lexicon_matches for prepared in second] == [prepared.lexicon_matches for prepared in first]
+
+
+def test_parse_cache_invalidates_sentences_on_lexicon_change(tmp_path):
+    nlp, calls = _counting_nlp()
+    with ParseCache(str(tmp_path), nlp) as cache:
+        cache.get_sentences(['I doubt it rains'])
+
+    class OtherElements(VeridicalityElements):
+        def get_hash(self):
+            return 'other'
+
+    with ParseCache(str(tmp_path), nlp, veridicality_elements=OtherElements()) as cache:
+        assert cache._connection.execute('SELECT COUNT(*) FROM sentences').fetchone() == (0,)
+        cache.get_sentences(['I doubt it rains'])
+    # the parse is reused, only the lexicon pass is repeated
+    assert calls == ['I doubt it rains']
+
+
+def test_get_proposition_veridicity_many_with_parse_cache(tmp_path):
+    nlp, calls = _counting_nlp()
+    pairs = [('I doubt it rains', 'it rains'), ('It rains', 'it rains')]
+    with ParseCache(str(tmp_path), nlp) as cache:
+        cached = list(get_proposition_veridicity_many(pairs, nlp, batch_size=1, backend='native',
+                                                      parse_cache=cache))
+    calls.clear()
+    assert cached == list(get_proposition_veridicity_many(pairs, nlp, backend='native'))
+    assert cached == list(get_proposition_veridicity_many(pairs, nlp, backend='native', memo=VeridicityMemo()))
+    # Propositions are only tokenized, not run through the pipeline
+    assert calls == ['I doubt it rains', 'It rains'] * 2
+
+
+def test_result_cache_skips_loading_the_model(tmp_path):
+    model_path = str(tmp_path / 'model')
+    spacy.blank('en').to_disk(model_path)
+    loads = []
+
+    def load():
+        loads.append(model_path)
+        return spacy.load(model_path)
+
+    pairs = [('It rains', 'it rains'), ('It  rains', 'it rains'), ('I doubt it rains', 'it  rains')]
+    with ResultCache(str(tmp_path / 'results.sqlite'), model_path, backend='native') as result_cache:
+        first = list(get_proposition_veridicity_cached(pairs, result_cache, load, batch_size=2))
+        assert list(get_proposition_veridicity_cached(pairs, result_cache, load)) == first
+        assert result_cache.get_many([('It rains', 'it rains')]) == {('It rains', 'it rains'): 'positive'}
+    assert loads == [model_path]
+    assert get_model_name_key(model_path) == get_model_key(spacy.load(model_path))
+
+    # Cache hits neither load the model nor import spaCy
+    subprocess.run([sys.executable, '-c',
+                    'import sys\n'
+                    'from truther.cache import ResultCache, get_proposition_veridicity_cached\n'
+                    f'result_cache = ResultCache({str(tmp_path / "results.sqlite")!r}, {model_path!r},\n'
+                    '                           backend="native")\n'
+                    f'assert list(get_proposition_veridicity_cached({pairs!r}, result_cache, None)) == {first!r}\n'
+                    'assert "spacy" not in sys.modules\n'], check=True)
+
+    with ResultCache(str(tmp_path / 'results.sqlite'), model_path, backend='kanren') as result_cache:
+        assert result_cache.get_many(pairs) == {}
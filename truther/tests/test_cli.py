@@ -0,0 +1,27 @@
+import json
+
+import spacy
+
+from truther.cli import main
+
+
+def test_main_keeps_input_order(tmp_path, capsys):
+    model_path = tmp_path / 'model'
+    spacy.blank('en').to_disk(model_path)
+    input_path = tmp_path / 'pairs.jsonl'
+    input_path.write_text(''.join(
+        json.dumps({'id': i, 'sentence': f'sentence {i}', 'proposition': 'absent'}) + '\n'
+        for i in range(5)
+    ))
+    csv_path = tmp_path / 'pairs.csv'
+    csv_path.write_text('sentence,proposition\nIt rains,it rains\n')
+    output_path = tmp_path / 'out.jsonl'
+
+    main([str(input_path), str(csv_path), '--model', str(model_path), '--chunk-size', '2',
+          '--backend', 'native', '-o', str(output_path)])
+
+    results = [json.loads(line) for line in output_path.read_text().splitlines()]
+    assert [result.get('id') for result in results] == [0, 1, 2, 3, 4, None]
+    assert all(result['veridicity'] == 'positive' for result in results)
+    assert results[-1]['sentence'] == 'It rains'
+    assert '6 pairs' in capsys.readouterr().err
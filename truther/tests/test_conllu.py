@@ -0,0 +1,93 @@
+import subprocess
+import sys
+
+import pytest
+import spacy
+from spacy.tokens import Doc
+
+from truther.conllu import read_conllu
+from truther.sentence import Sentence, make_sentence, make_sentence_from_doc
+from truther.veridicity import get_proposition_veridicity_result, get_sentence_veridicity_result
+
+CONLLU = '''# sent_id = 1
+# text = He lied that the sun is yellow.
+1\tHe\the\tPRON\tPRP\t_\t2\tnsubj\t_\t_
+2\tlied\tlie\tVERB\tVBD\t_\t0\tROOT\t_\t_
+3\tthat\tthat\tSCONJ\tIN\t_\t6\tmark\t_\t_
+4\tthe\tthe\tDET\tDT\t_\t5\tdet\t_\t_
+5\tsun\tsun\tNOUN\tNN\t_\t6\tnsubj\t_\t_
+6\tis\tbe\tAUX\tVBZ\t_\t2\tccomp\t_\t_
+7\tyellow\tyellow\tADJ\tJJ\t_\t6\tacomp\t_\tSpaceAfter=No
+8\t.\t.\tPUNCT\t.\t_\t2\tpunct\t_\t_
+
+# text = Bill knows it's raining.
+1\tBill\t_\tPROPN\tNNP\t_\t2\tnsubj\t_\t_
+2\tknows\tknow\tVERB\tVBZ\t_\t0\tROOT\t_\t_
+3-4\tit's\t_\t_\t_\t_\t_\t_\t_\t_
+3\tit\tit\t_\tPRP\t_\t5\tnsubj\t_\t_
+4\t's\tbe\tAUX\tVBZ\t_\t5\taux\t_\t_
+5\training\train\tVERB\tVBG\t_\t2\tccomp\t_\t_
+5.1\tnull\tnull\tVERB\t_\t_\t_\t_\t_\t_
+6\t.\t.\tPUNCT\t.\t_\t2\tpunct\t_\t_
+'''
+
+
+def test_read_conllu():
+    first, second = read_conllu(CONLLU.splitlines(keepends=True))
+    assert first.toks == [(0, 'he'), (1, 'lied'), (2, 'that'), (3, 'the'), (4, 'sun'), (5, 'is'), (6, 'yellow'),
+                          (7, '.')]
+    assert first.lemmas[1] == (1, 'lie')
+    assert first.get_heads()[5] == {(1, 'ccomp')}
+    assert first.get_heads()[1] == {(-1, 'ROOT')}
+    assert second.lemmas[0] == (0, 'Bill')
+    assert second.tok_pos[2] == (2, 'PRP')
+    assert [tok for _, tok in second.toks] == ['bill', 'knows', 'it', "'s", 'raining', '.']
+
+    result = get_sentence_veridicity_result(first, 'the sun is yellow'.split(), backend='native')
+    assert (result.veridicity, result.chain) == ('negative', ('negative_verbs',))
+    result = get_sentence_veridicity_result(second, ['raining'])
+    assert (result.veridicity, result.chain) == ('positive', ('factive_verbs',))
+    assert get_sentence_veridicity_result(second, ['snowing']).reason == 'not_found'
+
+
+def test_read_conllu_errors():
+    with pytest.raises(ValueError):
+        list(read_conllu(['1\tHe\the\n']))
+    with pytest.raises(ValueError):
+        list(read_conllu(['2\tHe\the\tPRON\tPRP\t_\t0\tROOT\t_\t_\n']))
+
+
+def test_make_sentence_matches_doc(lied_parse, make_lied_doc):
+    vocab = spacy.blank('en').vocab
+    doc = make_lied_doc(vocab)
+    sentence = make_sentence(**lied_parse)
+    doc_sentence = make_sentence_from_doc(doc)
+    for view in ('toks', 'lemmas', 'tok_pos', 'headof_facts', 'follows_facts'):
+        assert getattr(sentence, view) == getattr(doc_sentence, view)
+    proposition = 'the sun is yellow'.split()
+    for backend in ('native', 'kanren'):
+        assert (get_sentence_veridicity_result(sentence, proposition, backend=backend)
+                == get_proposition_veridicity_result(doc, Doc(vocab, words=proposition), backend=backend))
+
+    restored = Sentence.from_bytes(sentence.to_bytes())
+    assert restored.attrs is None
+    assert restored.headof_facts == sentence.headof_facts
+
+    with pytest.raises(ValueError):
+        make_sentence(**dict(lied_parse, heads=lied_parse['heads'][:-1]))
+    with pytest.raises(ValueError):
+        make_sentence(**dict(lied_parse, heads=lied_parse['heads'][:-1] + [8]))
+
+
+def test_conllu_without_spacy():
+    code = (
+        'import sys\n'
+        'from truther.conllu import read_conllu\n'
+        'from truther.veridicity import get_sentence_veridicity_result\n'
+        f'sentence = next(read_conllu({CONLLU!r}.splitlines()))\n'
+        'for backend in ("native", "kanren"):\n'
+        '    assert get_sentence_veridicity_result(sentence, "the sun is yellow".split(),\n'
+        '                                          backend=backend).veridicity == "negative"\n'
+        'assert not [module for module in sys.modules if module.split(".")[0] == "spacy"]\n'
+    )
+    subprocess.run([sys.executable, '-c', code], check=True)
@@ -0,0 +1,23 @@
+import spacy
+from spacy.tokens import Doc
+
+from truther.veridicity import explain_proposition_veridicity, get_proposition_veridicity
+
+
+def test_explain_proposition_veridicity(make_lied_doc):
+    vocab = spacy.blank('en').vocab
+    sentence = make_lied_doc(vocab)
+    proposition = Doc(vocab, words='the sun is yellow'.split())
+    for backend in ('native', 'kanren'):
+        explanation = explain_proposition_veridicity(sentence, proposition, backend=backend)
+        assert explanation.veridicity == get_proposition_veridicity(sentence, proposition, backend=backend)
+        assert [(step.rule, step.veridicality_element, step.orientation, step.factive_freeze)
+                for step in explanation.steps] == [('Verb Complement', 'negative_verbs', 'negative', False)]
+        assert list(explanation.steps[0].rule_seconds)[-1] == 'verb_complement'
+        # no lexicon element is left for the rules needing one, and the source rules have no source
+        assert 'verb_complement' not in explanation.final_rule_seconds
+        assert 'double_pp_source' not in explanation.steps[0].rule_seconds
+        assert explanation.reason == 'rules'
+
+    explanation = explain_proposition_veridicity(sentence, Doc(vocab, words=['pigs']))
+    assert (explanation.veridicity, explanation.reason, explanation.steps) == ('positive', 'not_found', [])
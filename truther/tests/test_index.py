@@ -0,0 +1,36 @@
+import subprocess
+import sys
+
+import spacy
+
+from truther.index import PropositionIndex
+from truther.veridicity import get_proposition_veridicity_many
+
+
+def test_proposition_index(tmp_path):
+    nlp = spacy.blank('en')
+    corpus = ['It rains today', 'Rains it today', 'The sun is out', nlp('It rains')]
+    with PropositionIndex(str(tmp_path / 'index.sqlite')) as index:
+        assert index.add(corpus, nlp, batch_size=2) == [1, 2, 3, 4]
+    with PropositionIndex(str(tmp_path / 'index.sqlite')) as index:
+        assert len(index) == 4
+        assert index.find_sentence_ids(['it', 'rains']) == [1, 4]
+        assert index.find_sentence_ids(['rains', 'it']) == [2]
+        assert index.find_sentence_ids(['sun']) == [3]
+        assert index.find_sentence_ids(['moon']) == []
+        # 'it rains today' and 'rains it today' have 5 postings each, 'the sun is out' 7 and 'it rains' 3
+        assert index._connection.execute('SELECT COUNT(*) FROM postings').fetchone()[0] == 20
+        results = list(index.get_proposition_veridicities('it rains', nlp, backend='native'))
+    assert [(sentence_id, text) for sentence_id, text, _ in results] == [(1, 'It rains today'), (4, 'It rains')]
+    assert [veridicity for _, _, veridicity in results] == list(get_proposition_veridicity_many(
+        [('It rains today', 'it rains'), ('It rains', 'it rains')], nlp, backend='native'
+    ))
+
+    # Looking sentences up in an existing index does not import spaCy
+    subprocess.run([sys.executable, '-c',
+                    'import sys\n'
+                    'from truther.index import PropositionIndex\n'
+                    f'index = PropositionIndex({str(tmp_path / "index.sqlite")!r})\n'
+                    'assert index.find_sentence_ids(["it", "rains"]) == [1, 4]\n'
+                    'assert index.get_sentence(4)[0] == "It rains"\n'
+                    'assert "spacy" not in sys.modules\n'], check=True)
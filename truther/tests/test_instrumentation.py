@@ -0,0 +1,36 @@
+import spacy
+from spacy.tokens import Doc
+
+from truther.instrumentation import Metrics, is_enabled, register_hook, unregister_hook
+from truther.veridicity import get_proposition_veridicity
+
+
+def test_metrics(make_lied_doc):
+    vocab = spacy.blank('en').vocab
+    sentence = make_lied_doc(vocab)
+    proposition = Doc(vocab, words='the sun is yellow'.split())
+    metrics = register_hook(Metrics())
+    try:
+        assert is_enabled()
+        assert get_proposition_veridicity(sentence, proposition, backend='native') == 'negative'
+    finally:
+        unregister_hook(metrics)
+    assert not is_enabled()
+
+    stats = metrics.to_dict()
+    assert stats['stages']['make_sentence_from_doc']['count'] == 1
+    assert stats['stages']['lexicon_matching']['count'] == 2
+    assert stats['stages']['transform_loop_iteration']['count'] == 1
+    # the proposition, the transformation, and the lexicon element in each LogicalSentence
+    assert stats['stages']['merge_and_label_node_ids']['count'] == 4
+    # the rules which may fire are queried again after the transformation, and none fires
+    assert stats['rules']['verb_complement']['count'] == 1
+    assert stats['rules']['verb_complement']['hits'] == 1
+    assert stats['rules']['verb_complement']['skips'] == 1
+    # there is no negative source to query double_pp_source for
+    assert stats['rules']['double_pp_source']['count'] == 0
+    assert stats['rules']['double_pp_source']['skips'] == 2
+    prometheus = metrics.to_prometheus()
+    assert 'truther_rule_hits_total{rule="verb_complement"} 1\n' in prometheus
+    assert 'truther_rule_skips_total{rule="double_pp_source"} 2\n' in prometheus
+    assert '# TYPE truther_stage_calls_total counter\n' in prometheus
@@ -0,0 +1,88 @@
+import spacy
+from spacy.tokens import Doc
+
+from truther.lexicon_matcher import LexiconMatcher
+from truther.sentence import make_sentence_from_doc
+from truther.veridicality_elements import VeridicalityElements
+
+VOCAB = spacy.blank('en').vocab
+
+
+def _make_sentence(words, lemmas):
+    return make_sentence_from_doc(Doc(VOCAB, words=words, lemmas=lemmas))
+
+
+def _label_sequentially(sentence, veridicality_elements):
+    for pattern, label in veridicality_elements.get_patterns():
+        sentence = sentence.search_and_merge(pattern, label)
+        sentence = sentence.search_and_merge_lemmas(pattern, label)
+    return sentence
+
+
+def test_label_sentence_matches_sequential_search():
+    veridicality_elements = VeridicalityElements()
+    words = 'the idiot said it would rain as soon as he lied , even if nobody denied it'.split()
+    lemmas = 'the idiot say it would rain as soon as he lie , even if nobody deny it'.split()
+    expected = _label_sequentially(_make_sentence(words, lemmas), veridicality_elements)
+    found = veridicality_elements.get_matcher().label_sentence(_make_sentence(words, lemmas))
+    assert found.toks == expected.toks
+    assert found.lemmas == expected.lemmas
+    assert found.label_facts == expected.label_facts
+    assert (6, 'conditionals') in found.label_facts
+    assert (10, 'negative_verbs') in found.label_facts
+
+
+def test_find_patterns():
+    veridicality_elements = VeridicalityElements()
+    tok_matches, lemma_matches = veridicality_elements.get_matcher().find_patterns(
+        _make_sentence('he lied'.split(), 'he lie'.split())
+    )
+    patterns = veridicality_elements.get_patterns()
+    assert tok_matches == set()
+    assert {patterns[i] for i in lemma_matches} == {(('lie',), 'negative_nouns'),
+                                                    (('lie',), 'negative_verbs')}
+
+
+def test_add_and_remove_patterns():
+    veridicality_elements = VeridicalityElements()
+    patterns = veridicality_elements.get_patterns()
+    matcher = LexiconMatcher(patterns)
+    added = (('as', 'it', 'were'), 'conditionals')
+    matcher.remove_pattern((('lie',), 'negative_verbs'))
+    matcher.remove_pattern((('as', 'soon', 'as'), 'conditionals'))
+    matcher.add_pattern(added)
+    expected_patterns = tuple(sorted(
+        [pattern for pattern in patterns if pattern not in {(('lie',), 'negative_verbs'),
+                                                            (('as', 'soon', 'as'), 'conditionals')}] + [added],
+        key=lambda pattern: (-len(pattern[0]), pattern[0], pattern[1])
+    ))
+    assert matcher.get_patterns() == expected_patterns
+    assert matcher.get_indexed_patterns()[-1] == added
+
+    words = 'the idiot said it would rain as soon as he lied , as it were'.split()
+    lemmas = 'the idiot say it would rain as soon as he lie , as it be'.split()
+    found = matcher.label_sentence(_make_sentence(words, lemmas))
+    expected = LexiconMatcher(expected_patterns).label_sentence(_make_sentence(words, lemmas))
+    assert found.toks == expected.toks
+    assert found.label_facts == expected.label_facts
+    assert (12, 'conditionals') in found.label_facts
+    assert (6, 'conditionals') not in found.label_facts
+    assert (10, 'negative_verbs') not in found.label_facts
+
+
+def test_changes_do_not_touch_the_patterns_being_matched():
+    # Matching threads keep using the patterns they started with while patterns change
+    patterns = ((('as', 'soon', 'as'), 'conditionals'), (('lie',), 'negative_verbs'))
+    matcher = LexiconMatcher(patterns)
+    sentence = _make_sentence('as soon as he lied'.split(), 'as soon as he lie'.split())
+    before = matcher._state
+    matches = matcher.find_patterns(sentence)
+    matcher.add_pattern((('as', 'soon'), 'conditionals'))
+    matcher.remove_pattern((('lie',), 'negative_verbs'))
+    assert before.patterns == patterns
+    assert before.ids_in_order
+    assert not matcher._state.ids_in_order
+    matcher._state = before
+    assert matcher.find_patterns(sentence) == matches == ({0}, {0, 1})
+    expected = LexiconMatcher(patterns).label_sentence(sentence)
+    assert matcher.label_sentence(sentence).label_facts == expected.label_facts
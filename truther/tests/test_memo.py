@@ -0,0 +1,52 @@
+import pytest
+import spacy
+
+from truther.memo import MemoCache, MemoStats
+from truther.veridicity import VeridicityMemo, get_proposition_veridicity_many
+
+
+def test_memo_cache_lru_eviction():
+    cache = MemoCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert 'b' not in cache
+    assert cache.get('b') is None
+    assert cache.get_stats() == MemoStats(hits=1, misses=1, maxsize=2, currsize=2)
+
+
+def test_memo_cache_fifo_eviction():
+    cache = MemoCache(maxsize=2, eviction='fifo')
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert 'a' not in cache and 'b' in cache
+    with pytest.raises(ValueError):
+        MemoCache(eviction='random')
+
+
+def test_veridicity_memo_skips_duplicates():
+    nlp = spacy.blank('en')
+    pairs = [('It rains', 'it rains'), ('It  rains ', 'it rains'), ('It rains', 'it rains')]
+    memo = VeridicityMemo()
+    assert list(get_proposition_veridicity_many(pairs, nlp, batch_size=2, backend='native', memo=memo)) == [
+        'positive', 'positive', 'positive'
+    ]
+    assert list(get_proposition_veridicity_many(pairs[:1], nlp, backend='native', memo=memo)) == ['positive']
+    stats = memo.get_stats()
+    assert stats['results'].hits == 2
+    assert stats['sentences'].currsize == 1
+    assert stats['propositions'] == MemoStats(hits=3, misses=1, maxsize=10000, currsize=1)
+
+
+def test_get_proposition_veridicity_many_threads(make_lied_doc):
+    nlp = spacy.blank('en')
+    sentences = [make_lied_doc(nlp.vocab), make_lied_doc(nlp.vocab, 'She', 'said', 'say')]
+    pairs = [(sentence, proposition) for sentence in sentences for proposition in ['the sun is yellow', 'pigs fly']]
+    expected = ['negative', 'positive', 'positive', 'positive'] * 5
+    for backend in ('native', 'kanren'):
+        for memo in (None, VeridicityMemo()):
+            assert list(get_proposition_veridicity_many(pairs * 5, nlp, batch_size=3, backend=backend, memo=memo,
+                                                        n_threads=4)) == expected
@@ -0,0 +1,62 @@
+import pickle
+
+import pytest
+import spacy
+from spacy.tokens import Doc, DocBin
+
+from truther.pipeline import VeridicityComponent
+from truther.veridicity import get_proposition_veridicity
+
+
+@pytest.fixture
+def make_docs(make_lied_doc):
+    # He lied that the sun is yellow . / She said that the sun is yellow .
+    def make(vocab):
+        return [make_lied_doc(vocab), make_lied_doc(vocab, 'She', 'said', 'say')]
+
+    return make
+
+
+def test_component(make_docs):
+    nlp = spacy.blank('en')
+    nlp.add_pipe('truther', config={'propositions': ['the sun is yellow', 'pigs fly'], 'backend': 'native'})
+    docs = list(nlp.pipe(make_docs(nlp.vocab)))
+    assert [[(veridicity['proposition'], veridicity['veridicity'], veridicity['reason'])
+             for veridicity in doc._.veridicities] for doc in docs] == [
+        [('the sun is yellow', 'negative', 'rules'), ('pigs fly', 'positive', 'not_found')],
+        [('the sun is yellow', 'positive', 'rules'), ('pigs fly', 'positive', 'not_found')],
+    ]
+    assert docs[0]._.veridicities[0]['chain'] == ['negative_verbs']
+    assert docs[0][3:7]._.veridicity == 'negative'
+    assert docs[0][3:6]._.veridicity is None
+    assert docs[0]._.veridicities[0]['veridicity'] == get_proposition_veridicity(
+        make_docs(nlp.vocab)[0], Doc(nlp.vocab, words='the sun is yellow'.split())
+    )
+
+
+def test_component_spans_and_doc_bin(make_docs):
+    nlp = spacy.blank('en')
+    nlp.add_pipe('truther', config={'spans_key': 'propositions'})
+    docs = make_docs(nlp.vocab)
+    for doc in docs:
+        doc.spans['propositions'] = [doc[3:7], doc[0:1], doc[2:2]]
+    doc_bin = DocBin(store_user_data=True, docs=nlp.pipe(docs))
+    docs = list(DocBin().from_bytes(doc_bin.to_bytes()).get_docs(nlp.vocab))
+    assert [(span.text, span._.veridicity) for span in docs[0].spans['propositions']] == [
+        ('the sun is yellow', 'negative'), ('He', 'positive'), ('', None)
+    ]
+    assert docs[1]._.veridicities[0]['start'] == 3
+    # the empty span is not scored
+    assert len(docs[1]._.veridicities) == 2
+
+
+def test_component_n_process(make_docs):
+    nlp = spacy.blank('en')
+    nlp.add_pipe('truther', config={'propositions': ['the sun is yellow']})
+    assert [doc._.veridicities[0]['veridicity'] for doc in nlp.pipe(make_docs(nlp.vocab), n_process=2)] == [
+        'negative', 'positive'
+    ]
+
+    component = pickle.loads(pickle.dumps(nlp.get_pipe('truther')))
+    assert isinstance(component, VeridicityComponent)
+    assert component(make_docs(nlp.vocab)[0])._.veridicities[0]['veridicity'] == 'negative'
@@ -0,0 +1,47 @@
+import spacy
+from spacy.tokens import Doc
+
+from truther.veridicity import (NO_ELEMENTS, NOT_FOUND, RULES, VeridicityMemo, VeridicityResult,
+                                get_proposition_veridicity_many, get_proposition_veridicity_result,
+                                get_veridicities, prefilter_proposition)
+
+
+def test_prefilter_proposition(make_lied_doc):
+    lied = make_lied_doc()
+    said = make_lied_doc(verb='xyzzied', verb_lemma='xyzzy')
+    assert prefilter_proposition(lied, 'the sun is yellow'.split()) is None
+    assert prefilter_proposition(lied, 'the sun is'.split()) is None
+    assert prefilter_proposition(lied, 'the moon is yellow'.split()) == NOT_FOUND
+    assert prefilter_proposition(lied, 'sun the'.split()) == NOT_FOUND
+    assert prefilter_proposition(lied, []) == NOT_FOUND
+    assert prefilter_proposition(said, 'the sun is yellow'.split()) == NO_ELEMENTS
+
+    proposition = Doc(lied.vocab, words='the sun is yellow'.split())
+    assert get_proposition_veridicity_result(lied, proposition, backend='native') == VeridicityResult(
+        'negative', RULES, ('negative_verbs',)
+    )
+    assert get_proposition_veridicity_result(said, proposition, backend='native') == VeridicityResult(
+        'positive', NO_ELEMENTS
+    )
+
+
+def test_get_proposition_veridicity_many_with_reasons(make_lied_doc):
+    lied = make_lied_doc()
+    pairs = [(lied, 'the sun is yellow'), (lied, 'the moon is yellow')]
+    nlp = spacy.blank('en')
+    expected = [VeridicityResult('negative', RULES, ('negative_verbs',)), VeridicityResult('positive', NOT_FOUND)]
+    assert list(get_proposition_veridicity_many(pairs, nlp, backend='native', with_reasons=True)) == expected
+    assert list(get_proposition_veridicity_many(pairs, nlp, backend='native', with_reasons=True,
+                                                memo=VeridicityMemo())) == expected
+
+
+def test_empty_proposition(make_lied_doc):
+    lied = make_lied_doc()
+    nlp = spacy.blank('en')
+    expected = [VeridicityResult('positive', NOT_FOUND), VeridicityResult('negative', RULES, ('negative_verbs',))]
+    pairs = [(lied, ''), (lied, 'the sun is yellow')]
+    assert list(get_proposition_veridicity_many(pairs, nlp, backend='native', with_reasons=True)) == expected
+    assert list(get_proposition_veridicity_many(pairs, nlp, backend='native', with_reasons=True,
+                                                memo=VeridicityMemo())) == expected
+    assert get_proposition_veridicity_result(lied, nlp(''), backend='native') == expected[0]
+    assert get_veridicities(lied, [nlp('')], backend='native') == {'': 'positive'}
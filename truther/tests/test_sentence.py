@@ -0,0 +1,71 @@
+from truther.sentence import LabelFacts, Sentence, make_sentence_from_doc
+
+
+def test_make_sentence_from_doc(make_lied_doc):
+    sentence = make_sentence_from_doc(make_lied_doc())
+    assert sentence.toks[:3] == [(0, 'he'), (1, 'lied'), (2, 'that')]
+    assert sentence.lemmas[1] == (1, 'lie')
+    assert sentence.tok_pos[1] == (1, 'VERB')
+    assert sentence.follows_facts[-2:] == [(6, 7), (7, None)]
+    assert sentence.headof_facts[:2] == [(0, (1, 'nsubj')), (1, (-1, 'ROOT'))]
+
+
+def test_merge_and_label_node_ids(make_lied_doc):
+    sentence = make_sentence_from_doc(make_lied_doc())
+    merged = sentence.search_and_merge('the sun is yellow'.split(), label='proposition')
+    assert merged.toks == [(0, 'he'), (1, 'lied'), (2, 'that'), (3, 'the sun is yellow'), (7, '.')]
+    assert merged.lemmas[3] == (3, 'the sun be yellow')
+    assert merged.tok_pos[3:7] == [(3, 'DET'), (3, 'NOUN'), (3, 'AUX'), (3, 'ADJ')]
+    assert merged.headof_facts == [(0, (1, 'nsubj')), (1, (-1, 'ROOT')), (2, (3, 'mark')),
+                                   (3, (1, 'ccomp')), (7, (1, 'punct'))]
+    assert merged.follows_facts == [(0, 1), (1, 2), (2, 3), (3, 7)]
+    assert merged.get_heads()[3] == {(1, 'ccomp')}
+    assert merged.attrs is sentence.attrs
+    assert len(sentence.toks) == 8
+
+    merged_again = merged.merge_and_label_node_ids((3, 1), label='proposition')
+    assert merged_again.toks == [(0, 'he'), (2, 'that'), (3, 'lied the sun is yellow'), (7, '.')]
+    assert merged_again.get_heads()[0] == {(3, 'nsubj')}
+    assert merged_again.get_heads()[3] == {(-1, 'ROOT')}
+    assert merged_again._label_index['proposition'] == {3}
+
+
+def test_sentence_bytes_round_trip(make_lied_doc):
+    merged = make_sentence_from_doc(make_lied_doc()).search_and_merge('the sun is yellow'.split(), label='proposition')
+    restored = Sentence.from_bytes(merged.to_bytes())
+    assert restored.toks == merged.toks
+    assert restored.tok_pos == merged.tok_pos
+    assert restored.headof_facts == merged.headof_facts
+    assert restored.label_facts == merged.label_facts
+
+
+def test_merges_leave_sentence_unchanged(make_lied_doc):
+    sentence = make_sentence_from_doc(make_lied_doc())
+    assert sentence.copy() is sentence
+    merged = sentence.search_and_merge('the sun is yellow'.split(), label='proposition')
+    other = sentence.merge_and_label_node_ids((0, 1), label='subject')
+    assert sentence.label_facts == [] and len(sentence.toks) == 8
+    assert merged.label_facts == [(3, 'proposition')]
+    assert other.label_facts == [(0, 'subject')]
+    assert other.toks[:2] == [(0, 'he lied'), (2, 'that')]
+
+    merged_again = merged.merge_and_label_node_ids((3, 1), label='proposition')
+    assert merged.label_facts == [(3, 'proposition')]
+    assert (3, 'proposition') in merged_again.label_facts
+    assert list(merged_again.label_facts) == [(3, 'proposition')]
+    assert not sentence.head_indices.flags.writeable
+
+
+def test_long_label_facts(make_lied_doc):
+    facts = [(i % 8, f'label_{i}') for i in range(5000)]
+    assert list(LabelFacts(facts)) == facts
+    label_facts = LabelFacts(facts[:1])
+    for fact in facts[1:]:
+        label_facts = label_facts.add(fact)
+    assert facts[0] in label_facts and (0, 'missing') not in label_facts
+    assert list(label_facts) == facts
+    assert list(label_facts.add((0, 'last')))[-2:] == [facts[-1], (0, 'last')]
+
+    sentence = make_sentence_from_doc(make_lied_doc())
+    sentence = Sentence(sentence.doc, sentence.strings, sentence.attrs, sentence.head_indices, facts)
+    assert Sentence.from_bytes(sentence.to_bytes()).label_facts == facts
@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+import spacy
+
+from truther.server import (MicroBatcher, VeridicityServer, get_proposition_veridicity_async,
+                            get_server_stats_async, _get_percentile, _request)
+
+_batch_sizes = []
+
+
+@spacy.Language.factory('truther_test_parse', default_config={'parse': {}})
+def _make_parse(nlp, name, parse):
+    # Annotates docs with the words of parse as it gives
+    def annotate(doc):
+        if [token.orth_ for token in doc] == parse['words']:
+            for token, head, dep, pos, lemma in zip(doc, parse['heads'], parse['deps'], parse['pos'],
+                                                    parse['lemmas']):
+                token.head = doc[head]
+                token.dep_ = dep
+                token.pos_ = pos
+                token.lemma_ = lemma
+        return doc
+
+    return annotate
+
+
+@spacy.Language.component('truther_test_fail')
+def _fail(doc):
+    if doc.text.startswith('Fail'):
+        raise ValueError(doc.text)
+    return doc
+
+
+@pytest.fixture
+def make_nlp(lied_parse):
+    # Makes an nlp parsing "He lied that the sun is yellow ." and counting the texts of each nlp.pipe call
+    def make():
+        nlp = spacy.blank('en')
+        nlp.add_pipe('truther_test_parse', config={'parse': lied_parse})
+        pipe = nlp.pipe
+
+        def counting_pipe(texts, **kwargs):
+            texts = list(texts)
+            _batch_sizes.append(len(texts))
+            return pipe(texts, **kwargs)
+
+        nlp.pipe = counting_pipe
+        _batch_sizes.clear()
+        return nlp
+
+    return make
+
+
+def test_micro_batcher(make_nlp):
+    async def run():
+        async with MicroBatcher(make_nlp(), max_batch_size=4, max_wait=0.05, backend='native') as batcher:
+            results = await asyncio.gather(*(batcher.score(f'Sentence {i} .', 'pigs fly') for i in range(10)),
+                                           batcher.score('He lied that the sun is yellow .', 'the sun is yellow'))
+            return results, batcher.get_stats()
+
+    results, stats = asyncio.run(run())
+    assert [result.veridicity for result in results] == ['positive'] * 10 + ['negative']
+    assert results[-1].chain == ('negative_verbs',)
+    assert _batch_sizes == [4, 4, 3]
+    assert stats['requests'] == 11
+    assert stats['batches'] == 3
+    assert stats['queue_depth'] == stats['in_flight'] == 0
+    latency_seconds = stats['latency_seconds']
+    assert 0 < latency_seconds['p50'] <= latency_seconds['p90'] <= latency_seconds['p99'] <= latency_seconds['max']
+
+
+def test_get_percentile():
+    values = [float(value) for value in range(1, 11)]
+    assert _get_percentile(values, 50) == 5.
+    assert _get_percentile(values, 90) == 9.
+    assert _get_percentile(values, 99) == 10.
+    assert _get_percentile(values[:1], 50) == 1.
+    assert _get_percentile([], 50) is None
+
+
+def test_micro_batcher_isolates_failures(make_nlp):
+    nlp = make_nlp()
+    nlp.add_pipe('truther_test_fail')
+
+    async def run():
+        async with MicroBatcher(nlp, max_batch_size=4, max_wait=0.05, backend='native') as batcher:
+            return await asyncio.gather(batcher.score('He lied that the sun is yellow .', 'the sun is yellow'),
+                                        batcher.score('Fail .', 'it rains'),
+                                        batcher.score('It rains .', 'pigs fly'),
+                                        return_exceptions=True)
+
+    lied, failed, rains = asyncio.run(run())
+    assert isinstance(failed, ValueError)
+    assert (lied.veridicity, rains.reason) == ('negative', 'not_found')
+    # the batch failed, and its pairs were then scored one at a time
+    assert _batch_sizes == [3, 1, 1, 1]
+
+
+def test_server(tmp_path, make_nlp):
+    async def run(unix_socket):
+        batcher = MicroBatcher(make_nlp(), max_batch_size=8, backend='native')
+        async with batcher, VeridicityServer(batcher, port=0, unix_socket=unix_socket) as server:
+            address = dict(port=server.port, unix_socket=unix_socket)
+            results = await asyncio.gather(
+                get_proposition_veridicity_async('He lied that the sun is yellow .', 'the sun is yellow', **address),
+                get_proposition_veridicity_async('It rains .', 'pigs fly', **address),
+            )
+            pairs = await _request('POST', '/veridicity', {'pairs': [['It rains .', 'it rains']]},
+                                   'localhost', server.port, unix_socket)
+            with pytest.raises(RuntimeError, match='400'):
+                await _request('POST', '/veridicity', {'sentence': 'It rains .'}, 'localhost', server.port,
+                               unix_socket)
+            with pytest.raises(RuntimeError, match='400'):
+                await _request('POST', '/veridicity', {'sentence': 'It rains .', 'proposition': ' '}, 'localhost',
+                               server.port, unix_socket)
+            with pytest.raises(RuntimeError, match='404'):
+                await _request('GET', '/missing', None, 'localhost', server.port, unix_socket)
+            return results, pairs, await get_server_stats_async(**address)
+
+    for unix_socket in (None, str(tmp_path / 'truther.sock')):
+        results, pairs, stats = asyncio.run(run(unix_socket))
+        assert [tuple(result) for result in results] == [('negative', 'rules', ('negative_verbs',)),
+                                                        ('positive', 'not_found', ())]
+        assert pairs == {'results': [{'veridicity': 'positive', 'reason': 'no_elements', 'chain': []}]}
+        assert stats['requests'] == 3
+        assert set(stats['latency_seconds']) == {'p50', 'p90', 'p99', 'max'}
@@ -1,4 +1,14 @@
-from src.truther.veridicality_elements import VeridicalityElements
+import json
+import time
+
+import pytest
+
+from src.truther.veridicality_elements import (COMPILED_LEXICON_FORMAT_VERSION,
+                                               LEXICON_DIR,
+                                               LexiconWatcher,
+                                               VeridicalityElements,
+                                               compile_lexicon,
+                                               get_veridicality_elements)
 
 
 def test_get_patterns():
@@ -16,3 +26,79 @@ def test_get_patterns():
                                            'positive_adjectives',
                                            'positive_nouns',
                                            'positive_verbs'}
+
+
+def test_get_veridicality_elements_is_shared():
+    veridicality_elements = get_veridicality_elements()
+    assert veridicality_elements is get_veridicality_elements()
+    assert veridicality_elements.get_patterns() == VeridicalityElements().get_patterns()
+    assert all(isinstance(tokens, tuple) for tokens, _ in veridicality_elements.get_patterns())
+
+
+def test_compile_lexicon(tmp_path):
+    path = str(tmp_path / 'lexicon.json')
+    compile_lexicon(path)
+    compiled = VeridicalityElements(compiled_lexicon_path=path)
+    veridicality_elements = VeridicalityElements(lexicon_dir=LEXICON_DIR)
+    assert compiled.get_patterns() == veridicality_elements.get_patterns()
+    assert compiled.get_hash() == veridicality_elements.get_hash()
+
+    with open(path, 'w') as compiled_file:
+        json.dump({'format_version': COMPILED_LEXICON_FORMAT_VERSION + 1}, compiled_file)
+    with pytest.raises(ValueError):
+        VeridicalityElements(compiled_lexicon_path=path)
+
+
+def test_lexicon_dir(tmp_path):
+    (tmp_path / 'negative_verbs').write_text('deny\ncast doubt on\n')
+    (tmp_path / 'positive_verbs').write_text('Say\n')
+    assert VeridicalityElements(lexicon_dir=str(tmp_path)).get_patterns() == (
+        (('cast', 'doubt', 'on'), 'negative_verbs'),
+        (('deny',), 'negative_verbs'),
+        (('say',), 'positive_verbs'),
+    )
+
+
+def test_overlay(tmp_path):
+    (tmp_path / 'negative_verbs').write_text('deny\n')
+    (tmp_path / 'positive_verbs').write_text('say\n')
+    veridicality_elements = VeridicalityElements(lexicon_dir=str(tmp_path))
+    matcher = veridicality_elements.get_matcher()
+    base_hash = veridicality_elements.get_hash()
+
+    veridicality_elements.add_patterns('negative_sources', ['the Idiot', 'liar'])
+    veridicality_elements.remove_patterns('positive_verbs', ['say'])
+    assert veridicality_elements.get_matcher() is matcher
+    assert veridicality_elements.get_patterns() == (
+        (('the', 'idiot'), 'negative_sources'),
+        (('deny',), 'negative_verbs'),
+        (('liar',), 'negative_sources'),
+    )
+    assert veridicality_elements.get_hash() != base_hash
+
+    (tmp_path / 'positive_verbs').write_text('say\nbelieve\n')
+    assert veridicality_elements.reload()
+    assert not veridicality_elements.reload()
+    assert (('believe',), 'positive_verbs') in veridicality_elements.get_patterns()
+    assert (('say',), 'positive_verbs') not in veridicality_elements.get_patterns()
+
+    veridicality_elements.clear_overlay()
+    assert veridicality_elements.get_patterns() == VeridicalityElements(lexicon_dir=str(tmp_path)).get_patterns()
+
+
+def test_lexicon_watcher(tmp_path):
+    lexicon_file = tmp_path / 'negative_verbs'
+    lexicon_file.write_text('deny\n')
+    veridicality_elements = VeridicalityElements(lexicon_dir=str(tmp_path))
+    watcher = LexiconWatcher(veridicality_elements, interval=0.01)
+    assert not watcher.check()
+    lexicon_file.write_text('deny\ndispute\n')
+    assert watcher.check()
+    assert (('dispute',), 'negative_verbs') in veridicality_elements.get_patterns()
+
+    with LexiconWatcher(veridicality_elements, interval=0.01):
+        (tmp_path / 'positive_verbs').write_text('say\n')
+        deadline = time.monotonic() + 5
+        while (('say',), 'positive_verbs') not in veridicality_elements.get_patterns():
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
@@ -1,4 +1,7 @@
-from src.truther.veridicality_orientation import update_proposition_orientation
+from itertools import product
+
+from src.truther.veridicality_orientation import (ORIENTATION_TO_ORIENTATION_CLASS, OrientationAutomaton,
+                                                  update_proposition_orientation)
 
 
 def test_all_veridicality_orientation_permutations():
@@ -347,3 +350,22 @@ def test_all_veridicality_orientation_permutations():
     assert update_proposition_orientation("causals", "factive_verbs", False) == ('neutral', False)
     assert update_proposition_orientation("causals", "causals", True) == ('neutral', True)
     assert update_proposition_orientation("causals", "causals", False) == ('neutral', False)
+
+
+def test_orientation_automaton_matches_update_proposition_orientation():
+    element_names = sorted(ORIENTATION_TO_ORIENTATION_CLASS)
+    chains = [()] + [chain for length in (1, 2, 3) for chain in product(element_names, repeat=length)]
+    expected = []
+    for chain in chains:
+        orientation, factive_freeze = 'positive', False
+        for element_name in chain:
+            orientation, factive_freeze = update_proposition_orientation(orientation, element_name, factive_freeze)
+        expected.append(orientation)
+    assert OrientationAutomaton().rescore(chains).tolist() == expected
+
+
+def test_orientation_automaton_rescores_changed_classes():
+    chains = [('negative_verbs',), ('negative_verbs', 'negative_nouns'), ('factive_verbs', 'negative_verbs'), ()]
+    assert OrientationAutomaton().rescore(chains).tolist() == ['negative', 'positive', 'positive', 'positive']
+    changed = dict(ORIENTATION_TO_ORIENTATION_CLASS, negative_nouns='neutral')
+    assert OrientationAutomaton(changed).rescore(chains).tolist() == ['negative', 'neutral', 'positive', 'positive']
@@ -0,0 +1,149 @@
+import os
+from unittest import TestCase
+
+import spacy
+from spacy.tokens import Doc
+
+from truther.benchmark import load_fixtures
+from truther.sentence import make_sentence_from_doc
+from truther.veridicality_rules import (FoundVeridicalityTransformation, RuleRequirements,
+                                        get_rule_requirements, register_veridicality_rule,
+                                        unregister_veridicality_rule, get_veridicality_rules)
+from truther.veridicality_transformation import LogicalSentence
+from truther.veridicity import get_proposition_veridicity
+
+SENTENCE_PROPOSITIONS = [
+    ("Sam argues in defense of the idiot’s assertion that it is raining.", "it is raining"),
+    ("He disagreed with President Bush’s assessment earlier in the day that the U.S. is winning the war in Iraq.",
+     "the u.s. is winning the war in iraq"),
+    ("Sam agrees with idiot’s assertion that it is raining.", "it is raining"),
+    ("Sam agrees with assertion of the idiot that it is raining.", "it is raining"),
+    ("It was argued by the idiot that it is raining.", "it is raining"),
+    ("It was denied that the sun is yellow.", "the sun is yellow"),
+    ("She agreed with the assertion that the sun is yellow.", "the sun is yellow"),
+    ("She uttered the falsehood that the sun is yellow.", "the sun is yellow"),
+    ("The fiction that the sun is yellow.", "the sun is yellow"),
+    ("The idiot said that the sun is yellow.", "the sun is yellow"),
+    ("He lied that the sun is yellow.", "the sun is yellow"),
+    ("It is true that the sun is yellow.", "the sun is yellow"),
+    ("If he is on time the sun is yellow.", "the sun is yellow"),
+    ("The sun is yellow as soon as next week.", "the sun is yellow"),
+    ("If the sun is yellow then it will rain.", "the sun is yellow"),
+    ("While the sun is yellow it will rain.", "the sun is yellow"),
+    ("The fiction that George knows the sun is yellow.", "the sun is yellow"),
+    ("Bill forgot that Sarah believes the sun is yellow.", "the sun is yellow"),
+    ("He disagreed with Bill's assessment that the sun is yellow.", "the sun is yellow"),
+]
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks', 'fixtures')
+
+
+class TestNativeBackend(TestCase):
+    def setUp(self):
+        self.nlp = spacy.load('en_core_web_lg')
+
+    def test_native_backend_matches_kanren(self):
+        for sentence, proposition in SENTENCE_PROPOSITIONS:
+            doc = self.nlp(sentence)
+            transforms = {}
+            for backend in ('kanren', 'native'):
+                lsent = LogicalSentence(
+                    sentence=make_sentence_from_doc(doc).search_and_merge(proposition.split(),
+                                                                          label='proposition'),
+                    backend=backend
+                )
+                transforms[backend] = []
+                found_vt = lsent.find_a_veridicality_transform()
+                while found_vt is not None:
+                    transforms[backend].append(vars(found_vt))
+                    lsent = lsent.merge_in_transform(found_vt)
+                    found_vt = lsent.find_a_veridicality_transform()
+            assert transforms['native'] == transforms['kanren'], sentence
+            assert transforms['native'], sentence
+            assert (get_proposition_veridicity(doc, self.nlp(proposition), backend='native')
+                    == get_proposition_veridicity(doc, self.nlp(proposition), backend='kanren'))
+
+
+def test_register_veridicality_rule():
+    sentence = make_sentence_from_doc(
+        Doc(spacy.blank('en').vocab, words=['maybe', 'rain'], pos=['ADV', 'NOUN'],
+            heads=[1, 1], deps=['advmod', 'ROOT'])
+    ).search_and_merge(['rain'], label='proposition')
+
+    def maybe(sentence):
+        if (0, 'advmod') in sentence._dauts[1]:
+            return FoundVeridicalityTransformation('Maybe', 'conditionals', (1, 0))
+
+    assert LogicalSentence(sentence.copy(), backend='native').find_a_veridicality_transform() is None
+    register_veridicality_rule(maybe, index=0)
+    try:
+        assert get_veridicality_rules()[0] is maybe
+        found_vt = LogicalSentence(sentence.copy(), backend='native').find_a_veridicality_transform()
+        assert vars(found_vt) == {'name': 'Maybe', 'node_ids': (1, 0), 'veridicality_element': 'conditionals'}
+    finally:
+        unregister_veridicality_rule(maybe)
+    assert maybe not in get_veridicality_rules()
+
+
+def test_register_veridicality_rule_with_requirements():
+    sentence = make_sentence_from_doc(
+        Doc(spacy.blank('en').vocab, words=['maybe', 'rain'], pos=['ADV', 'NOUN'],
+            heads=[1, 1], deps=['advmod', 'ROOT'])
+    ).search_and_merge(['rain'], label='proposition')
+    queried = []
+
+    @register_veridicality_rule(index=0, labels=['proposition'], deps=[('advcl', 'advmod')])
+    def maybe(sentence):
+        queried.append(sentence)
+        return FoundVeridicalityTransformation('Maybe', 'conditionals', (1, 0))
+
+    @register_veridicality_rule(index=0, labels=['proposition', ('causals', 'conditionals')])
+    def because(sentence):
+        queried.append(sentence)
+        return FoundVeridicalityTransformation('Because', 'causals', (1, 0))
+
+    try:
+        assert get_veridicality_rules()[:2] == (because, maybe)
+        assert get_rule_requirements('maybe').deps == (('advcl', 'advmod'),)
+        assert not get_rule_requirements('because').are_met(sentence)
+        found_vt = LogicalSentence(sentence.copy(), backend='native').find_a_veridicality_transform()
+        assert found_vt.name == 'Maybe'
+        assert len(queried) == 1
+    finally:
+        unregister_veridicality_rule(maybe)
+        unregister_veridicality_rule(because)
+    assert get_rule_requirements('maybe') is None
+
+
+def test_rule_requirements():
+    sentence = make_sentence_from_doc(
+        Doc(spacy.blank('en').vocab, words=['maybe', 'rain'], pos=['ADV', 'NOUN'],
+            heads=[1, 1], deps=['advmod', 'ROOT'])
+    ).search_and_merge(['rain'], label='proposition')
+    assert RuleRequirements().are_met(sentence)
+    assert RuleRequirements(labels=['proposition'], deps=['advmod']).are_met(sentence)
+    assert RuleRequirements(labels=[('conditionals', 'proposition')]).are_met(sentence)
+    assert not RuleRequirements(labels=['proposition', 'conditionals']).are_met(sentence)
+    assert not RuleRequirements(deps=['advmod', 'mark']).are_met(sentence)
+
+
+def test_skipping_rules_keeps_results():
+    # Every rule is queried, in priority order, as before rules declared their requirements
+    for pairs in load_fixtures(FIXTURES_DIR).values():
+        for sentence, proposition in pairs:
+            for backend in ('native', 'kanren'):
+                lsent = LogicalSentence(
+                    sentence=make_sentence_from_doc(sentence).search_and_merge(
+                        [tok.text for tok in proposition], label='proposition'
+                    ),
+                    backend=backend
+                )
+                while True:
+                    found_vt = next((out for out in (rule_query() for _, rule_query in lsent.get_rule_queries())
+                                     if out is not None), None)
+                    dispatched_vt = lsent.find_a_veridicality_transform()
+                    assert (vars(dispatched_vt) if dispatched_vt else None) == (vars(found_vt) if found_vt else None)
+                    if found_vt is None:
+                        break
+                    lsent = lsent.merge_in_transform(found_vt)
@@ -2,7 +2,8 @@ from unittest import TestCase
 
 import spacy
 
-from truther.veridicity import get_proposition_veridicity
+from truther.veridicity import (VeridicityMemo, get_proposition_veridicity, get_proposition_veridicity_many,
+                               get_veridicities)
 
 
 class TestVeridicalityTransformations(TestCase):
@@ -39,3 +40,40 @@ class TestVeridicalityTransformations(TestCase):
             sentence=self.nlp("He disagreed with Bill's assessment that the sun is yellow."),
             proposition=self.nlp("the sun is yellow")
         ) == 'negative'
+
+    def test_get_proposition_veridicity_many(self):
+        pairs = [("The fiction that George knows the sun is yellow.", "the sun is yellow"),
+                 ("The fiction that the sun is yellow.", "the sun is yellow"),
+                 (self.nlp("If the sun is yellow it will be a good day."), "the sun is yellow"),
+                 ("He disagreed with Bill's assessment that the sun is yellow.", self.nlp("the sun is yellow"))]
+        assert list(get_proposition_veridicity_many(iter(pairs), self.nlp, batch_size=2)) == [
+            'positive', 'negative', 'neutral', 'negative'
+        ]
+
+    def test_get_veridicities(self):
+        sentence = self.nlp("If the sun is yellow, Bill forgot that Sarah believes it will rain today.")
+        propositions = [self.nlp(text) for text in ["the sun is yellow", "it will rain today", "pigs fly"]]
+        assert get_veridicities(sentence, propositions) == {
+            proposition.text: get_proposition_veridicity(sentence, proposition)
+            for proposition in propositions
+        }
+
+    def test_get_proposition_veridicity_many_memo(self):
+        pairs = [("The fiction that the sun is yellow.", "the sun is yellow"),
+                 ("The fiction that  the sun is yellow. ", "the sun is yellow"),
+                 ("If the sun is yellow it will be a good day.", "the sun is yellow")]
+        memo = VeridicityMemo()
+        assert list(get_proposition_veridicity_many(pairs, self.nlp, memo=memo)) == [
+            'negative', 'negative', 'neutral'
+        ]
+        assert memo.get_stats()['results'].hits == 1
+
+    def test_get_proposition_veridicity_many_threads(self):
+        pairs = [("The fiction that George knows the sun is yellow.", "the sun is yellow"),
+                 ("The fiction that the sun is yellow.", "the sun is yellow"),
+                 ("If the sun is yellow it will be a good day.", "the sun is yellow"),
+                 ("He disagreed with Bill's assessment that the sun is yellow.", "the sun is yellow")] * 3
+        expected = list(get_proposition_veridicity_many(pairs, self.nlp))
+        assert list(get_proposition_veridicity_many(pairs, self.nlp, batch_size=2, n_threads=3)) == expected
+        assert list(get_proposition_veridicity_many(pairs, self.nlp, batch_size=2, n_threads=3,
+                                                    memo=VeridicityMemo())) == expected
@@ -0,0 +1,46 @@
+import subprocess
+import sys
+
+import pytest
+import spacy
+
+import truther
+from truther.veridicity import warmup
+
+
+def _run(code: str) -> None:
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+def test_import_is_lazy():
+    _run('import sys\n'
+         'import truther\n'
+         'assert truther.__version__\n'
+         'assert not {"numpy", "kanren", "spacy", "truther.veridicity"} & set(sys.modules)\n'
+         'assert "get_proposition_veridicity" in dir(truther)\n'
+         'from truther import get_proposition_veridicity\n'
+         'assert "truther.veridicity" in sys.modules\n'
+         'assert not {"kanren", "spacy"} & set(sys.modules)\n')
+
+
+def test_lazy_attributes():
+    assert truther.warmup is warmup
+    assert set(truther.__all__) <= set(dir(truther))
+    with pytest.raises(AttributeError):
+        truther.missing
+
+
+def test_warmup_without_nlp():
+    _run('import gc, sys\n'
+         'import truther\n'
+         'truther.warmup()\n'
+         'assert "kanren" in sys.modules and "spacy" not in sys.modules\n'
+         'assert gc.get_freeze_count() == 0\n'
+         'truther.warmup(freeze=True)\n'
+         'assert gc.get_freeze_count() > 0\n'
+         'from truther.veridicality_elements import _veridicality_elements\n'
+         'assert _veridicality_elements is not None\n')
+
+
+def test_warmup_with_nlp():
+    warmup(spacy.blank('en'), backends=['native'], freeze=False)